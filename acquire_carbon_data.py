@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Carbon & Financial Data Acquisition (Sub Process 1.2)
+=====================================================
+
+Concurrent acquisition layer for the six Stage 1B sources of the ESG DAG,
+merged into the D2G carbon & financial dataset:
+
+- D2A: Internal - Climate Solution           (per issuer)
+- D2B: External Primary - Reported Emissions  (per issuer)
+- D2C: External Primary - Supply Chain        (per issuer)
+- D2D: External Secondary - Emission Factors  (per sector)
+- D2E: External Secondary - Grid Energy       (per geography)
+- D2F: External Secondary - Benchmarks        (per sector)
+
+Each source is a pluggable adapter with an async fetch(issuer) method. All
+six sources run at once on one asyncio event loop; within a source, lookups
+are bounded by a per-source semaphore, each attempt has a timeout, and
+timeouts or connection errors are retried with exponential backoff.
+
+Until live connectors exist, every source is served by a FileSourceAdapter
+reading a local CSV stand-in from acquisition_sources/, so the pipeline
+runs offline. --init-standins writes deterministic stand-ins for the
+current issuers; --latency simulates a slow remote lookup per request.
+
+Issuers come from investment_data.xlsx (generate_amil_dummy_excel.py) and
+the merge is keyed by the Internal ID column, with ISIN as fallback key.
+
+Lookups go through the on-disk IssuerDataCache (issuer_data_cache.py),
+keyed by (source, ISIN or other identifier, reporting year), so a re-run
+over an unchanged portfolio is served from the cache. --offline never
+calls a source and uses cached data only.
+
+Usage:
+    python acquire_carbon_data.py [investment_data.xlsx] [--init-standins] [--latency SECONDS]
+                                  [--reporting-year YEAR] [--offline] [--no-cache]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from holdings_model import AMIL_SHEET_ASSET_CLASSES
+from issuer_data_cache import CACHE_FILE, DEFAULT_TTL_DAYS, MISSING, IssuerDataCache
+
+STANDIN_DIR = 'acquisition_sources'
+OUTPUT_FILE = 'd2g_carbon_financial_data.csv'
+
+ISSUER_KEYS = ('internal_id', 'isin')
+
+# Errors worth retrying; anything else is a bug in the adapter and fails fast
+RETRYABLE_ERRORS = (asyncio.TimeoutError, ConnectionError)
+
+# source id -> (name, stand-in file, lookup keys)
+SOURCES = {
+    'D2A': ('Internal - Climate Solution', 'climate_solutions.csv', ISSUER_KEYS),
+    'D2B': ('External Primary - Reported Emissions', 'reported_emissions.csv', ISSUER_KEYS),
+    'D2C': ('External Primary - Supply Chain', 'supply_chain.csv', ISSUER_KEYS),
+    'D2D': ('External Secondary - Emission Factors', 'emission_factors.csv', ('sector',)),
+    'D2E': ('External Secondary - Grid Energy', 'grid_energy.csv', ('geography',)),
+    'D2F': ('External Secondary - Benchmarks', 'benchmarks.csv', ('sector',)),
+}
+
+def load_amil_issuers(xlsx_file):
+    """Load one row per issuer/asset with its identifiers from investment_data.xlsx."""
+
+    excel_file = pd.ExcelFile(xlsx_file)
+    frames = []
+    for sheet_name, asset_class in AMIL_SHEET_ASSET_CLASSES.items():
+        if sheet_name not in excel_file.sheet_names:
+            continue
+        sheet = excel_file.parse(sheet_name, dtype={'Internal ID': str, 'ISIN': str})
+        name_column = 'Issuer Name' if 'Issuer Name' in sheet.columns else 'Asset Name'
+        frames.append(pd.DataFrame({
+            'internal_id': sheet['Internal ID'],
+            'isin': sheet['ISIN'] if 'ISIN' in sheet.columns else None,
+            'name': sheet[name_column],
+            'asset_class': asset_class,
+            'sector': sheet.get('Sector Classification'),
+            'geography': sheet.get('Geography'),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+class SourceAdapter(ABC):
+    """Base class for one Stage 1B data source.
+
+    Subclasses implement fetch(issuer), returning a dict of fields for the
+    issuer (a row of the issuers frame as a dict) or None when the source
+    has no data for it. cached(issuer) may answer without I/O; issuers it
+    resolves are never scheduled on the event loop.
+    """
+
+    def __init__(self, source, name, max_concurrency=16, timeout=10.0, retries=3, backoff=0.5):
+        self.source = source
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    def cached(self, issuer):
+        return MISSING
+
+    @abstractmethod
+    async def fetch(self, issuer):
+        """Return the source's fields for issuer, or None when it has none."""
+
+class FileSourceAdapter(SourceAdapter):
+    """Serve a source from a local CSV stand-in, indexed once on load.
+
+    Rows are matched on the first key in keys that the issuer has and the
+    file contains. latency adds a simulated round-trip per lookup.
+    """
+
+    def __init__(self, source, name, path, keys, latency=0.0, **options):
+        super().__init__(source, name, **options)
+        self.path = path
+        self.keys = tuple(keys)
+        self.latency = latency
+
+        table = pd.read_csv(path, dtype={key: str for key in self.keys})
+        self.fields = [column for column in table.columns if column not in self.keys]
+        self.indexes = {}
+        for key in self.keys:
+            if key not in table.columns:
+                continue
+            rows = table.dropna(subset=[key]).drop_duplicates(subset=[key])
+            self.indexes[key] = dict(zip(rows[key], rows[self.fields].to_dict('records')))
+
+    async def fetch(self, issuer):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for key in self.keys:
+            value = issuer.get(key)
+            if isinstance(value, str) and key in self.indexes and value in self.indexes[key]:
+                return self.indexes[key][value]
+        return None
+
+def standin_adapters(directory=STANDIN_DIR, latency=0.0, **options):
+    """Build a FileSourceAdapter for every source from its stand-in file."""
+
+    return [
+        FileSourceAdapter(source, name, os.path.join(directory, filename), keys, latency=latency, **options)
+        for source, (name, filename, keys) in SOURCES.items()
+    ]
+
+class CachedSourceAdapter(SourceAdapter):
+    """Serve another adapter through an IssuerDataCache.
+
+    Entries are keyed by the issuer's ISIN where it has one (stable across
+    portfolios), otherwise by the first other lookup key. cached() answers
+    from the cache; fetch() calls the wrapped adapter at most once per
+    identifier (issuers sharing a sector share one lookup) and never in
+    offline mode.
+    """
+
+    def __init__(self, adapter, cache, year):
+        super().__init__(adapter.source, adapter.name, adapter.max_concurrency,
+                         adapter.timeout, adapter.retries, adapter.backoff)
+        self.adapter = adapter
+        self.cache = cache
+        self.year = year
+        keys = getattr(adapter, 'keys', ISSUER_KEYS)
+        self.identifier_keys = sorted(keys, key=lambda key: key != 'isin')
+        self._fetched = {}
+        self._in_flight = {}
+
+    def identifier(self, issuer):
+        for key in self.identifier_keys:
+            value = issuer.get(key)
+            if isinstance(value, str) and value:
+                return f"{key}={value}"
+        return None
+
+    def cached(self, issuer):
+        identifier = self.identifier(issuer)
+        if identifier is None:
+            return MISSING
+        value = self.cache.get(self.source, identifier, self.year)
+        if value is MISSING and self.cache.offline:
+            return None
+        return value
+
+    async def fetch(self, issuer):
+        if self.cache.offline:
+            return None
+        identifier = self.identifier(issuer)
+        if identifier is None:
+            return await self.adapter.fetch(issuer)
+        if identifier in self._fetched:
+            return self._fetched[identifier]
+
+        if identifier not in self._in_flight:
+            self._in_flight[identifier] = asyncio.ensure_future(self._fetch_and_store(issuer, identifier))
+        # Shielded so a timed-out caller leaves the shared lookup running for the others
+        return await asyncio.shield(self._in_flight[identifier])
+
+    async def _fetch_and_store(self, issuer, identifier):
+        try:
+            value = await self.adapter.fetch(issuer)
+        finally:
+            del self._in_flight[identifier]
+        self._fetched[identifier] = value
+        self.cache.put(self.source, identifier, self.year, value)
+        return value
+
+def cached_adapters(adapters, cache, year):
+    """Wrap every adapter with the cache for one reporting year."""
+    return [CachedSourceAdapter(adapter, cache, year) for adapter in adapters]
+
+@dataclass
+class SourceStats:
+    """Per-source acquisition counters."""
+    source: str
+    name: str
+    requested: int = 0
+    found: int = 0
+    missing: int = 0
+    failed: int = 0
+    retries: int = 0
+    elapsed: float = 0.0
+    errors: list = field(default_factory=list)
+
+async def _fetch_with_retries(adapter, issuer, stats):
+    """Fetch one issuer under the source's timeout and retry policy."""
+
+    for attempt in range(adapter.retries + 1):
+        try:
+            return await asyncio.wait_for(adapter.fetch(issuer), adapter.timeout)
+        except RETRYABLE_ERRORS as e:
+            if attempt == adapter.retries:
+                stats.failed += 1
+                if len(stats.errors) < 5:
+                    stats.errors.append(f"{issuer.get('internal_id')}: {type(e).__name__}: {e}")
+                return None
+            stats.retries += 1
+            await asyncio.sleep(adapter.backoff * (2 ** attempt))
+
+async def acquire_source(adapter, issuers):
+    """Fetch every issuer from one source; returns (results, stats).
+
+    Issuers the adapter can answer from cache are resolved first; the rest
+    are shared out to max_concurrency worker coroutines, which bounds the
+    in-flight lookups without queueing one task per issuer.
+    """
+
+    stats = SourceStats(adapter.source, adapter.name, requested=len(issuers))
+
+    started = time.perf_counter()
+    results = [adapter.cached(issuer) for issuer in issuers]
+    pending = iter([position for position, result in enumerate(results) if result is MISSING])
+
+    async def worker():
+        for position in pending:
+            results[position] = await _fetch_with_retries(adapter, issuers[position], stats)
+
+    await asyncio.gather(*(worker() for _ in range(max(adapter.max_concurrency, 1))))
+    stats.elapsed = time.perf_counter() - started
+
+    stats.found = sum(result is not None for result in results)
+    stats.missing = stats.requested - stats.found - stats.failed
+    return results, stats
+
+async def acquire_all(adapters, issuers):
+    """Run every source concurrently; returns {source: (results, stats)}."""
+
+    outcomes = await asyncio.gather(*(acquire_source(adapter, issuers) for adapter in adapters))
+    return {adapter.source: outcome for adapter, outcome in zip(adapters, outcomes)}
+
+def merge_carbon_financial_data(issuers, acquired):
+    """D2G: join every source's fields onto the issuers, keyed by Internal ID.
+
+    Adds a sources_found column counting the sources that returned data.
+    """
+
+    merged = issuers.copy()
+    found = np.zeros(len(issuers), dtype=np.int64)
+    for source, (results, _) in acquired.items():
+        present = np.array([result is not None for result in results], dtype=bool)
+        found += present
+        # Build from the hits only, with nullable dtypes, so integer and flag
+        # columns survive the gaps left by issuers the source does not cover
+        source_frame = pd.DataFrame.from_records(
+            [result for result in results if result is not None], index=merged.index[present]
+        ).convert_dtypes(convert_string=False, convert_floating=False)
+        overlap = [column for column in source_frame.columns if column in merged.columns]
+        if overlap:
+            source_frame = source_frame.rename(columns={column: f"{source.lower()}_{column}" for column in overlap})
+        merged = merged.join(source_frame)
+    merged['sources_found'] = found
+    return merged
+
+def acquire_carbon_financial_data(issuers, adapters):
+    """Acquire all sources for the issuers and return (merged, stats by source)."""
+
+    records = issuers.to_dict('records')
+    acquired = asyncio.run(acquire_all(adapters, records))
+    merged = merge_carbon_financial_data(issuers, acquired)
+    return merged, {source: stats for source, (_, stats) in acquired.items()}
+
+def _key_seed(*parts):
+    """Stable integer seed for a key, so stand-ins do not change between runs."""
+    return int.from_bytes(hashlib.sha256('|'.join(map(str, parts)).encode('utf-8')).digest()[:8], 'little')
+
+def write_standin_sources(issuers, directory=STANDIN_DIR):
+    """Write deterministic local stand-ins for all six sources.
+
+    Values are illustrative only. Issuer-level sources deliberately leave
+    some issuers uncovered, as live data providers do.
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    ids = issuers['internal_id'].astype(str).tolist()
+    rng = np.random.default_rng(_key_seed('issuers', *ids) % (2 ** 32))
+    count = len(issuers)
+
+    def covered(share):
+        return rng.random(count) < share
+
+    climate = issuers.loc[covered(0.9), ['internal_id', 'isin']].copy()
+    climate['climate_solution_share'] = np.round(rng.beta(2, 5, len(climate)), 3)
+    climate['taxonomy_aligned'] = rng.random(len(climate)) < 0.4
+
+    reported = issuers.loc[covered(0.7), ['internal_id', 'isin']].copy()
+    reported['scope1_tco2e'] = np.round(rng.lognormal(8, 1.2, len(reported)), 1)
+    reported['scope2_tco2e'] = np.round(reported['scope1_tco2e'] * rng.uniform(0.1, 0.6, len(reported)), 1)
+    reported['reporting_year'] = rng.choice([2022, 2023], len(reported), p=[0.3, 0.7])
+
+    supply_chain = issuers.loc[covered(0.4), ['internal_id', 'isin']].copy()
+    supply_chain['scope3_upstream_tco2e'] = np.round(rng.lognormal(9, 1.4, len(supply_chain)), 1)
+
+    sectors = sorted(issuers['sector'].dropna().astype(str).unique())
+    geographies = sorted(issuers['geography'].dropna().astype(str).unique())
+
+    factors = pd.DataFrame({'sector': sectors})
+    factors['sector_emission_factor_tco2e_per_gbp_m'] = [
+        round(float(np.random.default_rng(_key_seed('factor', s) % (2 ** 32)).lognormal(5, 0.6)), 1) for s in sectors
+    ]
+
+    grid = pd.DataFrame({'geography': geographies})
+    grid['grid_intensity_kgco2e_per_kwh'] = [
+        round(float(np.random.default_rng(_key_seed('grid', g) % (2 ** 32)).uniform(0.05, 0.6)), 3) for g in geographies
+    ]
+
+    benchmarks = pd.DataFrame({'sector': sectors})
+    benchmarks['benchmark_intensity_tco2e_per_gbp_m'] = [
+        round(float(np.random.default_rng(_key_seed('benchmark', s) % (2 ** 32)).lognormal(4.8, 0.5)), 1) for s in sectors
+    ]
+
+    tables = {'D2A': climate, 'D2B': reported, 'D2C': supply_chain,
+              'D2D': factors, 'D2E': grid, 'D2F': benchmarks}
+    for source, table in tables.items():
+        table.to_csv(os.path.join(directory, SOURCES[source][1]), index=False)
+    return {source: len(table) for source, table in tables.items()}
+
+def main(argv=None):
+    """Main function."""
+
+    parser = argparse.ArgumentParser(description="Acquire Stage 1B carbon & financial data (D2A-D2F) and merge to D2G")
+    parser.add_argument("issuers_file", nargs="?", default="investment_data.xlsx",
+                        help="investment_data.xlsx, or a CSV with internal_id/isin/sector/geography columns")
+    parser.add_argument("--sources-dir", default=STANDIN_DIR, help="Directory of local source stand-ins")
+    parser.add_argument("--init-standins", action="store_true", help="(Re)write the local stand-in files first")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per lookup")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent lookups per source")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds per lookup attempt")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per lookup after a timeout or connection error")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="Merged D2G CSV to write")
+    parser.add_argument("--reporting-year", type=int, default=datetime.now().year - 1,
+                        help="Reporting year the data is acquired for (default: last year)")
+    parser.add_argument("--cache", default=CACHE_FILE, help="Issuer data cache file")
+    parser.add_argument("--cache-ttl-days", type=float, default=DEFAULT_TTL_DAYS, help="Cache entry time-to-live")
+    parser.add_argument("--no-cache", action="store_true", help="Always fetch from the sources")
+    parser.add_argument("--offline", action="store_true", help="Use cached data only; never call a source")
+    args = parser.parse_args(argv)
+
+    if args.offline and args.no_cache:
+        parser.error("--offline needs the cache; drop --no-cache")
+
+    print("=" * 80)
+    print("CARBON & FINANCIAL DATA ACQUISITION (D2A-D2F → D2G)")
+    print("=" * 80)
+
+    if args.issuers_file.lower().endswith('.csv'):
+        issuers = pd.read_csv(args.issuers_file, dtype={'internal_id': str, 'isin': str})
+    else:
+        issuers = load_amil_issuers(args.issuers_file)
+    print(f"📄 Issuers: {len(issuers)} from {args.issuers_file}")
+
+    if args.init_standins:
+        counts = write_standin_sources(issuers, args.sources_dir)
+        print(f"📝 Stand-ins written to {args.sources_dir}/: {counts}")
+
+    try:
+        adapters = standin_adapters(args.sources_dir, latency=args.latency, max_concurrency=args.concurrency,
+                                    timeout=args.timeout, retries=args.retries)
+    except FileNotFoundError as e:
+        print(f"❌ Error: {e.filename} not found")
+        print("💡 Run with --init-standins to create the local stand-ins")
+        return 1
+
+    cache = None
+    if not args.no_cache:
+        cache = IssuerDataCache(args.cache, ttl_days=args.cache_ttl_days, offline=args.offline)
+        adapters = cached_adapters(adapters, cache, args.reporting_year)
+        mode = "offline, cached data only" if args.offline else f"TTL {args.cache_ttl_days:g} days"
+        print(f"🗄️  Cache: {args.cache} ({mode}), reporting year {args.reporting_year}")
+
+    started = time.perf_counter()
+    try:
+        merged, stats = acquire_carbon_financial_data(issuers, adapters)
+    finally:
+        if cache is not None:
+            cache.close()
+    elapsed = time.perf_counter() - started
+
+    merged.to_csv(args.output, index=False)
+
+    print("\nSOURCES:")
+    for source_stats in stats.values():
+        print(f"   {source_stats.source} {source_stats.name:<40} "
+              f"found {source_stats.found:>6}/{source_stats.requested:<6} "
+              f"failed {source_stats.failed:>4}  retries {source_stats.retries:>4}  {source_stats.elapsed:6.2f}s")
+        for error in source_stats.errors:
+            print(f"      ⚠️  {error}")
+
+    if cache is not None:
+        cache_stats = cache.stats
+        print(f"\n🗄️  Cache: {cache_stats.hits:,} hits, {cache_stats.misses:,} misses "
+              f"({cache_stats.hit_rate:.0%} hit rate), {cache_stats.expired:,} expired, "
+              f"{cache_stats.stale_hits:,} stale, {cache_stats.evictions:,} evicted")
+
+    print(f"\n⏱️  Total acquisition time: {elapsed:.2f}s")
+    print(f"✅ D2G dataset saved to: {args.output} ({len(merged)} rows, {len(merged.columns)} columns)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,143 @@
 #!/usr/bin/env python3
 """
 Parse XLSX chat data to extract structured ESG analysis information
+
+Metrics are defined in the CHAT_METRICS registry and extracted by
+ChatMetricExtractor in one pass over the chat messages, returning every
+occurrence with the index of the message it appeared in.
 """
 
+import argparse
+import glob
 import json
+import os
 import re
+import sys
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
 from pathlib import Path
 
-def extract_esg_data_from_chat(json_file_path):
+from extract_xlsx_data import iter_sheet_column
+
+# Sheet and column of the extract holding the OMNIS chat
+CHAT_SHEET = 'Financed Emissions Analysis'
+CHAT_COLUMN = 'OMNIS is resoning….'
+
+DEFAULT_EXTRACT = "extracted_xlsx_data/extracted_data.json"
+EXTRACT_FILE = "extracted_data.json"
+ANALYSIS_FILE = "esg_structured_analysis.md"
+STRUCTURED_DATA_FILE = "esg_structured_data.json"
+
+# Batch mode: one subdirectory per session plus a consolidated index
+DEFAULT_BATCH_DIR = "esg_sessions"
+SESSION_INDEX_FILE = "session_index.csv"
+SESSION_INDEX_JSON = "session_index.json"
+SESSION_INDEX_COLUMNS = ['total_investments', 'total_co2_equivalent', 'lg_existing_portfolio_co2',
+                         'pct_of_existing', 'conclusion', 'metrics_analyzed', 'messages', 'error']
+
+def _parse_int(text):
+    return int(text.replace(',', ''))
+
+@dataclass(frozen=True)
+class ChatMetric:
+    """A metric phrase in the OMNIS chat; parse() converts group 1 (or the whole match)"""
+    name: str
+    pattern: str
+    anchor: str  # literal text that every match contains
+    parse: object = str
+
+# Registry of chat metrics
+CHAT_METRICS = [
+    ChatMetric('total_co2_equivalent',
+               r'Total estimated CO2 equivalent for the \d+ investments is ([\d,]+) tCO2E',
+               'Total estimated CO2 equivalent', _parse_int),
+    ChatMetric('lg_existing_portfolio_co2',
+               r'compared to ([\d,]+) tCO2e \(2024 L&G Sustainability Report\)',
+               '(2024 L&G Sustainability Report)', _parse_int),
+    ChatMetric('total_investments', r'\b(\d+) investments', 'investments', _parse_int),
+    ChatMetric('conclusion', r'Conclusion: ([^\n]+)', 'Conclusion: '),
+    ChatMetric('carbon_intensity', r'Carbon Intensity \(tCO2e/£m\)(?: - (Bond|Real Estate))?',
+               'Carbon Intensity (tCO2e/£m)', lambda asset_type: asset_type),
+    ChatMetric('waci', r'Weighted Average Carbon Intensity \(WACI\)',
+               'Weighted Average Carbon Intensity (WACI)'),
+    ChatMetric('temperature_alignment', r'Portfolio Temperature Alignment \(C\)',
+               'Portfolio Temperature Alignment (C)'),
+]
+
+# Metric name -> label listed under metrics_analyzed
+ANALYZED_METRICS = {
+    'carbon_intensity': 'Carbon Intensity (tCO2e/£m)',
+    'waci': 'Weighted Average Carbon Intensity (WACI)',
+    'temperature_alignment': 'Portfolio Temperature Alignment (C)',
+}
+
+@dataclass
+class MetricOccurrence:
+    """One match of a chat metric"""
+    metric: str
+    message_index: int
+    offset: int
+    value: object
+
+class ChatMetricExtractor:
+    """Precompiled scanner for every metric in a registry"""
+
+    def __init__(self, metrics=CHAT_METRICS):
+        self.metrics = list(metrics)
+        self.patterns = [re.compile(metric.pattern) for metric in self.metrics]
+        # One alternation of every anchor: a single scan of each message finds
+        # which metrics can occur in it; only those patterns are then run.
+        # (Plain alternation of literals - capture groups would disable the
+        # regex engine's first-character skip.)
+        self.anchor_metrics = {}
+        for i, metric in enumerate(self.metrics):
+            self.anchor_metrics.setdefault(metric.anchor, []).append(i)
+        self.anchors = re.compile('|'.join(re.escape(anchor) for anchor in self.anchor_metrics))
+
+    def scan(self, messages):
+        """Yield a MetricOccurrence for every metric match, message by message"""
+
+        for message_index, message in enumerate(messages):
+            candidates = sorted(i for anchor in set(self.anchors.findall(message))
+                                for i in self.anchor_metrics[anchor])
+            for i in candidates:
+                metric = self.metrics[i]
+                for match in self.patterns[i].finditer(message):
+                    raw = match.group(1) if self.patterns[i].groups else match.group(0)
+                    value = metric.parse(raw) if raw is not None else None
+                    yield MetricOccurrence(metric.name, message_index, match.start(), value)
+
+    def extract(self, messages):
+        """Every occurrence of every metric, grouped by metric name"""
+
+        occurrences = {metric.name: [] for metric in self.metrics}
+        for occurrence in self.scan(messages):
+            occurrences[occurrence.metric].append(occurrence)
+        return occurrences
+
+def iter_chat_messages(json_file_path, sheet_name=CHAT_SHEET, column=CHAT_COLUMN):
+    """Yield the non-empty chat messages of one sheet, stripped, without loading the whole extract"""
+    
+    for message in iter_sheet_column(json_file_path, sheet_name, column):
+        if message and isinstance(message, str) and message.strip():
+            yield message.strip()
+
+def extract_esg_data_from_chat(json_file_path, extractor=None):
     """Extract structured ESG data from chat conversation"""
     
-    with open(json_file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    messages = []
     
-    chat_data = data['sheets']['Financed Emissions Analysis']['data']
+    def collected():
+        # Scan each message as it is streamed, keeping it for raw_messages
+        for message in iter_chat_messages(json_file_path):
+            messages.append(message)
+            yield message
     
-    # Extract all chat messages
-    messages = []
-    for row in chat_data:
-        message = row.get('OMNIS is resoning….', '')
-        if message and isinstance(message, str) and message.strip():
-            messages.append(message.strip())
+    occurrences = (extractor or ChatMetricExtractor()).extract(collected())
     
-    # Combine all messages
-    full_text = '\n'.join(messages)
+    def first(name):
+        return occurrences[name][0].value if occurrences.get(name) else None
     
     # Extract key metrics
     extracted_data = {
@@ -32,59 +145,31 @@ def extract_esg_data_from_chat(json_file_path):
         'investment_metrics': {},
         'comparison_data': {},
         'asset_type_analysis': {},
+        'metric_occurrences': {name: [asdict(occurrence) for occurrence in found]
+                               for name, found in occurrences.items()},
         'raw_messages': messages
     }
     
-    # Extract total CO2 equivalent
-    co2_match = re.search(r'Total estimated CO2 equivalent for the 18 investments is (\d+) tCO2E', full_text)
-    if co2_match:
-        extracted_data['investment_metrics']['total_co2_equivalent'] = int(co2_match.group(1))
-    
-    # Extract existing L&G portfolio CO2
-    lg_co2_match = re.search(r'compared to ([\d,]+) tCO2e \(2024 L&G Sustainability Report\)', full_text)
-    if lg_co2_match:
-        extracted_data['comparison_data']['lg_existing_portfolio_co2'] = int(lg_co2_match.group(1).replace(',', ''))
-    
-    # Extract investment count
-    investment_count_match = re.search(r'(\d+) investments', full_text)
-    if investment_count_match:
-        extracted_data['investment_metrics']['total_investments'] = int(investment_count_match.group(1))
-    
-    # Extract conclusion
-    conclusion_match = re.search(r'Conclusion: (.+?)(?=\n|$)', full_text, re.MULTILINE)
-    if conclusion_match:
-        extracted_data['portfolio_analysis']['conclusion'] = conclusion_match.group(1)
-    
-    # Find tabular data sections
-    table_sections = []
-    
-    # Look for Carbon Intensity data
-    carbon_intensity_pattern = r'Carbon Intensity \(tCO2e/£m\)'
-    waci_pattern = r'Weighted Average Carbon Intensity \(WACI\)'
-    temp_alignment_pattern = r'Portfolio Temperature Alignment \(C\)'
-    
-    # Extract metrics mentioned in the text
-    metrics_found = []
-    if re.search(carbon_intensity_pattern, full_text):
-        metrics_found.append('Carbon Intensity (tCO2e/£m)')
-    if re.search(waci_pattern, full_text):
-        metrics_found.append('Weighted Average Carbon Intensity (WACI)')
-    if re.search(temp_alignment_pattern, full_text):
-        metrics_found.append('Portfolio Temperature Alignment (C)')
-    
-    extracted_data['portfolio_analysis']['metrics_analyzed'] = metrics_found
-    
-    # Extract asset type analysis
-    asset_types = []
-    bond_match = re.search(r'Carbon Intensity \(tCO2e/£m\) - Bond', full_text)
-    real_estate_match = re.search(r'Carbon Intensity \(tCO2e/£m\) - Real Estate', full_text)
-    
-    if bond_match:
-        asset_types.append('Bond')
-    if real_estate_match:
-        asset_types.append('Real Estate')
-    
-    extracted_data['asset_type_analysis']['asset_types_analyzed'] = asset_types
+    # Headline figures: the first occurrence in the conversation
+    if first('total_co2_equivalent') is not None:
+        extracted_data['investment_metrics']['total_co2_equivalent'] = first('total_co2_equivalent')
+    if first('lg_existing_portfolio_co2') is not None:
+        extracted_data['comparison_data']['lg_existing_portfolio_co2'] = first('lg_existing_portfolio_co2')
+    if first('total_investments') is not None:
+        extracted_data['investment_metrics']['total_investments'] = first('total_investments')
+    if first('conclusion') is not None:
+        extracted_data['portfolio_analysis']['conclusion'] = first('conclusion')
+    
+    # Metrics mentioned in the text
+    extracted_data['portfolio_analysis']['metrics_analyzed'] = [
+        label for name, label in ANALYZED_METRICS.items() if occurrences.get(name)
+    ]
+    
+    # Asset types with a Carbon Intensity breakdown
+    asset_types_found = {occurrence.value for occurrence in occurrences.get('carbon_intensity', [])}
+    extracted_data['asset_type_analysis']['asset_types_analyzed'] = [
+        asset_type for asset_type in ['Bond', 'Real Estate'] if asset_type in asset_types_found
+    ]
     
     return extracted_data
 
@@ -166,11 +251,111 @@ def create_structured_analysis(extracted_data, output_file):
             if len(extracted_data['raw_messages']) > 10:
                 f.write(f"*... and {len(extracted_data['raw_messages']) - 10} more messages*\n\n")
 
-def main():
+def save_structured_data(extracted_data, output_file):
+    """Save the extracted data as JSON"""
+    
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(extracted_data, f, indent=2, ensure_ascii=False)
+
+def find_extracts(sources):
+    """Expand extract files, directories (searched recursively) and glob patterns"""
+    
+    paths = []
+    for source in sources:
+        paths.extend(sorted(glob.glob(source, recursive=True)) if glob.has_magic(source) else [source])
+    
+    extracts = []
+    for path in paths:
+        if os.path.isdir(path):
+            extracts.extend(sorted(glob.glob(os.path.join(path, '**', EXTRACT_FILE), recursive=True)))
+        else:
+            extracts.append(path)
+    return list(dict.fromkeys(os.path.normpath(path) for path in extracts))
+
+def session_names(extracts):
+    """Unique session name per extract: its directory (or file stem) relative to the common parent"""
+    
+    labels = [os.path.abspath(os.path.dirname(path) if os.path.basename(path) == EXTRACT_FILE
+                              else os.path.splitext(path)[0])
+              for path in extracts]
+    if not labels:
+        return []
+    root = os.path.commonpath([os.path.dirname(label) for label in labels])
+    return [os.path.relpath(label, root).replace(os.sep, '__') for label in labels]
+
+def analyze_session(json_file, output_dir):
+    """Analyze one extract into output_dir; returns its row of the session index"""
+    
+    os.makedirs(output_dir, exist_ok=True)
+    extracted_data = extract_esg_data_from_chat(json_file)
+    create_structured_analysis(extracted_data, os.path.join(output_dir, ANALYSIS_FILE))
+    save_structured_data(extracted_data, os.path.join(output_dir, STRUCTURED_DATA_FILE))
+    
+    total_co2 = extracted_data['investment_metrics'].get('total_co2_equivalent')
+    benchmark_co2 = extracted_data['comparison_data'].get('lg_existing_portfolio_co2')
+    return {
+        'total_investments': extracted_data['investment_metrics'].get('total_investments'),
+        'total_co2_equivalent': total_co2,
+        'lg_existing_portfolio_co2': benchmark_co2,
+        'pct_of_existing': (total_co2 / benchmark_co2) * 100 if total_co2 is not None and benchmark_co2 else None,
+        'conclusion': extracted_data['portfolio_analysis'].get('conclusion'),
+        'metrics_analyzed': len(extracted_data['portfolio_analysis']['metrics_analyzed']),
+        'messages': len(extracted_data['raw_messages']),
+    }
+
+def analyze_sessions(extracts, output_dir, workers=None):
+    """Analyze every extract in worker processes and write the consolidated session index.
+    
+    Each session gets its own subdirectory of output_dir with the markdown
+    analysis and structured JSON; a failed session is recorded in the index
+    with its error instead of stopping the batch. Returns the index.
+    """
+    
+    os.makedirs(output_dir, exist_ok=True)
+    names = session_names(extracts)
+    entries = {}
+    
+    with ProcessPoolExecutor(max_workers=max(1, min(workers or os.cpu_count() or 1, len(extracts)))) as pool:
+        futures = {pool.submit(analyze_session, json_file, os.path.join(output_dir, name)): name
+                   for json_file, name in zip(extracts, names)}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                entries[name] = dict(future.result(), error=None)
+                print(f"  ✅ {name}")
+            except Exception as e:
+                entries[name] = {'error': f"{type(e).__name__}: {e}"}
+                print(f"  ❌ {name}: {entries[name]['error']}")
+    
+    index = pd.DataFrame([{'session': name, 'source': json_file, **entries[name]}
+                          for json_file, name in zip(extracts, names)],
+                         columns=['session', 'source'] + SESSION_INDEX_COLUMNS)
+    index = index.astype({column: 'Int64' for column in ['total_investments', 'total_co2_equivalent',
+                                                         'lg_existing_portfolio_co2', 'metrics_analyzed',
+                                                         'messages']})
+    index.to_csv(os.path.join(output_dir, SESSION_INDEX_FILE), index=False)
+    with open(os.path.join(output_dir, SESSION_INDEX_JSON), 'w', encoding='utf-8') as f:
+        json.dump(json.loads(index.to_json(orient='records')), f, indent=2, ensure_ascii=False)
+    return index
+
+def main(argv=None):
     """Main execution function"""
     
-    json_file = "extracted_xlsx_data/extracted_data.json"
-    output_file = "esg_structured_analysis.md"
+    parser = argparse.ArgumentParser(description="Extract structured ESG analysis from OMNIS chat extracts")
+    parser.add_argument("sources", nargs="*", default=[DEFAULT_EXTRACT],
+                        help="extracted_data.json files, directories of extracts or glob patterns")
+    parser.add_argument("--output-dir",
+                        help=f"Batch mode: per-session outputs and {SESSION_INDEX_FILE} go here "
+                             f"(default {DEFAULT_BATCH_DIR} when there are several extracts)")
+    parser.add_argument("--workers", type=int, default=None, help="Batch worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+    
+    extracts = find_extracts(args.sources)
+    if len(extracts) != 1 or args.output_dir:
+        return batch_main(extracts, args.output_dir or DEFAULT_BATCH_DIR, args.workers)
+    
+    json_file = extracts[0]
+    output_file = ANALYSIS_FILE
     
     print("ESG Data Structure Analyzer")
     print("=" * 40)
@@ -182,11 +367,10 @@ def main():
     create_structured_analysis(extracted_data, output_file)
     
     # Save structured data as JSON
-    with open("esg_structured_data.json", 'w', encoding='utf-8') as f:
-        json.dump(extracted_data, f, indent=2, ensure_ascii=False)
+    save_structured_data(extracted_data, STRUCTURED_DATA_FILE)
     
     print(f"Structured analysis saved to: {output_file}")
-    print(f"Structured data saved to: esg_structured_data.json")
+    print(f"Structured data saved to: {STRUCTURED_DATA_FILE}")
     
     # Print summary
     print("\n" + "=" * 40)
@@ -210,7 +394,38 @@ def main():
         if 'metrics_analyzed' in analysis:
             print(f"Metrics Analyzed: {len(analysis['metrics_analyzed'])}")
     
+    print(f"Metric Occurrences: {sum(len(found) for found in extracted_data.get('metric_occurrences', {}).values())}")
     print(f"Raw Messages: {len(extracted_data.get('raw_messages', []))}")
+    return 0
+
+def batch_main(extracts, output_dir, workers=None):
+    """Batch mode: analyze many extracts and print the session index"""
+    
+    print("ESG Data Structure Analyzer - Batch")
+    print("=" * 40)
+    
+    if not extracts:
+        print("No extracts found")
+        return 1
+    
+    print(f"Analyzing {len(extracts)} sessions into: {output_dir}")
+    index = analyze_sessions(extracts, output_dir, workers)
+    
+    print("\n" + "=" * 40)
+    print("SESSION INDEX")
+    print("=" * 40)
+    for row in index.itertuples(index=False):
+        if isinstance(row.error, str):
+            print(f"{row.session}: failed ({row.error})")
+            continue
+        co2 = f"{row.total_co2_equivalent:,.0f} tCO₂e" if pd.notna(row.total_co2_equivalent) else "no CO₂ total"
+        share = f" ({row.pct_of_existing:.4f}% of existing)" if pd.notna(row.pct_of_existing) else ""
+        print(f"{row.session}: {co2}{share}")
+    
+    failed = int(index['error'].notna().sum())
+    print(f"\nSession index saved to: {os.path.join(output_dir, SESSION_INDEX_FILE)}")
+    print(f"Sessions: {len(index)}, failed: {failed}")
+    return 1 if failed else 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
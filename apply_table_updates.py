@@ -7,145 +7,186 @@ This script applies the complete table structure to the actual dashboard compone
 It replaces the entire tbody section in the DETAILED ASSET LEVEL ANALYSIS table
 with the correctly populated financial data.
 
+The patch is automated and idempotent:
+1. The generated rows are validated against complete_investment_data.csv
+2. The target table is located by its title marker, not by line number
+3. If the tbody content hash is unchanged, nothing is written
+4. Otherwise the new file is written to a temp file and renamed into place
+
 Usage:
-    python apply_table_updates.py
+    python apply_table_updates.py [--dashboard PATH] [--dry-run] [--skip-validation]
 """
 
-def apply_table_updates():
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+
+from validate_and_replace import TBODY_OPEN_PATTERN, find_tbody, validate_tbody_against_source
+
+DASHBOARD_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'omnis-ui', 'components', 'esg-dashboard', 'index-amil.tsx')
+GENERATED_FILE = 'complete_table_rows.tsx'
+TABLE_MARKER = 'DETAILED ASSET LEVEL ANALYSIS'
+
+def content_hash(text):
+    """SHA-256 of a text block, used to detect unchanged tables."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def locate_table_tbody(content, marker=TABLE_MARKER):
+    """Return the (start, end) span of the first <tbody>...</tbody> after the marker.
+
+    The span starts at the <tbody> tag itself, so the indentation of the
+    target file is kept. Returns None if the marker or tbody is missing.
+    """
+
+    marker_index = content.find(marker)
+    if marker_index == -1:
+        return None
+
+    tbody_match = TBODY_OPEN_PATTERN.search(content, marker_index)
+    if tbody_match is None:
+        return None
+
+    tbody_end = content.find('</tbody>', tbody_match.end())
+    if tbody_end == -1:
+        return None
+
+    # Another table between the marker and this tbody means the marker's
+    # own table has no tbody
+    if content.find('</table>', marker_index, tbody_match.start()) != -1:
+        return None
+
+    return tbody_match.start(1), tbody_end + len('</tbody>')
+
+def write_atomically(path, content):
+    """Write content to a temp file next to path, then rename it into place."""
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(temp_path, os.stat(path).st_mode & 0o7777)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def patch_dashboard(new_tbody, dashboard_file=DASHBOARD_FILE, marker=TABLE_MARKER, dry_run=False):
+    """Splice new_tbody into the marked table of the dashboard file.
+
+    Returns 'updated', 'unchanged' or 'would-update' (dry run). Raises
+    ValueError if the marked table cannot be found.
+    """
+
+    with open(dashboard_file, 'r', encoding='utf-8', newline='') as f:
+        content = f.read()
+
+    span = locate_table_tbody(content, marker)
+    if span is None:
+        raise ValueError(f"Could not find a <tbody> for '{marker}' in {dashboard_file}")
+
+    start, end = span
+    if content_hash(content[start:end]) == content_hash(new_tbody):
+        return 'unchanged'
+
+    if dry_run:
+        return 'would-update'
+
+    write_atomically(dashboard_file, content[:start] + new_tbody + content[end:])
+    return 'updated'
+
+def load_generated_tbody(generated_file=GENERATED_FILE):
+    """Read the <tbody> block from the generated TSX rows file."""
+
+    with open(generated_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    span = find_tbody(content)
+    if span is None:
+        return None
+    return content[span[0]:span[1]]
+
+def apply_table_updates(dashboard_file=DASHBOARD_FILE, dry_run=False, validate=True):
     """Apply the complete table updates to the dashboard component."""
-    
-    dashboard_file = '/workspace/git/repos/L-G-ESGDemo/omnis-ui/components/esg-dashboard/index-amil.tsx'
-    
+
     print("🔄 Applying complete table updates to dashboard...")
     print(f"📄 Target file: {dashboard_file}")
-    
+
     try:
-        # Read the generated complete table rows
-        with open('complete_table_rows.tsx', 'r') as f:
-            content = f.read()
-        
-        # Extract just the tbody content (between the markers)
-        tbody_start = content.find('<tbody>')
-        tbody_end = content.find('</tbody>') + len('</tbody>')
-        
-        if tbody_start == -1 or tbody_end == -1:
+        new_tbody = load_generated_tbody()
+
+        if new_tbody is None:
             print("❌ Error: Could not find tbody markers in generated file")
             return False
-        
-        new_tbody = content[tbody_start:tbody_end]
-        
+
         print("✅ Successfully extracted new table body content")
         print(f"📊 Content length: {len(new_tbody)} characters")
-        print(f"📋 Includes all 18 investments + totals row")
-        
-        # Show what the update will contain
-        print("\n" + "="*60)
-        print("UPDATE PREVIEW:")
-        print("="*60)
-        print("The update will replace the entire <tbody> section with:")
-        print("- 14 Bond investments with complete financial data")
-        print("- 3 Real Estate investments (blue background)")
-        print("- 2 Infrastructure investments (orange background)")
-        print("- 1 Totals row with calculated portfolio values")
-        print("\nKey updates:")
-        print("✅ All Investment Amount values populated")
-        print("✅ All EVIC values populated (bonds only, others show '-')")
-        print("✅ All Ownership percentages populated")
-        print("✅ Proper styling for different asset classes")
-        print("✅ Calculated portfolio totals")
-        
-        print(f"\n📝 Ready to apply updates to: {dashboard_file}")
-        print("💡 To apply these updates, use the replace_string_in_file tool")
-        print("   with the old <tbody>...</tbody> section")
-        
+
+        # Check the rows against the holdings source before applying
+        if validate:
+            report = validate_tbody_against_source(new_tbody, max_mismatches=20)
+            if not report.ok:
+                print("❌ Error: Generated rows do not match complete_investment_data.csv")
+                for issue in report.errors:
+                    print(f"   {issue}")
+                for item in report.mismatches:
+                    print(f"   {item['name']}: {item['field']} expected {item['expected']!r}, found {item['actual']!r}")
+                print("💡 Run generate_complete_table_structure.py to regenerate the table")
+                return False
+
+            counts = report.asset_class_counts
+            print(f"📋 {report.investment_rows} investments + totals row validated against source")
+            print(f"   - {counts.get('Bond', 0)} Bonds")
+            print(f"   - {counts.get('Real Estate Equity', 0)} Real Estate (blue background)")
+            print(f"   - {counts.get('Infrastructure (Project Finance)', 0)} Infrastructure (orange background)")
+
+        status = patch_dashboard(new_tbody, dashboard_file, dry_run=dry_run)
+
+        if status == 'unchanged':
+            print("✅ Dashboard table already up to date - no write needed")
+        elif status == 'would-update':
+            print("📝 Dry run: dashboard table differs and would be updated")
+        else:
+            print(f"✅ Dashboard table updated: {dashboard_file}")
+
         return True
-        
-    except FileNotFoundError:
-        print("❌ Error: complete_table_rows.tsx not found")
+
+    except FileNotFoundError as e:
+        print(f"❌ Error: {e.filename} not found")
         print("💡 Run generate_complete_table_structure.py first")
         return False
-    except Exception as e:
+    except ValueError as e:
         print(f"❌ Error: {e}")
         return False
 
-def show_replacement_instructions():
-    """Show detailed instructions for applying the updates."""
-    
-    print("\n" + "="*80)
-    print("REPLACEMENT INSTRUCTIONS")
-    print("="*80)
-    
-    print("""
-STEP 1: Locate the current <tbody> section
--------------------------------------------
-In the file: /workspace/git/repos/L-G-ESGDemo/omnis-ui/components/esg-dashboard/index-amil.tsx
-
-Find the section that starts around line 918:
-                  <tbody>
-                    <tr className="hover:bg-gray-50">
-                      <td className="border border-gray-300 p-2">Green Energy Solutions Ltd</td>
-                      ...
-And ends around line 1148:
-                  </tbody>
-
-STEP 2: Replace with the new content
-------------------------------------
-Replace the ENTIRE <tbody>...</tbody> section with the content from:
-complete_table_rows.tsx
-
-The new content includes:
-- All 18 investments with proper financial data
-- Correct styling for bonds, real estate, and infrastructure
-- Calculated totals row
-- Proper currency formatting (£2.8m, £140m, £22.5b format)
-
-STEP 3: Verify the update
--------------------------
-After replacement, verify:
-✅ Total investments: 18 (13 bonds + 3 real estate + 2 infrastructure)
-✅ Total investment amount: £93.8m
-✅ Total EVIC: £84.3b (bonds only)
-✅ Portfolio ownership: 0.111%
-✅ Real estate rows have blue background (bg-blue-50)
-✅ Infrastructure rows have orange background (bg-orange-50)
-✅ PCAF scores ≥2.5 have red text (text-red-600)
-
-BENEFITS OF THIS UPDATE:
-------------------------
-🎯 Complete financial data population
-🎨 Consistent styling across asset classes
-📊 Accurate portfolio calculations
-🔢 Proper currency formatting
-📈 Real EVIC values for bonds
-💰 Actual ownership percentages
-🏷️ Correct investment names
-📋 Professional presentation
-""")
-
-def main():
+def main(argv=None):
     """Main function."""
-    
+
+    parser = argparse.ArgumentParser(description="Patch the DETAILED ASSET LEVEL ANALYSIS table into the dashboard")
+    parser.add_argument("--dashboard", default=DASHBOARD_FILE, help="Dashboard TSX file to patch")
+    parser.add_argument("--dry-run", action="store_true", help="Report whether the table would change without writing")
+    parser.add_argument("--skip-validation", action="store_true", help="Do not check the rows against the source data")
+    args = parser.parse_args(argv)
+
     print("=" * 80)
     print("TABLE UPDATE APPLICATION SCRIPT")
     print("=" * 80)
-    
-    # Apply the updates
-    success = apply_table_updates()
-    
+
+    success = apply_table_updates(args.dashboard, dry_run=args.dry_run, validate=not args.skip_validation)
+
     if success:
-        show_replacement_instructions()
-        
-        print("\n" + "="*60)
-        print("NEXT STEPS:")
-        print("="*60)
-        print("1. 📄 Review the generated complete_table_rows.tsx file")
-        print("2. 🔧 Use replace_string_in_file to update the dashboard")
-        print("3. 🧪 Test the dashboard to verify all data appears correctly")
-        print("4. 🚀 Deploy the updated dashboard")
-        
-        print("\n✨ Your table structure is ready for integration!")
-    else:
-        print("\n❌ Update preparation failed. Please check the error messages above.")
+        print("\n✨ Dashboard table patch stage complete!")
+        return 0
+
+    print("\n❌ Update failed. Please check the error messages above.")
+    return 1
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Currency Formatting Benchmark
+=============================
+
+Compares the per-element format_currency / format_large_currency apply used
+to build the CSV export against the bulk format_currency_column /
+format_large_currency_column API, and checks both produce identical strings.
+
+Usage:
+    python benchmark_currency_formatting.py [rows]
+"""
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from generate_complete_table_structure import (
+    format_currency,
+    format_currency_column,
+    format_large_currency,
+    format_large_currency_column,
+)
+
+def make_columns(rows, seed=42):
+    """Random investment amounts and EVIC values, with '-' for non-bond rows."""
+    
+    rng = np.random.default_rng(seed)
+    investment = rng.integers(1, 50_000_000, rows)
+    # Mix of round and arbitrary amounts across every formatting tier
+    investment[::3] = (investment[::3] // 100_000) * 100_000
+    evic = pd.Series(rng.integers(500, 50_000_000_000, rows), dtype=object)
+    evic[rng.random(rows) < 0.25] = '-'
+    return pd.Series(investment), evic
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"   {label:<40} {elapsed:8.3f}s")
+    return result, elapsed
+
+def main():
+    """Main function."""
+    
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    investment, evic = make_columns(rows)
+    
+    print("=" * 80)
+    print(f"CURRENCY FORMATTING BENCHMARK ({rows:,} rows)")
+    print("=" * 80)
+    
+    print("\n💰 Investment amount (format_currency):")
+    expected, apply_time = timed("per-element apply", lambda: investment.apply(format_currency))
+    actual, bulk_time = timed("format_currency_column", lambda: format_currency_column(investment))
+    investment_match = list(expected) == list(actual)
+    
+    print("\n🏦 EVIC (format_large_currency, '-' passthrough):")
+    expected_evic, evic_apply_time = timed(
+        "per-element apply",
+        lambda: evic.apply(lambda x: format_large_currency(x) if isinstance(x, (int, float)) else x)
+    )
+    actual_evic, evic_bulk_time = timed("format_large_currency_column", lambda: format_large_currency_column(evic))
+    evic_match = list(expected_evic) == list(actual_evic)
+    
+    print(f"\n📊 Speed-up: {apply_time / bulk_time:.1f}x (investment), "
+          f"{evic_apply_time / evic_bulk_time:.1f}x (EVIC)")
+    print(f"{'✅' if investment_match and evic_match else '❌'} Identical output: "
+          f"investment={investment_match}, evic={evic_match}")
+    
+    return 0 if investment_match and evic_match else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+PCAF Financed Emissions Calculator
+==================================
+
+This script applies the three PCAF attribution formulas from
+emission_calculation_extracted.md to a holdings table in one vectorized pass:
+
+1. Corporate bonds / listed equity:
+   Financed Emissions = (Investment Value / EVIC) × Company Emissions
+2. Real estate equity:
+   Financed Emissions = Ownership Share × Property Emissions
+3. Infrastructure (project finance):
+   Financed Emissions = (Share of Project Financing / Total Project Cost) × Project Emissions
+
+The holdings table uses the complete_investment_data.csv schema
+(name, sector, asset_class, investment_amount, evic, ownership, ...) extended with:
+
+- emissions:           issuer / property / project emissions (tCO2e)
+- total_project_cost:  optional, infrastructure only; when missing the
+                       ownership share is used as the financing share
+
+The emissions column is required. The default input,
+complete_investment_data.csv, has none, so pass a holdings table that has
+emissions (e.g. the S5 or D3 stage output joined onto the holdings).
+
+Usage:
+    python calculate_financed_emissions.py [holdings.csv]
+"""
+
+import sys
+import numpy as np
+import pandas as pd
+
+from holdings_model import (
+    ASSET_CLASS_BOND,
+    ASSET_CLASS_INFRASTRUCTURE,
+    ASSET_CLASS_REAL_ESTATE,
+    parse_percentage_array,
+    to_numeric_array,
+)
+
+def attribution_factors(asset_class, investment_amount, evic, ownership, total_project_cost=None):
+    """Return the PCAF attribution factor for every holding.
+
+    All arguments are equal-length arrays. Holdings with an unknown asset
+    class or missing inputs get NaN.
+    """
+
+    asset_class = np.asarray(asset_class, dtype=object)
+    investment_amount = np.asarray(investment_amount, dtype=np.float64)
+    evic = np.asarray(evic, dtype=np.float64)
+    ownership = np.asarray(ownership, dtype=np.float64)
+
+    is_bond = asset_class == ASSET_CLASS_BOND
+    is_real_estate = asset_class == ASSET_CLASS_REAL_ESTATE
+    is_infrastructure = asset_class == ASSET_CLASS_INFRASTRUCTURE
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bond_factor = np.where(evic > 0, investment_amount / evic, np.nan)
+
+        if total_project_cost is None:
+            project_factor = ownership
+        else:
+            total_project_cost = np.asarray(total_project_cost, dtype=np.float64)
+            project_factor = np.where(total_project_cost > 0,
+                                      investment_amount / total_project_cost,
+                                      ownership)
+
+    return np.select(
+        [is_bond, is_real_estate, is_infrastructure],
+        [bond_factor, ownership, project_factor],
+        default=np.nan
+    )
+
+def holding_financed_emissions(holdings):
+    """Financed emissions per holding of a typed holdings frame (see holdings_model).
+
+    Uses the optional emissions and total_project_cost columns; NaN
+    without an emissions column.
+    """
+
+    if 'emissions' not in holdings.columns:
+        return np.full(len(holdings), np.nan)
+    total_project_cost = (to_numeric_array(holdings['total_project_cost'])
+                          if 'total_project_cost' in holdings.columns else None)
+    factors = attribution_factors(holdings['asset_class'].to_numpy(dtype=object),
+                                  holdings['investment_amount'].to_numpy(dtype=np.float64),
+                                  holdings['evic'].to_numpy(dtype=np.float64),
+                                  holdings['ownership'].to_numpy(dtype=np.float64),
+                                  total_project_cost)
+    return factors * to_numeric_array(holdings['emissions'])
+
+def _grouped_sums(keys, *columns):
+    """Sum each column per distinct key with np.bincount (NaNs count as 0).
+
+    Missing keys are grouped under 'Unspecified', as in the emissions cube.
+    """
+
+    codes, labels = pd.factorize(pd.Series(keys, dtype=object).fillna('Unspecified'), sort=True)
+    sums = [
+        np.bincount(codes, weights=np.nan_to_num(column), minlength=len(labels))
+        for column in columns
+    ]
+    counts = np.bincount(codes, minlength=len(labels))
+    return list(labels), counts, sums
+
+def _intensity(emissions, investment):
+    """Financed emissions per £m invested."""
+    return float(emissions / (investment / 1_000_000)) if investment else None
+
+def calculate_financed_emissions(holdings):
+    """Calculate per-holding and aggregated financed emissions.
+
+    Returns (per_holding, aggregates): per_holding is a copy of the input
+    with ownership_fraction, attribution_factor and financed_emissions
+    columns added; aggregates holds the portfolio total plus breakdowns
+    by asset class and sector.
+    """
+
+    if 'emissions' not in holdings.columns:
+        raise ValueError("Holdings table needs an 'emissions' column (tCO2e per issuer/asset)")
+
+    investment_amount = to_numeric_array(holdings['investment_amount'])
+    evic = to_numeric_array(holdings['evic'])
+    ownership = parse_percentage_array(holdings['ownership'])
+    emissions = to_numeric_array(holdings['emissions'])
+    total_project_cost = (to_numeric_array(holdings['total_project_cost'])
+                          if 'total_project_cost' in holdings.columns else None)
+
+    factors = attribution_factors(holdings['asset_class'].to_numpy(dtype=object),
+                                  investment_amount, evic, ownership, total_project_cost)
+    financed = factors * emissions
+
+    per_holding = holdings.copy()
+    per_holding['ownership_fraction'] = ownership
+    per_holding['attribution_factor'] = factors
+    per_holding['financed_emissions'] = financed
+
+    calculated = ~np.isnan(financed)
+    total_emissions = float(np.nansum(financed))
+    total_investment = float(np.nansum(investment_amount))
+
+    aggregates = {
+        'total_financed_emissions': total_emissions,
+        'total_investment': total_investment,
+        'intensity_tco2e_per_gbp_m': _intensity(total_emissions, total_investment),
+        'holding_count': int(len(holdings)),
+        'calculated_count': int(calculated.sum()),
+        'missing_count': int((~calculated).sum()),
+    }
+
+    for key in ('asset_class', 'sector'):
+        if key not in holdings.columns:
+            continue
+        labels, counts, (emission_sums, investment_sums) = _grouped_sums(
+            holdings[key].to_numpy(dtype=object), financed, investment_amount)
+        aggregates[f'by_{key}'] = {
+            label: {
+                'financed_emissions': float(emission_sums[i]),
+                'investment': float(investment_sums[i]),
+                'intensity_tco2e_per_gbp_m': _intensity(emission_sums[i], investment_sums[i]),
+                'holding_count': int(counts[i]),
+            }
+            for i, label in enumerate(labels)
+        }
+
+    return per_holding, aggregates
+
+def main():
+    """Main function."""
+
+    holdings_file = sys.argv[1] if len(sys.argv) > 1 else 'complete_investment_data.csv'
+
+    print("=" * 80)
+    print("PCAF FINANCED EMISSIONS CALCULATOR")
+    print("=" * 80)
+
+    holdings = pd.read_csv(holdings_file)
+
+    try:
+        per_holding, aggregates = calculate_financed_emissions(holdings)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        print("💡 Pass a holdings CSV with an 'emissions' column: python calculate_financed_emissions.py holdings.csv")
+        return 1
+
+    per_holding.to_csv('financed_emissions_by_holding.csv', index=False)
+
+    print(f"📄 Holdings file: {holdings_file}")
+    print(f"📊 Holdings calculated: {aggregates['calculated_count']} of {aggregates['holding_count']}")
+    if aggregates['missing_count']:
+        print(f"⚠️  Missing inputs (emissions/EVIC/ownership): {aggregates['missing_count']}")
+    print(f"🌍 Total financed emissions: {aggregates['total_financed_emissions']:,.1f} tCO2e")
+    if aggregates['intensity_tco2e_per_gbp_m'] is not None:
+        print(f"📈 Intensity: {aggregates['intensity_tco2e_per_gbp_m']:,.2f} tCO2e/£m")
+
+    print("\nBY ASSET CLASS:")
+    for asset_class, values in aggregates.get('by_asset_class', {}).items():
+        print(f"   {asset_class:<35} {values['financed_emissions']:>14,.1f} tCO2e")
+
+    print("\n✅ Per-holding results saved to: financed_emissions_by_holding.csv")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Benchmark Comparison (V3)
+=========================
+
+Implements V3 "Compare Against Expectations": every portfolio slice is
+compared with indexed benchmark tables in one batched pass.
+
+Slices are sector × asset class, plus the roll-ups per sector, per asset
+class and for the whole portfolio ('*' stands for "all"). For each slice
+the stage computes holding count, investment, financed emissions, intensity
+(tCO2e/£m) and investment-weighted PCAF score and data mix, then joins the
+benchmarks by (sector, asset_class) key.
+
+Benchmark sets:
+
+- Existing L&G portfolio (ESC_Data_Quality.csv): PCAF 2.3, data mix
+  85/20/5, 90% bonds, PCAF 2.2 for bonds and 2.6 for real estate and
+  infrastructure; total financed emissions of 4,900,000 tCO2e from the
+  2024 L&G Sustainability Report
+- Sector intensity ranges: low/high tCO2e/£m per (sector, asset_class),
+  from a CSV or derived from the D2F benchmarks in the D2G dataset
+
+Intensive metrics (scores, mix, intensity ranges) fall back from the exact
+slice to (sector, '*'), ('*', asset_class) and ('*', '*'); extensive ones
+(financed emissions, portfolio share) only match their exact slice.
+
+Usage:
+    python compare_against_benchmarks.py [holdings.csv] [--ranges FILE] [--d2g FILE]
+"""
+
+import argparse
+import csv
+import sys
+import numpy as np
+import pandas as pd
+
+from calculate_financed_emissions import attribution_factors
+from holdings_model import (
+    ASSET_CLASS_BOND,
+    ASSET_CLASS_INFRASTRUCTURE,
+    ASSET_CLASS_REAL_ESTATE,
+    parse_percentage_array,
+    to_numeric_array,
+)
+
+ALL = '*'
+SLICE_KEYS = ['sector', 'asset_class']
+
+ESC_DATA_QUALITY_FILE = 'ESC_Data_Quality.csv'
+ESC_BENCHMARK_ROW = 'Existing L&G Portfolio'
+LG_2024_FINANCED_EMISSIONS = 4_900_000  # tCO2e, 2024 L&G Sustainability Report
+
+# ESC_Data_Quality.csv header -> [(asset_class, metric), ...] for each column
+# carrying that header; the asset class split table repeats the bond PCAF
+# header for its real estate and infrastructure column
+ESC_HEADER_METRICS = {
+    'PCAF Data Score': [(ALL, 'pcaf_score')],
+    'Primary Data': [(ALL, 'primary')],
+    'Secondary Data': [(ALL, 'secondary')],
+    'Estimates': [(ALL, 'estimated')],
+    'Asset Class - Bond %': [(ASSET_CLASS_BOND, 'portfolio_share')],
+    'PCAF Data Quality Score - Bond': [
+        (ASSET_CLASS_BOND, 'pcaf_score'),
+        ((ASSET_CLASS_REAL_ESTATE, ASSET_CLASS_INFRASTRUCTURE), 'pcaf_score'),
+    ],
+}
+
+BENCHMARK_METRICS = ['pcaf_score', 'primary', 'secondary', 'estimated',
+                     'financed_emissions', 'portfolio_share', 'intensity_low', 'intensity_high']
+EXACT_ONLY_METRICS = ['financed_emissions', 'portfolio_share']
+DELTA_METRICS = ['pcaf_score', 'primary', 'secondary', 'estimated', 'financed_emissions', 'portfolio_share']
+
+def _benchmark_table(entries):
+    """Index (sector, asset_class, metric, value) entries as one row per slice."""
+
+    frame = pd.DataFrame(entries, columns=SLICE_KEYS + ['metric', 'value'])
+    table = frame.pivot_table(index=SLICE_KEYS, columns='metric', values='value', aggfunc='last')
+    return table.reindex(columns=BENCHMARK_METRICS)
+
+def load_esc_benchmarks(csv_file=ESC_DATA_QUALITY_FILE, row_label=ESC_BENCHMARK_ROW):
+    """Read the existing-portfolio benchmarks from ESC_Data_Quality.csv.
+
+    Each row labelled row_label is read against the header row above it.
+    """
+
+    entries = []
+    header = None
+    with open(csv_file, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.reader(f):
+            cells = [cell.strip() for cell in row]
+            label = cells[1] if len(cells) > 1 else ''
+            if not label and any(cells[2:]):
+                header = cells
+                continue
+            if label != row_label or header is None:
+                continue
+
+            seen = {}
+            for position, title in enumerate(header):
+                targets = ESC_HEADER_METRICS.get(title)
+                if not targets or position >= len(cells) or not cells[position]:
+                    continue
+                asset_classes, metric = targets[min(seen.get(title, 0), len(targets) - 1)]
+                seen[title] = seen.get(title, 0) + 1
+                # '82% (13 out of 18 assets)' -> '82%'
+                value = parse_percentage_array([cells[position].split(' ')[0]])[0]
+                for asset_class in np.atleast_1d(asset_classes):
+                    entries.append((ALL, asset_class, metric, value))
+
+    entries.append((ALL, ALL, 'financed_emissions', float(LG_2024_FINANCED_EMISSIONS)))
+    return _benchmark_table(entries)
+
+def load_intensity_ranges(csv_file):
+    """Read sector intensity ranges (sector, [asset_class], intensity_low, intensity_high)."""
+
+    ranges = pd.read_csv(csv_file)
+    if 'asset_class' not in ranges.columns:
+        ranges['asset_class'] = ALL
+    return ranges_table(ranges)
+
+def intensity_ranges_from_benchmarks(d2g, tolerance=2.0):
+    """Derive per-sector ranges from the D2F benchmark intensities in a D2G dataset.
+
+    The range is benchmark / tolerance .. benchmark × tolerance.
+    """
+
+    benchmarks = d2g.groupby('sector')['benchmark_intensity_tco2e_per_gbp_m'].median().dropna()
+    return ranges_table(pd.DataFrame({
+        'sector': benchmarks.index,
+        'asset_class': ALL,
+        'intensity_low': benchmarks.to_numpy() / tolerance,
+        'intensity_high': benchmarks.to_numpy() * tolerance,
+    }))
+
+def ranges_table(ranges):
+    """Index a sector ranges frame like the other benchmark tables."""
+
+    entries = []
+    for metric in ('intensity_low', 'intensity_high'):
+        part = ranges[SLICE_KEYS + [metric]].rename(columns={metric: 'value'})
+        part.insert(2, 'metric', metric)
+        entries.append(part)
+    frame = pd.concat(entries, ignore_index=True)
+    frame['asset_class'] = frame['asset_class'].fillna(ALL)
+    return _benchmark_table(frame.itertuples(index=False, name=None))
+
+def combine_benchmarks(*tables):
+    """Merge benchmark tables; later tables win where both define a value."""
+
+    combined = None
+    for table in tables:
+        if table is None:
+            continue
+        combined = table if combined is None else table.combine_first(combined)
+    return combined.reindex(columns=BENCHMARK_METRICS)
+
+def slice_metrics(holdings):
+    """Metrics for every sector × asset class slice and all roll-ups, in one grouped pass."""
+
+    count = len(holdings)
+    investment = to_numeric_array(holdings['investment_amount'])
+    asset_class = holdings['asset_class'].astype(object).to_numpy()
+
+    if 'financed_emissions' in holdings.columns:
+        financed = to_numeric_array(holdings['financed_emissions'])
+    elif 'emissions' in holdings.columns:
+        evic = to_numeric_array(holdings['evic'])
+        ownership = parse_percentage_array(holdings['ownership'])
+        financed = attribution_factors(asset_class, investment, evic, ownership) * to_numeric_array(holdings['emissions'])
+    else:
+        financed = np.full(count, np.nan)
+
+    weighted = {
+        metric: (to_numeric_array(holdings[metric]) if metric == 'pcaf_score'
+                 else parse_percentage_array(holdings[metric]))
+        for metric in ('pcaf_score', 'primary', 'secondary', 'estimated') if metric in holdings.columns
+    }
+
+    sector_codes, sectors = pd.factorize(holdings['sector'].astype(object), use_na_sentinel=False)
+    class_codes, classes = pd.factorize(pd.Series(asset_class), use_na_sentinel=False)
+    sectors = np.append(np.asarray(sectors, dtype=object), ALL)
+    classes = np.append(np.asarray(classes, dtype=object), ALL)
+    all_sector, all_class = len(sectors) - 1, len(classes) - 1
+
+    # Stack each holding four times - exact slice and the three roll-ups -
+    # so every slice is summed by one bincount per column
+    stacked_sector = np.concatenate([sector_codes, sector_codes, np.full(count, all_sector), np.full(count, all_sector)])
+    stacked_class = np.concatenate([class_codes, np.full(count, all_class), class_codes, np.full(count, all_class)])
+    codes, slice_index = pd.factorize(stacked_sector * len(classes) + stacked_class, sort=True)
+    slices = len(slice_index)
+
+    def sums(values):
+        return np.bincount(codes, weights=np.tile(np.nan_to_num(values), 4), minlength=slices)
+
+    total_investment = float(np.nansum(investment))
+    metrics = pd.DataFrame({
+        'sector': sectors[slice_index // len(classes)],
+        'asset_class': classes[slice_index % len(classes)],
+        'holding_count': np.bincount(codes, minlength=slices),
+        'investment': sums(investment),
+        'financed_emissions': sums(financed),
+    })
+    emissions_known = sums(~np.isnan(financed)) > 0
+    metrics.loc[~emissions_known, 'financed_emissions'] = np.nan
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metrics['intensity'] = metrics['financed_emissions'] / (metrics['investment'] / 1_000_000)
+        metrics['portfolio_share'] = metrics['investment'] / total_investment
+        for metric, values in weighted.items():
+            present = ~np.isnan(values)
+            metrics[metric] = sums(np.where(present, values * investment, 0)) / sums(np.where(present, investment, 0))
+
+    return metrics
+
+def _lookup(benchmarks, sectors, asset_classes):
+    """Benchmark rows for the given keys (NaN where the key is absent)."""
+    index = pd.MultiIndex.from_arrays([sectors, asset_classes], names=SLICE_KEYS)
+    return benchmarks.reindex(index).reset_index(drop=True)
+
+def compare_slices(metrics, benchmarks):
+    """Join benchmarks onto slice metrics and compute deltas and range status."""
+
+    sectors = metrics['sector'].to_numpy(dtype=object)
+    asset_classes = metrics['asset_class'].to_numpy(dtype=object)
+    wildcard = np.full(len(metrics), ALL, dtype=object)
+
+    matched = _lookup(benchmarks, sectors, asset_classes)
+    exact = matched[EXACT_ONLY_METRICS].copy()
+    for fallback_sectors, fallback_classes in ((sectors, wildcard), (wildcard, asset_classes), (wildcard, wildcard)):
+        matched = matched.combine_first(_lookup(benchmarks, fallback_sectors, fallback_classes))
+    matched[EXACT_ONLY_METRICS] = exact
+
+    comparison = metrics.reset_index(drop=True).copy()
+    for metric in BENCHMARK_METRICS:
+        comparison[f'benchmark_{metric}'] = matched[metric].to_numpy(dtype=np.float64)
+    for metric in DELTA_METRICS:
+        if metric in comparison.columns:
+            comparison[f'delta_{metric}'] = comparison[metric] - comparison[f'benchmark_{metric}']
+
+    intensity = comparison['intensity'].to_numpy(dtype=np.float64)
+    low = comparison['benchmark_intensity_low'].to_numpy()
+    high = comparison['benchmark_intensity_high'].to_numpy()
+    status = np.full(len(comparison), None, dtype=object)
+    checked = ~np.isnan(intensity) & (~np.isnan(low) | ~np.isnan(high))
+    status[checked] = 'within'
+    status[checked & (intensity < low)] = 'below'
+    status[checked & (intensity > high)] = 'above'
+    comparison['range_status'] = status
+    return comparison
+
+def compare_against_benchmarks(holdings, benchmarks):
+    """Slice the holdings and compare every slice with the benchmarks."""
+    return compare_slices(slice_metrics(holdings), benchmarks)
+
+def _percent(value):
+    return '-' if pd.isna(value) else f"{value * 100:.0f}%"
+
+def _number(value, decimals=1):
+    return '-' if pd.isna(value) else f"{value:,.{decimals}f}"
+
+def main(argv=None):
+    """Main function."""
+
+    parser = argparse.ArgumentParser(description="V3: compare portfolio slices against benchmarks")
+    parser.add_argument("holdings_file", nargs="?", default="complete_investment_data.csv",
+                        help="Holdings CSV (complete_investment_data.csv schema, optional emissions)")
+    parser.add_argument("--esc", default=ESC_DATA_QUALITY_FILE, help="ESC data quality CSV with the L&G benchmarks")
+    parser.add_argument("--ranges", help="CSV of sector intensity ranges (sector, asset_class, intensity_low, intensity_high)")
+    parser.add_argument("--d2g", help="D2G dataset to derive sector ranges from the D2F benchmarks")
+    parser.add_argument("--output", default="v3_benchmark_comparison.csv", help="Comparison CSV to write")
+    args = parser.parse_args(argv)
+
+    print("=" * 80)
+    print("BENCHMARK COMPARISON (V3)")
+    print("=" * 80)
+
+    tables = [load_esc_benchmarks(args.esc)]
+    if args.d2g:
+        tables.append(intensity_ranges_from_benchmarks(pd.read_csv(args.d2g)))
+    if args.ranges:
+        tables.append(load_intensity_ranges(args.ranges))
+    benchmarks = combine_benchmarks(*tables)
+
+    holdings = pd.read_csv(args.holdings_file, dtype={'ownership': str, 'evic': str})
+    comparison = compare_against_benchmarks(holdings, benchmarks)
+    comparison.to_csv(args.output, index=False)
+
+    print(f"📄 Holdings file: {args.holdings_file} ({len(holdings)} holdings)")
+    print(f"📊 Slices compared: {len(comparison)} | Benchmark keys: {len(benchmarks)}")
+
+    portfolio = comparison[(comparison['sector'] == ALL) & (comparison['asset_class'] == ALL)].iloc[0]
+    print("\nPORTFOLIO VS EXISTING L&G PORTFOLIO:")
+    print(f"   PCAF data quality score: {_number(portfolio['pcaf_score'], 2)} "
+          f"vs {_number(portfolio['benchmark_pcaf_score'], 1)} ({portfolio['delta_pcaf_score']:+.2f})")
+    for metric in ('primary', 'secondary', 'estimated'):
+        print(f"   {metric.title()} data: {_percent(portfolio[metric])} vs {_percent(portfolio[f'benchmark_{metric}'])}")
+    print(f"   Financed emissions: {_number(portfolio['financed_emissions'], 0)} tCO2e "
+          f"vs {_number(portfolio['benchmark_financed_emissions'], 0)} tCO2e (2024 L&G Sustainability Report)")
+
+    print("\nBY ASSET CLASS:")
+    by_class = comparison[(comparison['sector'] == ALL) & (comparison['asset_class'] != ALL)]
+    for _, row in by_class.iterrows():
+        print(f"   {row['asset_class']:<35} PCAF {_number(row['pcaf_score'], 2)} vs {_number(row['benchmark_pcaf_score'], 1)}"
+              f" | share {_percent(row['portfolio_share'])} vs {_percent(row['benchmark_portfolio_share'])}")
+
+    violations = comparison['range_status'].isin(['below', 'above'])
+    checked = comparison['range_status'].notna()
+    print(f"\n📏 Intensity range checks: {int(checked.sum())} slices checked, {int(violations.sum())} outside range")
+    print(f"\n✅ Comparison saved to: {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
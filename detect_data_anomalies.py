@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Data Anomaly Detection (V2)
+===========================
+
+Implements V2 "Identify Anomalies and Inconsistencies" from
+data_validation_agents_description.md as grouped, vectorized checks over a
+holdings table:
+
+1. Missing data fields:  blank emissions, missing EVIC for bonds
+2. Outlier detection:    financed emission intensity (tCO2e/£m invested)
+                         against sector × asset class peers, using robust
+                         z-scores (median / MAD) on log10 intensity
+3. Consistency:          the same issuer (ISIN, else name) must carry
+                         identical emissions and EVIC on every holding
+4. Unit alignment:       non-tCO2e units, mixed emission scopes per issuer,
+                         ~1000x intensity gaps to peers (kg vs t), ownership
+                         outside 0-100%, bond EVIC below the amount invested,
+                         data mix not summing to 100%
+
+The holdings table uses the complete_investment_data.csv schema, optionally
+extended with emissions, financed_emissions, isin, emissions_unit and
+emissions_scope. Every holding without emissions is catalogued as missing;
+the other checks are skipped when their input columns are absent.
+
+The result is a structured issues table, one row per finding:
+check, severity, row, name, field, value, expected, detail
+
+Usage:
+    python detect_data_anomalies.py [holdings.csv] [--output data_issues.csv]
+"""
+
+import argparse
+import sys
+import numpy as np
+import pandas as pd
+
+from calculate_financed_emissions import attribution_factors
+from holdings_model import ASSET_CLASS_BOND, parse_percentage_array, to_numeric_array
+
+ISSUE_COLUMNS = ['check', 'severity', 'row', 'name', 'field', 'value', 'expected', 'detail']
+
+ROBUST_Z_THRESHOLD = 3.5   # Iglewicz & Hoaglin cut-off for modified z-scores
+MIN_PEERS = 5              # smaller peer groups are not scored
+UNIT_MIX_LOG10 = 3.0       # 1000x from the peer median suggests kg vs t
+UNIT_MIX_TOLERANCE = 0.35
+DATA_MIX_TOLERANCE = 0.011 # rounded percentages may miss 100% by a point
+
+EMISSIONS_UNIT = 'tco2e'
+
+def _issues(check, severity, mask, names, field, value=None, expected=None, detail=''):
+    """Build the issue rows for every True position of mask."""
+
+    rows = np.flatnonzero(mask)
+    if len(rows) == 0:
+        return None
+
+    def pick(values):
+        if values is None:
+            return np.full(len(rows), np.nan)
+        values = np.asarray(values)
+        return values[rows] if values.ndim else np.full(len(rows), values)
+
+    return pd.DataFrame({
+        'check': check,
+        'severity': severity,
+        'row': rows,
+        'name': names[rows],
+        'field': field,
+        'value': pick(value),
+        'expected': pick(expected),
+        'detail': detail,
+    })
+
+def _group_codes(*columns):
+    """Combine categorical columns into one integer group code per row."""
+
+    codes = np.zeros(len(columns[0]), dtype=np.int64)
+    for column in columns:
+        column_codes, uniques = pd.factorize(pd.Series(column), use_na_sentinel=False)
+        codes = codes * (len(uniques) + 1) + column_codes
+    return codes
+
+def robust_z_scores(values, groups, min_peers=MIN_PEERS):
+    """Modified z-scores 0.6745 * (x - median) / MAD within each group.
+
+    NaN values are ignored; groups with fewer than min_peers values or a
+    zero MAD get NaN scores. Also returns the group medians per row.
+    """
+
+    series = pd.Series(values)
+    grouped = series.groupby(groups)
+    medians = grouped.transform('median').to_numpy()
+    deviations = np.abs(series.to_numpy() - medians)
+    mad = pd.Series(deviations).groupby(groups).transform('median').to_numpy()
+    peers = grouped.transform('count').to_numpy()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = 0.6745 * (series.to_numpy() - medians) / mad
+    scores[(peers < min_peers) | ~(mad > 0)] = np.nan
+    return scores, medians
+
+def _text(holdings, column):
+    """Column as an object array of stripped strings (NaN where missing)."""
+    values = holdings[column].astype(object)
+    return values.where(values.isna(), values.astype(str).str.strip()).to_numpy(dtype=object)
+
+def detect_anomalies(holdings, z_threshold=ROBUST_Z_THRESHOLD, min_peers=MIN_PEERS):
+    """Run every V2 check and return the issues table (see ISSUE_COLUMNS)."""
+
+    count = len(holdings)
+    names = holdings['name'].astype(object).to_numpy() if 'name' in holdings.columns else np.arange(count).astype(object)
+    asset_class = holdings['asset_class'].astype(object).to_numpy()
+    sector = holdings['sector'].astype(object).to_numpy() if 'sector' in holdings.columns else np.full(count, None)
+    is_bond = asset_class == ASSET_CLASS_BOND
+
+    investment = to_numeric_array(holdings['investment_amount'])
+    evic = to_numeric_array(holdings['evic']) if 'evic' in holdings.columns else np.full(count, np.nan)
+    ownership = parse_percentage_array(holdings['ownership']) if 'ownership' in holdings.columns else np.full(count, np.nan)
+    has_emissions = 'emissions' in holdings.columns
+    emissions = to_numeric_array(holdings['emissions']) if has_emissions else np.full(count, np.nan)
+
+    found = []
+
+    # 1. Missing data fields
+    found.append(_issues('missing_emissions', 'error', np.isnan(emissions), names, 'emissions',
+                         detail='No emissions reported or acquired'))
+    found.append(_issues('missing_evic', 'error', is_bond & np.isnan(evic), names, 'evic',
+                         detail='Bond without EVIC; attribution factor cannot be computed'))
+    found.append(_issues('negative_value', 'error', emissions < 0, names, 'emissions', emissions,
+                         detail='Emissions must not be negative'))
+
+    # 2. Outliers: log10 financed emission intensity vs sector × asset class peers
+    if 'financed_emissions' in holdings.columns:
+        financed = to_numeric_array(holdings['financed_emissions'])
+    else:
+        total_project_cost = (to_numeric_array(holdings['total_project_cost'])
+                              if 'total_project_cost' in holdings.columns else None)
+        financed = attribution_factors(asset_class, investment, evic, ownership, total_project_cost) * emissions
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        intensity = financed / (investment / 1_000_000)
+        log_intensity = np.where(intensity > 0, np.log10(intensity), np.nan)
+
+    groups = _group_codes(sector, asset_class)
+    scores, medians = robust_z_scores(log_intensity, groups, min_peers)
+    log_gap = log_intensity - medians
+
+    unit_mix = np.abs(np.abs(log_gap) - UNIT_MIX_LOG10) <= UNIT_MIX_TOLERANCE
+    outlier = (np.abs(scores) > z_threshold) & ~unit_mix
+    found.append(_issues('intensity_outlier', 'warning', outlier & (scores > 0), names,
+                         'intensity_tco2e_per_gbp_m', intensity, 10 ** medians,
+                         detail='Intensity far above sector/asset class peers'))
+    found.append(_issues('intensity_outlier', 'warning', outlier & (scores < 0), names,
+                         'intensity_tco2e_per_gbp_m', intensity, 10 ** medians,
+                         detail='Intensity far below sector/asset class peers'))
+    found.append(_issues('unit_mismatch', 'error', unit_mix & ~np.isnan(scores), names,
+                         'emissions', emissions, emissions / 10 ** np.round(log_gap),
+                         detail='Intensity ~1000x from peers; emissions may be in kg or kt rather than t'))
+
+    # 3. Consistency: one issuer, one set of emissions / EVIC across holdings
+    issuer_column = 'isin' if 'isin' in holdings.columns else 'name'
+    issuer = _text(holdings, issuer_column)
+    issuer_codes, _ = pd.factorize(pd.Series(issuer), use_na_sentinel=True)
+    keyed = issuer_codes >= 0
+    for field, values in (('emissions', emissions), ('evic', evic)):
+        if field == 'emissions' and not has_emissions:
+            continue
+        frame = pd.DataFrame({'issuer': issuer_codes[keyed], 'value': values[keyed]})
+        grouped = frame.groupby('issuer')['value']
+        size = grouped.transform('size').to_numpy()
+        present = grouped.transform('count').to_numpy()
+        # Differing values, or a value on some holdings but not others;
+        # issuers missing the field everywhere are left to check 1
+        inconsistent = (
+            (grouped.transform('min').to_numpy() != grouped.transform('max').to_numpy())
+            | (present != size)
+        ) & (size > 1) & (present > 0)
+        mask = np.zeros(count, dtype=bool)
+        mask[np.flatnonzero(keyed)[inconsistent]] = True
+        found.append(_issues('inconsistent_issuer_data', 'error', mask, names, field, values,
+                             detail=f'Same issuer ({issuer_column}) has different {field} across holdings'))
+
+    # 4. Unit alignment
+    if 'emissions_unit' in holdings.columns:
+        units = pd.Series(_text(holdings, 'emissions_unit')).str.lower().str.replace('₂', '2').str.replace(' ', '')
+        found.append(_issues('unit_mismatch', 'error', (units.notna() & (units != EMISSIONS_UNIT)).to_numpy(),
+                             names, 'emissions_unit',
+                             detail='Emissions not reported in tCO2e; convert before aggregation'))
+
+    if 'emissions_scope' in holdings.columns and len(issuer):
+        scopes = pd.Series(_text(holdings, 'emissions_scope'))
+        scope_count = scopes.groupby(issuer_codes).transform('nunique').to_numpy()
+        found.append(_issues('mixed_scopes', 'error', keyed & (scope_count > 1), names, 'emissions_scope',
+                             detail='Same issuer reported with different emission scopes'))
+
+    found.append(_issues('ownership_range', 'error', (ownership <= 0) | (ownership > 1), names, 'ownership',
+                         ownership, detail='Ownership share outside 0-100%; check percentage units'))
+    found.append(_issues('evic_below_investment', 'error', is_bond & (evic < investment), names, 'evic', evic,
+                         investment, detail='EVIC smaller than the amount invested; EVIC may be in £m'))
+
+    mix_columns = [column for column in ('primary', 'secondary', 'estimated') if column in holdings.columns]
+    if len(mix_columns) == 3:
+        mix_total = sum(parse_percentage_array(holdings[column]) for column in mix_columns)
+        found.append(_issues('data_mix_total', 'warning', np.abs(mix_total - 1.0) > DATA_MIX_TOLERANCE, names,
+                             'primary+secondary+estimated', mix_total, 1.0,
+                             detail='Data quality mix does not sum to 100%'))
+
+    found = [frame for frame in found if frame is not None]
+    if not found:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    return pd.concat(found, ignore_index=True)[ISSUE_COLUMNS]
+
+def summarize_issues(issues, holding_count=None):
+    """One line per check, e.g. '10 investments with missing emissions'."""
+
+    lines = []
+    for (check, severity), group in issues.groupby(['check', 'severity'], sort=False):
+        holdings = group['row'].nunique()
+        lines.append(f"{holdings} investment{'s' if holdings != 1 else ''} "
+                     f"with {check.replace('_', ' ')} ({severity})")
+    if holding_count is not None:
+        flagged = issues['row'].nunique()
+        lines.append(f"{flagged} of {holding_count} investments flagged")
+    return lines
+
+def main(argv=None):
+    """Main function."""
+
+    parser = argparse.ArgumentParser(description="V2: identify anomalies and inconsistencies in holdings data")
+    parser.add_argument("holdings_file", nargs="?", default="complete_investment_data.csv",
+                        help="Holdings CSV (complete_investment_data.csv schema)")
+    parser.add_argument("--output", default="data_issues.csv", help="Issues CSV to write")
+    parser.add_argument("--z-threshold", type=float, default=ROBUST_Z_THRESHOLD,
+                        help="Robust z-score above which an intensity is an outlier")
+    args = parser.parse_args(argv)
+
+    print("=" * 80)
+    print("DATA ANOMALY DETECTION (V2)")
+    print("=" * 80)
+
+    holdings = pd.read_csv(args.holdings_file, dtype={'ownership': str, 'evic': str})
+    print(f"📄 Holdings file: {args.holdings_file} ({len(holdings)} holdings)")
+    if 'emissions' not in holdings.columns:
+        print("⚠️  No emissions column: intensity and emissions checks will report every holding as missing")
+
+    issues = detect_anomalies(holdings, z_threshold=args.z_threshold)
+    issues.to_csv(args.output, index=False)
+
+    print("\nDATA ISSUES:")
+    for line in summarize_issues(issues, len(holdings)):
+        print(f"   - {line}")
+
+    errors = int((issues['severity'] == 'error').sum())
+    warnings = int((issues['severity'] == 'warning').sum())
+    print(f"\n✅ {len(issues)} issues ({errors} errors, {warnings} warnings) saved to: {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Emission Factor Library
+=======================
+
+Indexed emission factor (EF) lookup for "Apply Emission Factors" in
+emission_calculation_extracted.md: select the EF by activity type, region
+and material, then Emissions = Activity × EF.
+
+A factor table (DEFRA / Ecoinvent style: key columns, numeric factor
+columns and text attributes such as unit and source) is loaded once into a
+compact structure:
+
+- every key column is dictionary-encoded; '*' in a table row is a wildcard
+- each row's encoded key is packed into one int64 and kept in a sorted
+  index
+- fallbacks are an ordered list of key-column subsets. For activity /
+  region / material lookups that is specific (all three) → regional
+  (activity, region) → global (activity, material) → global (activity)
+- the resolution map - the resolved row for every combination of known key
+  values, unknown values included - is precomputed, so a batch lookup is a
+  single array gather. Tables whose key space is too large for a dense map
+  resolve the distinct query keys through the sorted index instead
+
+Libraries can be saved as one binary file and reopened memory-mapped, so
+startup costs a header read regardless of table size.
+
+The built-in table is an illustrative placeholder in DEFRA units; load the
+real conversion factor set with --factors.
+
+Usage:
+    python emission_factor_library.py [--factors factors.csv] [--save factors.eflib]
+                                      [--open factors.eflib] [--apply activities.csv]
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+ALL = '*'
+KEY_COLUMNS = ['activity', 'region', 'material']
+DEFAULT_FALLBACK = [
+    ('specific', ['activity', 'region', 'material']),
+    ('regional', ['activity', 'region']),
+    ('global', ['activity', 'material']),
+    ('global', ['activity']),
+]
+
+FACTOR_COLUMN = 'kgco2e_per_unit'
+LIBRARY_MAGIC = b'EFLIB\x00\x01\x00'
+MAX_DENSE_CELLS = 16_000_000   # int32 cells in the precomputed resolution map
+ALIGNMENT = 64
+
+def default_factor_table():
+    """Built-in illustrative factors (kgCO2e per unit)."""
+
+    return pd.DataFrame([
+        ('electricity', 'United Kingdom', ALL, 0.207, 'kWh', 'DEFRA 2023'),
+        ('electricity', 'France', ALL, 0.052, 'kWh', 'IEA 2023'),
+        ('electricity', 'United States', ALL, 0.367, 'kWh', 'IEA 2023'),
+        ('electricity', ALL, ALL, 0.436, 'kWh', 'IEA 2023'),
+        ('natural_gas', ALL, ALL, 0.183, 'kWh', 'DEFRA 2023'),
+        ('diesel', ALL, ALL, 2.512, 'litre', 'DEFRA 2023'),
+        ('road_freight', ALL, 'hgv_rigid', 0.194, 'tonne.km', 'DEFRA 2023'),
+        ('road_freight', ALL, ALL, 0.107, 'tonne.km', 'DEFRA 2023'),
+        ('steel', ALL, 'primary', 2330.0, 'tonne', 'Ecoinvent 3.9'),
+        ('steel', ALL, 'recycled', 680.0, 'tonne', 'Ecoinvent 3.9'),
+        ('steel', 'United Kingdom', 'recycled', 590.0, 'tonne', 'Ecoinvent 3.9'),
+        ('steel', ALL, ALL, 1850.0, 'tonne', 'Ecoinvent 3.9'),
+        ('cement', ALL, ALL, 910.0, 'tonne', 'Ecoinvent 3.9'),
+        ('concrete', ALL, ALL, 130.0, 'tonne', 'DEFRA 2023'),
+    ], columns=KEY_COLUMNS + [FACTOR_COLUMN, 'unit', 'source'])
+
+def _trailing_fallback(key_columns):
+    """All key columns first, then drop them from the right down to the all-'*' row."""
+    return [('/'.join(key_columns[:size]) or ALL, list(key_columns[:size]))
+            for size in range(len(key_columns), -1, -1)]
+
+class FactorLibrary:
+    """Emission factor table indexed for batch lookup with wildcard fallbacks.
+
+    Build with FactorLibrary.build(table) or FactorLibrary.open(path).
+    """
+
+    def __init__(self, key_columns, fallback, vocabularies, value_columns, attribute_columns,
+                 attribute_vocabularies, arrays):
+        self.key_columns = list(key_columns)
+        self.fallback = [(name, list(kept)) for name, kept in fallback]
+        self.vocabularies = [pd.Index(vocabulary, dtype=object) for vocabulary in vocabularies]
+        self.value_columns = list(value_columns)
+        self.attribute_columns = list(attribute_columns)
+        self.attribute_vocabularies = [pd.Index(vocabulary, dtype=object) for vocabulary in attribute_vocabularies]
+
+        # Code 0 is the wildcard, 1..n the vocabulary, n + 1 any unknown value
+        self.radix = np.array([len(vocabulary) + 2 for vocabulary in self.vocabularies], dtype=np.int64)
+        self.keep_masks = np.array([[column in kept for column in self.key_columns] for _, kept in self.fallback])
+
+        self.keys = arrays['keys']                 # sorted packed row keys
+        self.key_rows = arrays['key_rows']         # table row for each sorted key
+        self.row_levels = arrays['row_levels']     # fallback level matched by each row's wildcards
+        self.values = arrays['values']             # rows × value_columns
+        self.attributes = arrays['attributes']     # rows × attribute_columns (codes)
+        self.resolution = arrays.get('resolution')  # dense key codes -> row, or None
+
+    def __len__(self):
+        return len(self.values)
+
+    @classmethod
+    def build(cls, table, key_columns=None, fallback=None, value_columns=None, max_dense_cells=MAX_DENSE_CELLS):
+        """Index a factor table.
+
+        key_columns default to activity/region/material; numeric columns are
+        factor values and the remaining columns text attributes. fallback is
+        an ordered list of (name, kept key columns); it defaults to
+        DEFAULT_FALLBACK for the standard key columns, otherwise to dropping
+        key columns from the right down to the all-'*' row. Raises
+        ValueError on duplicate keys or rows whose wildcards no fallback
+        level can reach.
+        """
+
+        key_columns = list(key_columns or KEY_COLUMNS)
+        if fallback is None:
+            fallback = DEFAULT_FALLBACK if key_columns == KEY_COLUMNS else _trailing_fallback(key_columns)
+        table = table.reset_index(drop=True)
+        if value_columns is None:
+            value_columns = [column for column in table.columns
+                             if column not in key_columns and pd.api.types.is_numeric_dtype(table[column])]
+        attribute_columns = [column for column in table.columns
+                             if column not in key_columns and column not in value_columns]
+
+        vocabularies, codes = [], []
+        for column in key_columns:
+            keys = table[column].astype(object).fillna(ALL)
+            vocabulary = pd.Index(pd.unique(keys[keys != ALL].to_numpy()), dtype=object)
+            vocabularies.append(vocabulary)
+            codes.append(np.where(keys == ALL, 0, vocabulary.get_indexer(keys) + 1))
+        codes = np.column_stack(codes) if codes else np.zeros((len(table), 0), dtype=np.int64)
+
+        attribute_vocabularies, attribute_codes = [], []
+        for column in attribute_columns:
+            column_codes, uniques = pd.factorize(table[column].astype(object))
+            attribute_vocabularies.append(list(uniques))
+            attribute_codes.append(column_codes)
+
+        library = cls(key_columns, fallback, [list(vocabulary) for vocabulary in vocabularies], value_columns,
+                      attribute_columns, attribute_vocabularies, {
+                          'keys': np.zeros(0, dtype=np.int64),
+                          'key_rows': np.zeros(0, dtype=np.int32),
+                          'row_levels': np.zeros(0, dtype=np.int8),
+                          'values': table[value_columns].to_numpy(dtype=np.float64).reshape(len(table), -1),
+                          'attributes': np.column_stack(attribute_codes).astype(np.int32) if attribute_codes
+                          else np.zeros((len(table), 0), dtype=np.int32),
+                      })
+
+        packed = library._pack(codes)
+        if len(np.unique(packed)) != len(packed):
+            duplicated = table.loc[pd.Series(packed).duplicated(keep=False).to_numpy(), key_columns]
+            raise ValueError(f"Duplicate factor keys:\n{duplicated.to_string()}")
+
+        wildcard = codes != 0
+        row_levels = np.full(len(table), -1, dtype=np.int8)
+        for level, mask in enumerate(library.keep_masks):
+            row_levels[(row_levels < 0) & (wildcard == mask).all(axis=1)] = level
+        if (row_levels < 0).any():
+            unreachable = table.loc[row_levels < 0, key_columns]
+            raise ValueError(f"Factor rows not reachable by any fallback level:\n{unreachable.to_string()}")
+
+        order = np.argsort(packed, kind='stable')
+        library.keys = packed[order]
+        library.key_rows = order.astype(np.int32)
+        library.row_levels = row_levels
+
+        if np.prod(library.radix, dtype=np.float64) <= max_dense_cells:
+            library.resolution = library._dense_resolution(codes)
+        return library
+
+    def _pack(self, codes):
+        """Pack per-column key codes (rows × key columns) into one int64 per row."""
+        packed = np.zeros(len(codes), dtype=np.int64)
+        for column, radix in enumerate(self.radix):
+            packed = packed * radix + codes[:, column]
+        return packed
+
+    def _dense_resolution(self, codes):
+        """Resolved row for every combination of key codes.
+
+        Levels are written from the most general to the most specific, so
+        each cell ends up holding the most specific matching row.
+        """
+
+        resolution = np.full(tuple(self.radix), -1, dtype=np.int32)
+        for level in range(len(self.fallback) - 1, -1, -1):
+            rows = np.flatnonzero(self.row_levels == level)
+            if not len(rows):
+                continue
+            kept = np.flatnonzero(self.keep_masks[level])
+            dropped = np.flatnonzero(~self.keep_masks[level])
+            # Kept axes first: the row codes index them, wildcard axes take every known or unknown value
+            view = np.moveaxis(resolution, np.concatenate([kept, dropped]), np.arange(len(self.radix)))
+            index = tuple(codes[rows, column] for column in kept) + (slice(1, None),) * len(dropped)
+            view[index] = rows.reshape((-1,) + (1,) * len(dropped)) if len(kept) else rows[0]
+        return resolution
+
+    def encode(self, queries):
+        """Key codes (rows × key columns) for a frame with the key columns.
+
+        Values not in the table ('*', blanks, unseen regions, ...) get the
+        unknown code, which only wildcard rows match.
+        """
+
+        codes = np.empty((len(queries), len(self.key_columns)), dtype=np.int64)
+        for column, (name, vocabulary) in enumerate(zip(self.key_columns, self.vocabularies)):
+            query_codes, uniques = pd.factorize(pd.Series(queries[name]))
+            unique_codes = vocabulary.get_indexer(pd.Index(uniques, dtype=object)) + 1
+            unique_codes[unique_codes == 0] = len(vocabulary) + 1
+            codes[:, column] = np.append(unique_codes, len(vocabulary) + 1)[query_codes]
+        return codes
+
+    def resolve(self, queries):
+        """Table row (-1 when nothing matches) and fallback level for every query row."""
+
+        codes = self.encode(queries)
+        if self.resolution is not None:
+            rows = self.resolution[tuple(codes.T)].astype(np.int64)
+        else:
+            rows = self._search(codes)
+        levels = np.where(rows >= 0, self.row_levels[np.maximum(rows, 0)], -1)
+        return rows, levels
+
+    def _search(self, codes):
+        """Resolve distinct keys level by level through the sorted key index."""
+
+        distinct, first_rows, inverse = np.unique(self._pack(codes), return_index=True, return_inverse=True)
+        distinct_codes = codes[first_rows]
+        rows = np.full(len(distinct), -1, dtype=np.int64)
+        for mask in self.keep_masks:
+            pending = rows < 0
+            if not pending.any() or not len(self.keys):
+                break
+            candidate = self._pack(np.where(mask, distinct_codes[pending], 0))
+            position = np.minimum(np.searchsorted(self.keys, candidate), len(self.keys) - 1)
+            found = self.keys[position] == candidate
+            rows[np.flatnonzero(pending)[found]] = self.key_rows[position[found]]
+        return rows[inverse.reshape(-1)]
+
+    def lookup(self, queries):
+        """Factor values, attributes, level and specificity for every query row.
+
+        Returns a frame aligned with queries. level is the fallback name
+        (NaN when unresolved); specificity counts the key columns matched
+        exactly (-1 when unresolved).
+        """
+
+        rows, levels = self.resolve(queries)
+        resolved = rows >= 0
+        values = np.full((len(rows), len(self.value_columns)), np.nan)
+        values[resolved] = self.values[rows[resolved]]
+
+        result = pd.DataFrame(values, columns=self.value_columns, index=getattr(queries, 'index', None))
+        for column, (name, vocabulary) in enumerate(zip(self.attribute_columns, self.attribute_vocabularies)):
+            codes = np.where(resolved, self.attributes[np.maximum(rows, 0), column], -1)
+            result[name] = pd.Categorical.from_codes(codes, categories=vocabulary)
+        level_names = pd.unique(pd.Series([name for name, _ in self.fallback]))
+        level_codes = pd.Index(level_names).get_indexer([name for name, _ in self.fallback])
+        result['level'] = pd.Categorical.from_codes(np.append(level_codes, -1)[levels], categories=level_names)
+        result['specificity'] = np.append(self.keep_masks.sum(axis=1), -1)[levels]
+        return result
+
+    def apply(self, activities, quantity='quantity', factor=FACTOR_COLUMN):
+        """Emissions = Activity × EF for every activity line (NaN when no factor resolves)."""
+
+        rows, _ = self.resolve(activities)
+        factors = np.where(rows >= 0, self.values[np.maximum(rows, 0), self.value_columns.index(factor)], np.nan)
+        return pd.to_numeric(activities[quantity], errors='coerce').to_numpy(dtype=np.float64) * factors
+
+    def to_frame(self):
+        """The factor table, wildcards included."""
+
+        rows = self.key_rows[np.argsort(self.key_rows)]
+        codes = np.empty((len(self), len(self.key_columns)), dtype=np.int64)
+        remaining = self.keys[np.argsort(self.key_rows)]
+        for column in range(len(self.key_columns) - 1, -1, -1):
+            codes[:, column] = remaining % self.radix[column]
+            remaining = remaining // self.radix[column]
+
+        table = pd.DataFrame({
+            name: np.append(np.array([ALL], dtype=object), np.asarray(vocabulary, dtype=object))[codes[:, column]]
+            for column, (name, vocabulary) in enumerate(zip(self.key_columns, self.vocabularies))
+        }, index=rows)
+        for column, name in enumerate(self.value_columns):
+            table[name] = np.asarray(self.values[:, column])
+        for column, (name, vocabulary) in enumerate(zip(self.attribute_columns, self.attribute_vocabularies)):
+            table[name] = np.append(np.asarray(vocabulary, dtype=object), None)[np.asarray(self.attributes[:, column])]
+        return table.reset_index(drop=True)
+
+    def save(self, path):
+        """Write the library as one binary file: magic, JSON header, 64-byte aligned arrays."""
+
+        arrays = {
+            'keys': self.keys, 'key_rows': self.key_rows, 'row_levels': self.row_levels,
+            'values': self.values, 'attributes': self.attributes,
+        }
+        if self.resolution is not None:
+            arrays['resolution'] = self.resolution
+
+        header = {
+            'key_columns': self.key_columns,
+            'fallback': self.fallback,
+            'vocabularies': [list(vocabulary) for vocabulary in self.vocabularies],
+            'value_columns': self.value_columns,
+            'attribute_columns': self.attribute_columns,
+            'attribute_vocabularies': [list(vocabulary) for vocabulary in self.attribute_vocabularies],
+            'arrays': {},
+        }
+        offset = 0
+        for name, array in arrays.items():
+            header['arrays'][name] = {'dtype': np.asarray(array).dtype.str, 'shape': list(np.shape(array)),
+                                      'offset': offset}
+            offset += -(-np.asarray(array).nbytes // ALIGNMENT) * ALIGNMENT
+        header_bytes = json.dumps(header, default=str).encode('utf-8')
+        data_start = -(-(len(LIBRARY_MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(LIBRARY_MAGIC + struct.pack('<Q', len(header_bytes)) + header_bytes)
+                for name, array in arrays.items():
+                    f.seek(data_start + header['arrays'][name]['offset'])
+                    f.write(np.ascontiguousarray(array).tobytes())
+                f.truncate(data_start + offset)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    @classmethod
+    def open(cls, path):
+        """Open a saved library; the arrays are memory-mapped read-only."""
+
+        with open(path, 'rb') as f:
+            if f.read(len(LIBRARY_MAGIC)) != LIBRARY_MAGIC:
+                raise ValueError(f"{path} is not an emission factor library file")
+            (header_length,) = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(header_length))
+        data_start = -(-(len(LIBRARY_MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+
+        arrays = {}
+        for name, spec in header['arrays'].items():
+            shape = tuple(spec['shape'])
+            if np.prod(shape, dtype=np.int64) == 0:
+                arrays[name] = np.zeros(shape, dtype=spec['dtype'])
+            else:
+                arrays[name] = np.memmap(path, dtype=spec['dtype'], mode='r', offset=data_start + spec['offset'],
+                                         shape=shape)
+        return cls(header['key_columns'], header['fallback'], header['vocabularies'], header['value_columns'],
+                   header['attribute_columns'], header['attribute_vocabularies'], arrays)
+
+def load_factor_table(csv_file):
+    """Read a factor table CSV (key columns as text, '*' for wildcards)."""
+    return pd.read_csv(csv_file, dtype={column: str for column in KEY_COLUMNS})
+
+def main(argv=None):
+    """Main function."""
+
+    parser = argparse.ArgumentParser(description="Build, save or apply an emission factor library")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--factors", help="Factor table CSV (activity, region, material, factor columns, ...)")
+    source.add_argument("--open", dest="library_file", help="Saved library file to memory-map")
+    parser.add_argument("--save", help="Write the library to this binary file")
+    parser.add_argument("--apply", help="Activity CSV (activity, region, material, quantity) to convert to emissions")
+    parser.add_argument("--output", default="activity_emissions.csv", help="Output CSV for --apply")
+    args = parser.parse_args(argv)
+
+    print("=" * 80)
+    print("EMISSION FACTOR LIBRARY")
+    print("=" * 80)
+
+    try:
+        if args.library_file:
+            library = FactorLibrary.open(args.library_file)
+            print(f"📂 Opened {args.library_file} (memory-mapped)")
+        else:
+            table = load_factor_table(args.factors) if args.factors else default_factor_table()
+            library = FactorLibrary.build(table)
+            print(f"📄 Factors: {args.factors or 'built-in illustrative table'}")
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+
+    print(f"📊 {len(library)} factors, keys {' / '.join(library.key_columns)}")
+    for name, vocabulary in zip(library.key_columns, library.vocabularies):
+        print(f"   {name:<10} {len(vocabulary):>6} distinct values")
+    print(f"   resolution map: {'dense ' + '×'.join(map(str, library.radix)) if library.resolution is not None else 'sorted index'}")
+
+    if args.save:
+        library.save(args.save)
+        print(f"✅ Library saved to: {args.save} ({os.path.getsize(args.save):,} bytes)")
+
+    if args.apply:
+        activities = pd.read_csv(args.apply, dtype={column: str for column in library.key_columns})
+        resolved = library.lookup(activities)
+        output = activities.copy()
+        output[FACTOR_COLUMN] = resolved[FACTOR_COLUMN]
+        output['factor_level'] = resolved['level']
+        output['emissions_kgco2e'] = library.apply(activities)
+        output.to_csv(args.output, index=False)
+
+        unresolved = int(resolved['level'].isna().sum())
+        print(f"\n🔢 Activity lines: {len(activities):,} ({unresolved:,} without a factor)")
+        for level, count in resolved['level'].value_counts(sort=False).items():
+            print(f"   {level:<10} {count:>10,}")
+        print(f"   Total: {np.nansum(output['emissions_kgco2e']) / 1000:,.1f} tCO2e")
+        print(f"✅ Activity emissions saved to: {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
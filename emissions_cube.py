@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Emissions Cube (S8 Sectoral Analysis & Breakdown)
+=================================================
+
+Aggregation cube over sector × asset class × geography ('Sector
+Classification' and 'Geography' in investment_data.xlsx), built in one pass
+over the holdings:
+
+- every holding is mapped to a base cell; each dimension gets an extra
+  '*' (all) member
+- base cells are summed with one bincount per measure, then every rollup
+  (all 2³ combinations of dimensions, down to the portfolio total) is
+  precomputed by summing the dense cube along each axis
+- issuer totals are indexed per base cell, sorted by financed emissions,
+  on the first issuer drill-down
+
+Measures: financed emissions, investment, EVIC, holding count, intensity
+(tCO2e per £m invested) and the PCAF score weighted by investment, as PCAF
+recommends. Any query - a single cell, a breakdown by any dimensions,
+filtered on any others, or the issuers behind it - reads the cube only and
+never rescans the holdings.
+
+Financed emissions come from a financed_emissions column or are
+calculated from emissions (see calculate_financed_emissions.py); without
+either, emission measures are NaN.
+
+Usage:
+    python emissions_cube.py [investment_data.xlsx|holdings.csv] [--by DIM ...]
+                             [--sector S] [--asset-class A] [--geography G] [--issuers N]
+"""
+
+import argparse
+import sys
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from calculate_financed_emissions import holding_financed_emissions
+from holdings_model import load_holdings
+
+ALL = '*'
+DIMENSIONS = ['sector', 'asset_class', 'geography']
+UNSPECIFIED = 'Unspecified'
+
+# Summed measures, in cube order
+MEASURES = ['financed_emissions', 'investment', 'evic', 'holding_count', 'calculated_count',
+            'pcaf_weighted', 'pcaf_investment']
+REPORTED_MEASURES = ['financed_emissions', 'investment', 'evic', 'holding_count',
+                     'intensity_tco2e_per_gbp_m', 'pcaf_score']
+
+def _measure_columns(holdings):
+    """Per-holding values of each summed measure."""
+
+    if 'financed_emissions' in holdings.columns:
+        financed = holdings['financed_emissions'].to_numpy(dtype=np.float64)
+    else:
+        financed = holding_financed_emissions(holdings)
+    investment = np.nan_to_num(holdings['investment_amount'].to_numpy(dtype=np.float64))
+    scores = (holdings['pcaf_score'].to_numpy(dtype=np.float64) if 'pcaf_score' in holdings.columns
+              else np.full(len(holdings), np.nan))
+    scored = ~np.isnan(scores)
+    calculated = ~np.isnan(financed)
+
+    return [
+        np.where(calculated, financed, 0.0),
+        investment,
+        np.nan_to_num(holdings['evic'].to_numpy(dtype=np.float64)),
+        np.ones(len(holdings)),
+        calculated.astype(np.float64),
+        np.where(scored, scores * investment, 0.0),
+        np.where(scored, investment, 0.0),
+    ]
+
+def _derived(sums):
+    """Reported measures from summed measures (last axis in MEASURES order)."""
+
+    sums = np.asarray(sums, dtype=np.float64)
+    financed, investment, evic, holdings, calculated, pcaf_weighted, pcaf_investment = np.moveaxis(sums, -1, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'financed_emissions': np.where(calculated > 0, financed, np.nan),
+            'investment': investment,
+            'evic': evic,
+            'holding_count': holdings.astype(np.int64),
+            'intensity_tco2e_per_gbp_m': np.where((calculated > 0) & (investment > 0),
+                                                  financed / (investment / 1_000_000), np.nan),
+            'pcaf_score': np.where(pcaf_investment > 0, pcaf_weighted / pcaf_investment, np.nan),
+        }
+
+class EmissionsCube:
+    """Precomputed sector × asset class × geography rollups of a holdings book."""
+
+    def __init__(self, holdings):
+        holdings = holdings.reset_index(drop=True)
+        self.labels = {}
+        codes = []
+        for dimension in DIMENSIONS:
+            values = (holdings[dimension].astype(object) if dimension in holdings.columns
+                      else pd.Series(UNSPECIFIED, index=holdings.index, dtype=object))
+            dimension_codes, labels = pd.factorize(values.fillna(UNSPECIFIED), sort=True)
+            self.labels[dimension] = pd.Index(labels, dtype=object)
+            codes.append(dimension_codes)
+
+        # Dense cube with one extra '*' member per dimension (the last slot)
+        self.shape = tuple(len(self.labels[dimension]) + 1 for dimension in DIMENSIONS)
+        base_shape = tuple(size - 1 for size in self.shape)
+        cells = np.ravel_multi_index(codes, base_shape) if len(holdings) else np.zeros(0, dtype=np.int64)
+        measures = _measure_columns(holdings)
+        base_size = int(np.prod(base_shape))
+
+        self.sums = np.zeros(self.shape + (len(MEASURES),))
+        self.sums[tuple(slice(0, size) for size in base_shape)] = np.stack(
+            [np.bincount(cells, weights=values, minlength=base_size) for values in measures], axis=-1
+        ).reshape(base_shape + (len(MEASURES),))
+        for axis in range(len(DIMENSIONS)):
+            total = [slice(None)] * len(DIMENSIONS)
+            total[axis] = -1
+            members = [slice(None)] * len(DIMENSIONS)
+            members[axis] = slice(0, -1)
+            self.sums[tuple(total)] = self.sums[tuple(members)].sum(axis=axis)
+
+        # Kept for the issuer table, which is only built on the first drill-down
+        self._names = holdings['name']
+        self._cells = cells
+        self._measures = measures
+
+    @cached_property
+    def issuer_table(self):
+        """Issuer totals per base cell, largest financed emissions first (built on first use)."""
+
+        base_shape = tuple(size - 1 for size in self.shape)
+        issuer_codes, issuer_names = pd.factorize(self._names.astype(object))
+        keys = self._cells.astype(np.int64) * max(len(issuer_names), 1) + issuer_codes
+        unique_keys, first_rows, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        issuer_sums = np.stack([np.bincount(inverse.reshape(-1), weights=values, minlength=len(unique_keys))
+                                for values in self._measures], axis=-1)
+        issuers = pd.DataFrame({'cell': unique_keys // max(len(issuer_names), 1),
+                                'name': np.asarray(issuer_names, dtype=object)[issuer_codes[first_rows]]})
+        for dimension, dimension_codes in zip(DIMENSIONS, np.unravel_index(issuers['cell'].to_numpy(), base_shape)):
+            issuers[dimension] = self.labels[dimension][dimension_codes]
+        issuers = pd.concat([issuers, pd.DataFrame(_derived(issuer_sums))], axis=1)
+        order = np.lexsort((-np.nan_to_num(issuers['financed_emissions'].to_numpy(), nan=-np.inf),
+                            issuers['cell'].to_numpy()))
+        self._names = self._cells = self._measures = None
+        return issuers.iloc[order].reset_index(drop=True)
+
+    @cached_property
+    def cell_offsets(self):
+        """Start of every base cell's rows in issuer_table (plus the end)."""
+        base_size = int(np.prod([size - 1 for size in self.shape]))
+        return np.searchsorted(self.issuer_table['cell'].to_numpy(), np.arange(base_size + 1))
+
+    def _index(self, dimension, value):
+        """Cube position of a dimension member; None selects the '*' member."""
+        if value is None or value == ALL:
+            return len(self.labels[dimension])
+        position = self.labels[dimension].get_indexer([value])[0]
+        if position < 0:
+            raise KeyError(f"Unknown {dimension}: {value!r}")
+        return position
+
+    def query(self, **filters):
+        """Reported measures for one cell, e.g. query(sector='Energy'); unfiltered dimensions are '*'."""
+
+        unknown = set(filters) - set(DIMENSIONS)
+        if unknown:
+            raise KeyError(f"Unknown dimension(s): {', '.join(sorted(unknown))}")
+        position = tuple(self._index(dimension, filters.get(dimension)) for dimension in DIMENSIONS)
+        return {name: values.item() for name, values in _derived(self.sums[position]).items()}
+
+    def rollup(self, by=(), **filters):
+        """Breakdown by the dimensions in by, within the cell selected by filters."""
+
+        by = list(by)
+        unknown = (set(by) | set(filters)) - set(DIMENSIONS)
+        if unknown:
+            raise KeyError(f"Unknown dimension(s): {', '.join(sorted(unknown))}")
+        selection = tuple(slice(0, len(self.labels[dimension])) if dimension in by
+                          else self._index(dimension, filters.get(dimension))
+                          for dimension in DIMENSIONS)
+        sums = self.sums[selection].reshape(-1, len(MEASURES))
+
+        index = (pd.MultiIndex.from_product([self.labels[dimension] for dimension in by], names=by) if by
+                 else pd.RangeIndex(1))
+        frame = pd.DataFrame(_derived(sums), index=index)
+        return frame[frame['holding_count'] > 0].reset_index(drop=not by)
+
+    def issuers(self, top=None, **filters):
+        """Issuer totals within the cell selected by filters, largest financed emissions first."""
+
+        unknown = set(filters) - set(DIMENSIONS)
+        if unknown:
+            raise KeyError(f"Unknown dimension(s): {', '.join(sorted(unknown))}")
+        base_shape = tuple(size - 1 for size in self.shape)
+        ranges = [np.arange(base_shape[axis]) if filters.get(dimension) in (None, ALL)
+                  else np.array([self._index(dimension, filters[dimension])])
+                  for axis, dimension in enumerate(DIMENSIONS)]
+        cells = np.ravel_multi_index(np.meshgrid(*ranges, indexing='ij'), base_shape).reshape(-1)
+        starts = self.cell_offsets[cells]
+        lengths = self.cell_offsets[cells + 1] - starts
+        rows = np.arange(lengths.sum()) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        selected = self.issuer_table.iloc[rows]
+        if len(cells) > 1:
+            selected = selected.sort_values('financed_emissions', ascending=False, kind='stable', na_position='last')
+        selected = selected.drop(columns='cell').reset_index(drop=True)
+        return selected.head(top) if top else selected
+
+def main(argv=None):
+    """Main function."""
+
+    parser = argparse.ArgumentParser(description="S8: sector × asset class × geography emissions cube")
+    parser.add_argument("holdings_file", nargs="?", default="investment_data.xlsx",
+                        help="investment_data.xlsx or a holdings CSV (optionally with emissions)")
+    parser.add_argument("--by", nargs="*", default=['sector'], choices=DIMENSIONS, help="Breakdown dimensions")
+    parser.add_argument("--sector", help="Filter on sector")
+    parser.add_argument("--asset-class", help="Filter on asset class")
+    parser.add_argument("--geography", help="Filter on geography")
+    parser.add_argument("--issuers", type=int, default=0, help="Also list the top N issuers in the selection")
+    parser.add_argument("--output", help="Write the breakdown to this CSV")
+    args = parser.parse_args(argv)
+
+    print("=" * 80)
+    print("EMISSIONS CUBE (S8)")
+    print("=" * 80)
+
+    try:
+        holdings = load_holdings(args.holdings_file, ['emissions', 'total_project_cost', 'financed_emissions'])
+    except (OSError, KeyError, ValueError) as e:
+        print(f"❌ Could not load {args.holdings_file}: {e}")
+        return 1
+
+    cube = EmissionsCube(holdings)
+    filters = {dimension: value for dimension, value in
+               zip(DIMENSIONS, (args.sector, args.asset_class, args.geography)) if value}
+
+    print(f"📄 Holdings: {len(holdings):,} from {args.holdings_file}")
+    print("📐 Cube: " + " × ".join(f"{len(cube.labels[dimension])} {dimension}" for dimension in DIMENSIONS))
+    if filters:
+        print("🔎 Filter: " + ", ".join(f"{dimension}={value}" for dimension, value in filters.items()))
+
+    try:
+        total = cube.query(**filters)
+        breakdown = cube.rollup(args.by, **filters)
+    except KeyError as e:
+        print(f"❌ {e.args[0]}")
+        return 1
+
+    def fmt(value, spec):
+        return '-' if pd.isna(value) else format(value, spec)
+
+    print(f"\n{'BREAKDOWN BY ' + ' × '.join(args.by).upper() if args.by else 'TOTAL'}:")
+    print(f"   {'':<40} {'tCO2e':>14} {'Investment':>16} {'tCO2e/£m':>10} {'PCAF':>5} {'Count':>7}")
+    for row in breakdown.itertuples(index=False):
+        label = ' / '.join(str(getattr(row, dimension)) for dimension in args.by) or 'Total'
+        print(f"   {label:<40} {fmt(row.financed_emissions, ',.1f'):>14} {row.investment:>16,.0f} "
+              f"{fmt(row.intensity_tco2e_per_gbp_m, ',.2f'):>10} {fmt(row.pcaf_score, '.1f'):>5} {row.holding_count:>7,}")
+    print(f"   {'Selection total':<40} {fmt(total['financed_emissions'], ',.1f'):>14} {total['investment']:>16,.0f} "
+          f"{fmt(total['intensity_tco2e_per_gbp_m'], ',.2f'):>10} {fmt(total['pcaf_score'], '.1f'):>5} "
+          f"{total['holding_count']:>7,}")
+
+    if args.issuers:
+        print(f"\nTOP {args.issuers} ISSUERS:")
+        for row in cube.issuers(top=args.issuers, **filters).itertuples(index=False):
+            print(f"   {row.name:<40} {fmt(row.financed_emissions, ',.1f'):>14} {row.investment:>16,.0f}")
+
+    if args.output:
+        breakdown.to_csv(args.output, index=False)
+        print(f"\n✅ Breakdown saved to: {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,9 +5,12 @@ Extracts data from XLSX file and converts to readable formats
 """
 
 import pandas as pd
+import argparse
+import csv
 import json
 import sys
 import os
+import re
 from pathlib import Path
 
 def extract_xlsx_data(file_path):
@@ -37,8 +40,8 @@ def extract_xlsx_data(file_path):
             print(f"\nProcessing sheet: {sheet_name}")
             
             try:
-                # Read the sheet
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
+                # Parse the sheet from the already-open workbook
+                df = excel_file.parse(sheet_name)
                 
                 # Get basic info
                 sheet_info = {
@@ -83,7 +86,7 @@ def extract_xlsx_data(file_path):
         print(f"Error reading Excel file: {e}")
         return None
 
-def save_extracted_data(data, output_dir):
+def save_extracted_data(data, output_dir, columnar=False):
     """Save extracted data to various formats"""
     
     if not data:
@@ -101,7 +104,7 @@ def save_extracted_data(data, output_dir):
     # Save each sheet as separate CSV
     for sheet_name, sheet_data in data["sheets"].items():
         if "data" in sheet_data and sheet_data["data"]:
-            csv_file = os.path.join(output_dir, f"{sheet_name.replace(' ', '_').replace('/', '_')}.csv")
+            csv_file = os.path.join(output_dir, sheet_csv_filename(sheet_name))
             df = pd.DataFrame(sheet_data["data"])
             df.to_csv(csv_file, index=False)
             print(f"Saved sheet '{sheet_name}' to: {csv_file}")
@@ -110,6 +113,484 @@ def save_extracted_data(data, output_dir):
     md_file = os.path.join(output_dir, "data_summary.md")
     create_markdown_summary(data, md_file)
     print(f"Saved summary to: {md_file}")
+    
+    if columnar:
+        save_columnar_data(data, os.path.join(output_dir, COLUMNAR_DIR))
+
+# Columnar extract layout: one Parquet file per sheet plus a manifest
+COLUMNAR_DIR = "columnar"
+COLUMNAR_MANIFEST = "manifest.json"
+
+def _typed_sheet_table(sheet_data):
+    """Build a typed Arrow table for a sheet, stringifying mixed-type columns"""
+    
+    import pyarrow as pa
+    
+    df = pd.DataFrame(sheet_data["data"], columns=sheet_data["column_names"])
+    arrays = []
+    for col in df.columns:
+        try:
+            arrays.append(pa.array(df[col], from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed values (e.g. numbers and text) - keep them as strings
+            values = df[col].where(pd.notnull(df[col]), None)
+            arrays.append(pa.array([None if v is None else str(v) for v in values], type=pa.string()))
+    return pa.Table.from_arrays(arrays, names=[str(col) for col in df.columns])
+
+def save_columnar_data(data, columnar_dir):
+    """Save each sheet as a typed Parquet file plus a small JSON manifest.
+    
+    Downstream scripts can memory-map a single sheet and read only the
+    columns they need with load_columnar_sheet() instead of parsing the
+    full extracted_data.json.
+    """
+    
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("pyarrow is required for columnar output (pip install pyarrow)")
+        return None
+    
+    os.makedirs(columnar_dir, exist_ok=True)
+    
+    manifest = {
+        "format": "parquet",
+        "file_name": data["metadata"]["file_name"],
+        "sheet_names": data["metadata"]["sheet_names"],
+        "sheets": {}
+    }
+    
+    for sheet_name, sheet_data in data["sheets"].items():
+        if "error" in sheet_data:
+            continue
+        
+        table = _typed_sheet_table(sheet_data)
+        parquet_name = sheet_csv_filename(sheet_name)[:-len(".csv")] + ".parquet"
+        pq.write_table(table, os.path.join(columnar_dir, parquet_name))
+        
+        manifest["sheets"][sheet_name] = {
+            "file": parquet_name,
+            "rows": table.num_rows,
+            "columns": [{"name": field.name, "type": str(field.type)} for field in table.schema]
+        }
+        print(f"Saved sheet '{sheet_name}' to: {os.path.join(columnar_dir, parquet_name)}")
+    
+    manifest_file = os.path.join(columnar_dir, COLUMNAR_MANIFEST)
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    print(f"Saved columnar manifest to: {manifest_file}")
+    
+    return manifest
+
+def load_columnar_manifest(columnar_dir):
+    """Load the manifest written by save_columnar_data()"""
+    
+    with open(os.path.join(columnar_dir, COLUMNAR_MANIFEST), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def load_columnar_sheet(columnar_dir, sheet_name, columns=None):
+    """Memory-map one sheet of a columnar extract, reading only the given columns.
+    
+    Returns a pyarrow Table; call .to_pandas() or .column(name) as needed.
+    """
+    
+    import pyarrow.parquet as pq
+    
+    manifest = load_columnar_manifest(columnar_dir)
+    if sheet_name not in manifest["sheets"]:
+        raise KeyError(f"Sheet '{sheet_name}' not found in columnar extract")
+    
+    parquet_file = os.path.join(columnar_dir, manifest["sheets"][sheet_name]["file"])
+    return pq.read_table(parquet_file, columns=columns, memory_map=True)
+
+class _JsonStream:
+    """Minimal pull parser over a JSON file read in chunks.
+    
+    Keeps only the unconsumed part of the current chunk in memory; values
+    that are skipped are scanned for nesting but never decoded.
+    """
+    
+    _decoder = json.JSONDecoder()
+    _whitespace = re.compile(r'\s*')
+    # Text up to the next bracket outside a string, complete strings included
+    _flat = re.compile(r'(?:[^"{}\[\]]+|"[^"\\]*(?:\\.[^"\\]*)*")+', re.S)
+    _number_chars = frozenset('.eE+-0123456789')
+    
+    def __init__(self, f, chunk_size=1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+    
+    def _fill(self):
+        """Drop the consumed text and read more (at least doubling the buffer); False at end of file"""
+        if self.eof:
+            return False
+        chunk = self.f.read(max(self.chunk_size, len(self.buffer) - self.pos))
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        self.eof = not chunk
+        return bool(chunk)
+    
+    def peek(self):
+        """Next non-whitespace character, not consumed ('' at end of file)"""
+        while True:
+            self.pos = self._whitespace.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+    
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in JSON, found {found or 'end of file'!r}")
+        self.pos += 1
+    
+    def value(self):
+        """Decode the next value"""
+        while True:
+            self.peek()
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+                # A number cut by the chunk boundary ('12.' or '1e' before the
+                # rest is read) decodes as its prefix; only valid JSON
+                # separators may follow a complete value
+                if self.eof or (end < len(self.buffer) and self.buffer[end] not in self._number_chars):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+    
+    def skip(self):
+        """Step over the next value without decoding it"""
+        if self.peek() not in '{[':
+            self.value()
+            return
+        depth = 0
+        while True:
+            char = self.peek()
+            if char in ('{', '['):
+                depth += 1
+                self.pos += 1
+            elif char in ('}', ']'):
+                depth -= 1
+                self.pos += 1
+                if depth == 0:
+                    return
+            elif char == '':
+                raise ValueError("Unexpected end of JSON")
+            else:
+                match = self._flat.match(self.buffer, self.pos)
+                if match is not None:
+                    self.pos = match.end()
+                elif not self._fill():  # a string runs past the end of the buffer
+                    raise ValueError("Unterminated string in JSON")
+    
+    def find(self, key):
+        """Enter the object at the current position and move to the value of key.
+        
+        Returns False (with the object consumed) when it has no such key.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return False
+        while True:
+            name = self.value()
+            self.expect(':')
+            if name == key:
+                return True
+            self.skip()
+            if self.peek() == '}':
+                self.pos += 1
+                return False
+            self.expect(',')
+    
+    def items(self):
+        """Decode the elements of the array at the current position, one at a time"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ']':
+                self.pos += 1
+                return
+            self.expect(',')
+
+def iter_sheet_column(json_file, sheet_name, column, batch_size=1024):
+    """Yield the values of one column of one sheet of an extract, row by row.
+    
+    Reads the columnar extract next to json_file when it is at least as new
+    as the JSON (only that sheet's column, in batches of batch_size rows).
+    Otherwise streams extracted_data.json: other sheets are skipped without
+    being decoded and only one row is held at a time. Rows without the
+    column yield None; mixed-type columns come back as strings from the
+    columnar extract (see _typed_sheet_table()).
+    """
+    
+    columnar_dir = os.path.join(os.path.dirname(json_file), COLUMNAR_DIR)
+    manifest_file = os.path.join(columnar_dir, COLUMNAR_MANIFEST)
+    if os.path.exists(manifest_file) and os.path.getmtime(manifest_file) >= os.path.getmtime(json_file):
+        import pyarrow.parquet as pq
+        
+        manifest = load_columnar_manifest(columnar_dir)
+        if sheet_name not in manifest["sheets"]:
+            raise KeyError(f"Sheet '{sheet_name}' not found in columnar extract")
+        parquet_file = pq.ParquetFile(os.path.join(columnar_dir, manifest["sheets"][sheet_name]["file"]),
+                                      memory_map=True)
+        if column not in parquet_file.schema_arrow.names:
+            yield from (None for _ in range(parquet_file.metadata.num_rows))
+            return
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=[column]):
+            yield from batch.column(0).to_pylist()
+        return
+    
+    with open(json_file, 'r', encoding='utf-8') as f:
+        stream = _JsonStream(f)
+        if not (stream.find("sheets") and stream.find(sheet_name)):
+            raise KeyError(f"Sheet '{sheet_name}' not found in {json_file}")
+        if not stream.find("data"):
+            return
+        for row in stream.items():
+            yield row.get(column) if isinstance(row, dict) else None
+
+def sheet_csv_filename(sheet_name):
+    """Return the CSV file name used for a sheet"""
+    return f"{sheet_name.replace(' ', '_').replace('/', '_')}.csv"
+
+def _column_names(header_row, width=0):
+    """Build column names from a header row, naming blanks the way pandas does
+    
+    The header is padded to width columns; duplicate names get pandas'
+    ".1", ".2" suffixes so no column is lost when rows become dicts.
+    """
+    
+    header_row = list(header_row) + [None] * (width - len(header_row))
+    names = [f"Unnamed: {i}" if value is None else str(value)
+             for i, value in enumerate(header_row)]
+    
+    # Same mangling as pandas' python parser: given names are numbered
+    # before unnamed ones, skipping suffixes that are already taken
+    unnamed = [i for i, value in enumerate(header_row) if value is None]
+    named = [i for i, value in enumerate(header_row) if value is not None]
+    taken = set(names)
+    counts = {}
+    for i in named + unnamed:
+        name = original = names[i]
+        count = counts.get(name, 0)
+        while count:
+            counts[original] = count + 1
+            name = f"{original}.{count}"
+            count = count + 1 if name in taken else counts.get(name, 0)
+        names[i] = name
+        counts[name] = count + 1
+    return names
+
+def _update_running_summary(stats, value):
+    """Fold one cell value into a running count/sum/min/max for its column"""
+    
+    if value is None or stats["numeric"] is False:
+        return
+    
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        # Mixed column - pandas would not treat it as numeric
+        stats["numeric"] = False
+        return
+    
+    stats["count"] += 1
+    stats["sum"] += value
+    stats["min"] = value if stats["min"] is None else min(stats["min"], value)
+    stats["max"] = value if stats["max"] is None else max(stats["max"], value)
+
+def _finish_running_summary(column_stats):
+    """Convert running column statistics into the summary dictionary format"""
+    
+    summary = {}
+    for col, stats in column_stats.items():
+        if stats["numeric"] is False:
+            continue
+        count = stats["count"]
+        summary[col] = {
+            "count": count,
+            "mean": float(stats["sum"] / count) if count else None,
+            "sum": float(stats["sum"]),
+            "min": float(stats["min"]) if stats["min"] is not None else None,
+            "max": float(stats["max"]) if stats["max"] is not None else None
+        }
+    return summary
+
+def extract_xlsx_data_streaming(file_path, output_dir, sample_rows=5):
+    """Extract an XLSX file in one pass, streaming rows straight to the outputs.
+    
+    Reads every sheet once through openpyxl's read-only row iterators and
+    writes each row to its sheet CSV and to extracted_data.json as soon as it
+    is read. Only the running column statistics and the first few sample rows
+    are kept in memory, so peak memory does not grow with the workbook size.
+    Produces the same files as extract_xlsx_data() + save_extracted_data(),
+    except that integer columns with blank cells keep their integers (pandas
+    turns the whole column into floats, which needs the column up front).
+    """
+    
+    from openpyxl import load_workbook
+    
+    print(f"Streaming XLSX file: {file_path}")
+    
+    try:
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+    except Exception as e:
+        print(f"Error reading Excel file: {e}")
+        return None
+    
+    os.makedirs(output_dir, exist_ok=True)
+    
+    metadata = {
+        "file_name": os.path.basename(file_path),
+        "total_sheets": len(workbook.sheetnames),
+        "sheet_names": workbook.sheetnames
+    }
+    
+    print(f"Found {len(workbook.sheetnames)} sheets:")
+    for i, sheet_name in enumerate(workbook.sheetnames):
+        print(f"  {i+1}. {sheet_name}")
+    
+    # Lightweight copy of the extract (no row data beyond the samples)
+    # used for the markdown summary and returned to the caller
+    summary_data = {"metadata": metadata, "sheets": {}}
+    
+    json_file = os.path.join(output_dir, "extracted_data.json")
+    
+    try:
+        with open(json_file, 'w', encoding='utf-8') as jf:
+            jf.write('{\n  "metadata": ')
+            jf.write(json.dumps(metadata, ensure_ascii=False))
+            jf.write(',\n  "sheets": {')
+            
+            for sheet_index, sheet_name in enumerate(workbook.sheetnames):
+                print(f"\nProcessing sheet: {sheet_name}")
+                
+                if sheet_index:
+                    jf.write(',')
+                jf.write(f'\n    {json.dumps(sheet_name, ensure_ascii=False)}: ')
+                
+                try:
+                    sheet_info = _stream_sheet(workbook[sheet_name], sheet_name, jf,
+                                               output_dir, sample_rows)
+                except Exception as e:
+                    # Failed before anything was written for this sheet
+                    sheet_info = {"name": sheet_name, "error": str(e)}
+                    jf.write(json.dumps(sheet_info, ensure_ascii=False))
+                
+                if "error" in sheet_info:
+                    print(f"  - Error reading sheet '{sheet_name}': {sheet_info['error']}")
+                else:
+                    print(f"  - Extracted {sheet_info['rows']} rows, {sheet_info['columns']} columns")
+                
+                summary_data["sheets"][sheet_name] = sheet_info
+            
+            jf.write('\n  }\n}\n')
+    finally:
+        workbook.close()
+    
+    print(f"\nSaved complete data to: {json_file}")
+    
+    md_file = os.path.join(output_dir, "data_summary.md")
+    create_markdown_summary(summary_data, md_file)
+    print(f"Saved summary to: {md_file}")
+    
+    return summary_data
+
+def _stream_sheet(worksheet, sheet_name, jf, output_dir, sample_rows):
+    """Stream one worksheet to its CSV file and to the open JSON file
+    
+    Errors after the sheet object has been opened in the JSON close it with
+    an "error" key and are returned in the sheet info, so the file stays
+    valid JSON; the partial CSV is removed.
+    """
+    
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    # Rows are padded to the sheet dimension, so cells beyond the header
+    # get "Unnamed: n" columns like pandas gives them
+    width = worksheet.max_column or 0
+    column_names = _column_names(header, width) if header else []
+    column_stats = {
+        col: {"numeric": None, "count": 0, "sum": 0, "min": None, "max": None}
+        for col in column_names
+    }
+    
+    # Sheet name and column list go first; row count and summary are only
+    # known once the rows have been streamed, so they are written after
+    jf.write('{"name": ' + json.dumps(sheet_name, ensure_ascii=False))
+    jf.write(', "column_names": ' + json.dumps(column_names, ensure_ascii=False))
+    jf.write(', "data": [')
+    
+    samples = []
+    row_count = 0
+    csv_file = os.path.join(output_dir, sheet_csv_filename(sheet_name))
+    csv_handle = None
+    writer = None
+    
+    try:
+        for row_number, values in enumerate(rows, start=2):
+            if all(value is None for value in values):
+                continue
+            
+            if any(value is not None for value in values[len(column_names):]):
+                raise ValueError(f"row {row_number} has cells beyond the "
+                                 f"{len(column_names)} columns of the sheet dimension")
+            
+            record = dict(zip(column_names, values))
+            for col in column_names[len(values):]:
+                record[col] = None
+            
+            if writer is None:
+                csv_handle = open(csv_file, 'w', newline='', encoding='utf-8')
+                writer = csv.writer(csv_handle, lineterminator="\n")
+                writer.writerow(column_names)
+            writer.writerow([record[col] for col in column_names])
+            
+            jf.write(',' if row_count else '')
+            jf.write('\n      ' + json.dumps(record, ensure_ascii=False, default=str))
+            
+            for col in column_names:
+                _update_running_summary(column_stats[col], record[col])
+            
+            if len(samples) < sample_rows:
+                samples.append(record)
+            row_count += 1
+    except Exception as e:
+        if csv_handle is not None:
+            csv_handle.close()
+            os.remove(csv_file)
+        jf.write('\n    ], "error": ' + json.dumps(str(e), ensure_ascii=False) + '}')
+        return {"name": sheet_name, "error": str(e)}
+    finally:
+        if csv_handle is not None and not csv_handle.closed:
+            csv_handle.close()
+    
+    if writer is not None:
+        print(f"  - Saved sheet '{sheet_name}' to: {csv_file}")
+    
+    summary = _finish_running_summary(column_stats) if row_count else {}
+    
+    jf.write('\n    ], "rows": ' + str(row_count))
+    jf.write(', "columns": ' + str(len(column_names)))
+    jf.write(', "summary": ' + json.dumps(summary, ensure_ascii=False) + '}')
+    
+    return {
+        "name": sheet_name,
+        "rows": row_count,
+        "columns": len(column_names),
+        "column_names": column_names,
+        "data": samples,
+        "summary": summary
+    }
 
 def create_markdown_summary(data, output_file):
     """Create a markdown summary of the extracted data"""
@@ -174,12 +655,24 @@ def create_markdown_summary(data, output_file):
                     f.write("| " + " | ".join(row_values) + " |\n")
                 f.write("\n")
 
-def main():
+def main(argv=None):
     """Main execution function"""
     
-    # File path
-    file_path = "ESC Scope 3 Demo - Chat and Outputs.xlsx"
-    output_dir = "extracted_xlsx_data"
+    parser = argparse.ArgumentParser(description="Extract data from an XLSX workbook")
+    parser.add_argument("file_path", nargs="?", default="ESC Scope 3 Demo - Chat and Outputs.xlsx",
+                        help="Workbook to extract")
+    parser.add_argument("--output-dir", default="extracted_xlsx_data",
+                        help="Directory for the extracted files")
+    parser.add_argument("--stream", action="store_true",
+                        help="Single-pass streaming mode for large workbooks (flat memory use)")
+    parser.add_argument("--columnar", action="store_true",
+                        help="Also write one Parquet file per sheet plus a manifest")
+    args = parser.parse_args(argv)
+    if args.stream and args.columnar:
+        parser.error("--columnar is written from the in-memory extract and cannot be combined with --stream")
+    
+    file_path = args.file_path
+    output_dir = args.output_dir
     
     if not os.path.exists(file_path):
         print(f"Error: File '{file_path}' not found")
@@ -188,12 +681,20 @@ def main():
     print("ESC Scope 3 Demo - Excel Data Extractor")
     print("=" * 50)
     
+    if args.stream:
+        if extract_xlsx_data_streaming(file_path, output_dir) is None:
+            print("Data extraction failed.")
+            return 1
+        print(f"\nData extraction completed successfully!")
+        print(f"Check the '{output_dir}' directory for extracted files.")
+        return 0
+    
     # Extract data
     extracted_data = extract_xlsx_data(file_path)
     
     if extracted_data:
         # Save data
-        save_extracted_data(extracted_data, output_dir)
+        save_extracted_data(extracted_data, output_dir, columnar=args.columnar)
         print(f"\nData extraction completed successfully!")
         print(f"Check the '{output_dir}' directory for extracted files.")
     else:
@@ -65,7 +65,7 @@ def main():
         ('complete_table_rows.tsx', 'Ready-to-use TSX table rows'),
         ('table_update_summary.txt', 'Detailed analysis and breakdown'),
         ('complete_investment_data.csv', 'Investment data reference'),
-        ('apply_table_updates.py', 'Application instructions'),
+        ('apply_table_updates.py', 'Automated dashboard patch'),
         ('validate_and_replace.py', 'Validation and replacement'),
         ('replacement_tbody.txt', 'Exact replacement content')
     ]
@@ -111,25 +111,21 @@ AFTER:
     print("USAGE INSTRUCTIONS:")
     print("=" * 60)
     print("""
-OPTION 1: Use the complete TSX file
+OPTION 1: Patch the dashboard automatically (recommended)
+---------------------------------------------------------
+1. Run: python generate_complete_table_structure.py
+2. Run: python apply_table_updates.py
+   - validates the rows against complete_investment_data.csv
+   - replaces the DETAILED ASSET LEVEL ANALYSIS tbody in index-amil.tsx
+   - safe to re-run: an unchanged table is not rewritten
+3. Preview first with: python apply_table_updates.py --dry-run
+
+OPTION 2: Use the complete TSX file
 -----------------------------------
 1. Open: complete_table_rows.tsx
 2. Copy the entire <tbody>...</tbody> section
 3. Replace the existing tbody in index-amil.tsx
 4. Save and test
-
-OPTION 2: Use the replacement file
-----------------------------------
-1. Open: replacement_tbody.txt
-2. Copy the exact content
-3. Use replace_string_in_file tool with the old tbody content
-4. Paste the new content as newString parameter
-
-OPTION 3: Follow the application script
----------------------------------------
-1. Run: python apply_table_updates.py
-2. Follow the detailed instructions
-3. Use the provided replacement content
 """)
     
     # Show benefits
@@ -4,9 +4,58 @@ Generate AMIL Dummy Excel File
 Based on amil_excel_file_requirements.md and amil_dashboard_data_extraction.md
 """
 
+import itertools
 import pandas as pd
 from datetime import datetime
-import random
+
+# Column widths are sized to the longest value, capped at this width
+MAX_COLUMN_WIDTH = 50
+# Rows converted to Python values at a time when streaming a sheet
+WRITE_CHUNK_ROWS = 50_000
+
+def column_widths(df, max_width=MAX_COLUMN_WIDTH):
+    """Width of each column: longest header or value as text + 2, capped at max_width"""
+    
+    widths = []
+    for column in df.columns:
+        lengths = df[column].dropna().astype(str).str.len()
+        longest = max(len(str(column)), int(lengths.max()) if len(lengths) else 0)
+        widths.append(min(longest + 2, max_width))
+    return widths
+
+def write_workbook(filename, sheets, max_width=MAX_COLUMN_WIDTH, chunk_rows=WRITE_CHUNK_ROWS):
+    """Write DataFrames to an xlsx file, one sheet each, streaming the rows.
+    
+    Uses openpyxl's write-only workbook, so rows go straight to the file
+    instead of being kept as cell objects; column widths are computed from
+    the DataFrames before writing. A sheet may also be given as an iterable
+    of DataFrame chunks, which are written one after another (widths then
+    come from the first chunk).
+    """
+    
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+    
+    workbook = Workbook(write_only=True)
+    for sheet_name, frames in sheets.items():
+        worksheet = workbook.create_sheet(sheet_name)
+        chunks = iter([frames] if isinstance(frames, pd.DataFrame) else frames)
+        first = next(chunks, None)
+        if first is None:
+            continue
+        for position, width in enumerate(column_widths(first, max_width), 1):
+            worksheet.column_dimensions[get_column_letter(position)].width = width
+        worksheet.append([str(column) for column in first.columns])
+        
+        for df in itertools.chain([first], chunks):
+            for start in range(0, len(df), chunk_rows):
+                chunk = df.iloc[start:start + chunk_rows]
+                chunk = chunk.astype(object).where(chunk.notna(), None)
+                for row in chunk.itertuples(index=False, name=None):
+                    worksheet.append(row)
+    
+    workbook.save(filename)
+    return filename
 
 def generate_dummy_excel():
     """Generate a comprehensive dummy Excel file for AMIL ESG analysis"""
@@ -272,45 +321,26 @@ def generate_dummy_excel():
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f'investment_data.xlsx'
     
-    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-        # Write each sheet
-        pd.DataFrame(bond_data).to_excel(writer, sheet_name='Bond Holdings', index=False)
-        pd.DataFrame(real_estate_data).to_excel(writer, sheet_name='Real Estate Equity', index=False)
-        pd.DataFrame(infrastructure_data).to_excel(writer, sheet_name='Infrastructure Equity', index=False)
-        
-        # Create summary sheet
-        summary_data = [
-            {'Metric': 'Total Portfolio Value', 'Value': '$46,000,000', 'Notes': 'Sum of all investments'},
-            {'Metric': 'Total Assets', 'Value': '18', 'Notes': '14 Bonds + 3 Real Estate + 2 Infrastructure (matching ESG dashboard)'},
-            {'Metric': 'Bond Holdings Value', 'Value': '$42,000,000', 'Notes': '14 bond investments'},
-            {'Metric': 'Real Estate Value', 'Value': '$21,000,000', 'Notes': '3 real estate investments'},
-            {'Metric': 'Infrastructure Value', 'Value': '$30,800,000', 'Notes': '2 infrastructure investments'},
-            {'Metric': 'Data Quality', 'Value': 'High', 'Notes': '75% high quality data sources'},
-            {'Metric': 'PCAF Compliance', 'Value': 'Category 15', 'Notes': 'All investments PCAF compliant'},
-            {'Metric': 'Total Emissions', 'Value': '180 tCO₂e', 'Notes': 'Portfolio financed emissions (matching dashboard)'},
-            {'Metric': 'Carbon Intensity', 'Value': '42 tCO₂e/£m', 'Notes': 'Portfolio average (matching dashboard)'},
-            {'Metric': 'Generated Date', 'Value': datetime.now().strftime("%Y-%m-%d"), 'Notes': 'File creation date'}
-        ]
-        pd.DataFrame(summary_data).to_excel(writer, sheet_name='Portfolio Summary', index=False)
-        
-        # Format the sheets
-        for sheet_name in writer.sheets:
-            worksheet = writer.sheets[sheet_name]
-            
-            # Auto-adjust column widths
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                
-                adjusted_width = min(max_length + 2, 50)
-                worksheet.column_dimensions[column_letter].width = adjusted_width
+    # Create summary sheet
+    summary_data = [
+        {'Metric': 'Total Portfolio Value', 'Value': '$46,000,000', 'Notes': 'Sum of all investments'},
+        {'Metric': 'Total Assets', 'Value': '18', 'Notes': '14 Bonds + 3 Real Estate + 2 Infrastructure (matching ESG dashboard)'},
+        {'Metric': 'Bond Holdings Value', 'Value': '$42,000,000', 'Notes': '14 bond investments'},
+        {'Metric': 'Real Estate Value', 'Value': '$21,000,000', 'Notes': '3 real estate investments'},
+        {'Metric': 'Infrastructure Value', 'Value': '$30,800,000', 'Notes': '2 infrastructure investments'},
+        {'Metric': 'Data Quality', 'Value': 'High', 'Notes': '75% high quality data sources'},
+        {'Metric': 'PCAF Compliance', 'Value': 'Category 15', 'Notes': 'All investments PCAF compliant'},
+        {'Metric': 'Total Emissions', 'Value': '180 tCO₂e', 'Notes': 'Portfolio financed emissions (matching dashboard)'},
+        {'Metric': 'Carbon Intensity', 'Value': '42 tCO₂e/£m', 'Notes': 'Portfolio average (matching dashboard)'},
+        {'Metric': 'Generated Date', 'Value': datetime.now().strftime("%Y-%m-%d"), 'Notes': 'File creation date'}
+    ]
+    
+    write_workbook(filename, {
+        'Bond Holdings': pd.DataFrame(bond_data),
+        'Real Estate Equity': pd.DataFrame(real_estate_data),
+        'Infrastructure Equity': pd.DataFrame(infrastructure_data),
+        'Portfolio Summary': pd.DataFrame(summary_data),
+    })
     
     print(f"✅ Generated Excel file: {filename}")
     print(f"📊 Portfolio Summary:")
@@ -11,12 +11,32 @@ It creates:
 2. A TypeScript/TSX component snippet ready for copy-paste
 3. A summary of all updates needed
 
+The primary/secondary/estimated data mix and the PCAF score come from the
+S5 imputation output (impute_proxy_emissions.py) when --data-mix is given;
+holdings it does not cover show the ESC portfolio average mix and their
+demo PCAF score.
+
 Usage:
-    python generate_complete_table_structure.py
+    python generate_complete_table_structure.py [--data-mix imputed_emissions.csv]
 """
 
+import argparse
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from functools import cached_property
+
+from emissions_cube import EmissionsCube
+from holdings_model import (
+    ASSET_CLASS_BOND,
+    ASSET_CLASS_INFRASTRUCTURE,
+    ASSET_CLASS_REAL_ESTATE,
+    format_percentages,
+    format_scores,
+    holdings_from_records,
+    parse_percentage_array,
+    to_display_records,
+)
 
 def format_currency(amount):
     """Format currency values for display."""
@@ -36,8 +56,151 @@ def format_large_currency(amount):
     else:
         return format_currency(amount)
 
-def generate_table_data():
-    """Generate the complete investment data structure."""
+# Whole amounts below this are exact in float64, so integer rounding matches
+# the scalar formatters
+_MAX_EXACT_INTEGER = 2 ** 53
+
+def _format_tier(values, mask, unit, decimals, suffix, out):
+    """Format the masked values as '£{value / unit:.{decimals}f}{suffix}' into out.
+    
+    Matches the scalar formatters exactly. Non-negative whole amounts are
+    rounded with integer arithmetic; the rounded display values of a tier
+    have few distinct values, so each one is formatted once and broadcast
+    back. Exact halfway cases, fractional and negative amounts go through
+    the scalar f-string per distinct value, so rounding stays identical.
+    """
+    if not mask.any():
+        return
+    
+    selected = values[mask]
+    result = np.empty(len(selected), dtype=object)
+    step = unit // 10 ** decimals
+    scale = 10 ** decimals
+    
+    exact = (selected >= 0) & (selected < _MAX_EXACT_INTEGER) & (selected == np.floor(selected))
+    if step > 1:
+        exact &= np.fmod(selected, step) != step / 2
+    
+    if exact.any():
+        scaled = (selected[exact].astype(np.int64) + step // 2) // step
+        uniques, codes = np.unique(scaled, return_inverse=True)
+        if decimals:
+            labels = [f"£{u // scale}.{u % scale:0{decimals}d}{suffix}" for u in uniques.tolist()]
+        else:
+            separator = ',' if unit == 1 else ''
+            labels = [f"£{u:{separator}}{suffix}" for u in uniques.tolist()]
+        result[exact] = np.array(labels, dtype=object)[codes]
+    
+    rest = ~exact
+    if rest.any():
+        spec = f",.{decimals}f" if unit == 1 else f".{decimals}f"
+        codes, uniques = pd.factorize(selected[rest] / unit if unit != 1 else selected[rest])
+        labels = [f"£{value:{spec}}{suffix}" for value in uniques]
+        result[rest] = np.array(labels, dtype=object)[codes]
+    
+    out[mask] = result
+
+def _prepare_currency_column(values, missing):
+    """Split a column into float values, a numeric mask and a pre-filled output.
+    
+    Text entries (e.g. the '-' EVIC placeholder) are passed through
+    unchanged, like the isinstance check in the per-element apply;
+    NaN/None become the missing placeholder.
+    """
+    series = pd.Series(values)
+    if series.dtype.kind in 'iuf':
+        numbers = series.to_numpy(dtype=np.float64)
+        out = np.full(len(series), missing, dtype=object)
+        return numbers, ~np.isnan(numbers), out
+    
+    raw = series.to_numpy(dtype=object)
+    is_text = np.fromiter((isinstance(value, str) for value in raw), dtype=bool, count=len(raw))
+    is_missing = pd.isna(raw) & ~is_text
+    
+    numbers = raw.copy()
+    numbers[is_text | is_missing] = np.nan
+    numbers = numbers.astype(np.float64)
+    
+    out = raw.copy()
+    out[is_missing] = missing
+    return numbers, ~(is_text | is_missing), out
+
+def format_currency_column(values, missing='-'):
+    """Vectorized format_currency() over a whole column; returns an object array."""
+    
+    numbers, numeric, out = _prepare_currency_column(values, missing)
+    millions = numeric & (numbers >= 1000000)
+    thousands = numeric & ~millions & (numbers >= 1000)
+    _format_tier(numbers, millions, 1000000, 1, 'm', out)
+    _format_tier(numbers, thousands, 1000, 0, 'k', out)
+    _format_tier(numbers, numeric & ~millions & ~thousands, 1, 0, '', out)
+    return out
+
+def format_large_currency_column(values, missing='-'):
+    """Vectorized format_large_currency() over a whole column; returns an object array."""
+    
+    numbers, numeric, out = _prepare_currency_column(values, missing)
+    billions = numeric & (numbers >= 1000000000)
+    millions = numeric & ~billions & (numbers >= 1000000)
+    thousands = numeric & ~billions & ~millions & (numbers >= 1000)
+    _format_tier(numbers, billions, 1000000000, 1, 'b', out)
+    _format_tier(numbers, millions, 1000000, 0, 'm', out)
+    _format_tier(numbers, thousands, 1000, 0, 'k', out)
+    _format_tier(numbers, numeric & ~billions & ~millions & ~thousands, 1, 0, '', out)
+    return out
+
+# Portfolio data mix stated in ESC_Data_Quality.csv ("Investments Under
+# Consideration"); used for holdings without a computed S5 mix
+DEMO_DATA_MIX = {'primary': 0.60, 'secondary': 0.25, 'estimated': 0.15}
+
+def apply_data_mix(records, data_mix=None):
+    """Fill each record's primary/secondary/estimated columns and PCAF score.
+
+    data_mix is a frame indexed by holding name with primary, secondary and
+    estimated fractions and the pcaf_score they give, e.g.
+    impute_proxy_emissions.data_quality_mix() indexed by name. Holdings it
+    does not cover get DEMO_DATA_MIX, keep their demo PCAF score and are
+    listed in a warning.
+    """
+    
+    names = pd.Index([record['name'] for record in records])
+    if data_mix is not None:
+        missing = names[~names.isin(data_mix.index)]
+        if len(missing):
+            print(f"⚠️  {len(missing)} holdings missing from the S5 data mix, using DEMO_DATA_MIX and demo PCAF scores: "
+                  + ", ".join(missing))
+    for provenance, default in DEMO_DATA_MIX.items():
+        if data_mix is None:
+            fractions = np.full(len(names), default)
+        else:
+            fractions = data_mix[provenance].reindex(names).fillna(default).to_numpy()
+        for record, label in zip(records, format_percentages(fractions)):
+            record[provenance] = label
+    if data_mix is not None:
+        scores = data_mix['pcaf_score'].reindex(names).to_numpy()
+        for record, score, label in zip(records, scores, format_scores(scores)):
+            if not np.isnan(score):
+                record['pcaf_score'] = label
+    return records
+
+def load_data_mix(csv_file):
+    """Read the per-holding data mix and PCAF score from an impute_proxy_emissions.py output CSV."""
+    
+    imputed = pd.read_csv(csv_file, dtype=str)
+    mix = pd.DataFrame(
+        {provenance: parse_percentage_array(imputed[provenance]) for provenance in DEMO_DATA_MIX},
+        index=pd.Index(imputed['name'], name='name')
+    )
+    mix['pcaf_score'] = pd.to_numeric(imputed['pcaf_score'], errors='coerce').to_numpy()
+    return mix.groupby(level='name').first()
+
+def generate_table_data(data_mix=None):
+    """Generate the complete investment data structure.
+    
+    The primary/secondary/estimated data mix is taken from data_mix (see
+    apply_data_mix) rather than written into each record; the hand-written
+    PCAF scores are demo values, replaced by the data_mix scores when given.
+    """
     
     # Bond Holdings (14 investments)
     bond_data = [
@@ -48,10 +211,7 @@ def generate_table_data():
             'investment_amount': 2800000,
             'evic': 140000000,
             'ownership': '2.0%',
-            'pcaf_score': '2.0',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.0'
         },
         {
             'name': 'Thames Utilities PLC',
@@ -60,10 +220,7 @@ def generate_table_data():
             'investment_amount': 3200000,
             'evic': 160000000,
             'ownership': '2.0%',
-            'pcaf_score': '2.2',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.2'
         },
         {
             'name': 'Scottish Power Holdings',
@@ -72,10 +229,7 @@ def generate_table_data():
             'investment_amount': 2900000,
             'evic': 145000000,
             'ownership': '2.0%',
-            'pcaf_score': '2.1',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.1'
         },
         {
             'name': 'North Sea Energy Corp',
@@ -84,10 +238,7 @@ def generate_table_data():
             'investment_amount': 3100000,
             'evic': 155000000,
             'ownership': '2.0%',
-            'pcaf_score': '2.2',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.2'
         },
         {
             'name': 'Renewable Power UK Ltd',
@@ -96,10 +247,7 @@ def generate_table_data():
             'investment_amount': 2700000,
             'evic': 135000000,
             'ownership': '2.0%',
-            'pcaf_score': '2.0',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.0'
         },
         {
             'name': 'Offshore Wind Holdings',
@@ -108,10 +256,7 @@ def generate_table_data():
             'investment_amount': 3300000,
             'evic': 165000000,
             'ownership': '2.0%',
-            'pcaf_score': '2.2',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.2'
         },
         {
             'name': 'Advanced Materials Group',
@@ -120,10 +265,7 @@ def generate_table_data():
             'investment_amount': 1800000,
             'evic': 90000000,
             'ownership': '2.0%',
-            'pcaf_score': '2.4',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.4'
         },
         {
             'name': 'Sustainable Chemicals PLC',
@@ -132,10 +274,7 @@ def generate_table_data():
             'investment_amount': 1900000,
             'evic': 95000000,
             'ownership': '2.0%',
-            'pcaf_score': '2.2',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.2'
         },
         {
             'name': 'Green Building Materials',
@@ -144,10 +283,7 @@ def generate_table_data():
             'investment_amount': 2000000,
             'evic': 100000000,
             'ownership': '2.0%',
-            'pcaf_score': '2.0',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.0'
         },
         {
             'name': 'Circular Economy Corp',
@@ -156,10 +292,7 @@ def generate_table_data():
             'investment_amount': 1700000,
             'evic': 85000000,
             'ownership': '2.0%',
-            'pcaf_score': '2.1',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.1'
         },
         {
             'name': 'UK Government Green Bond',
@@ -168,10 +301,7 @@ def generate_table_data():
             'investment_amount': 4500000,
             'evic': 22500000000,
             'ownership': '0.02%',
-            'pcaf_score': '2.2',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.2'
         },
         {
             'name': 'UK Treasury Sustainability Bond',
@@ -180,10 +310,7 @@ def generate_table_data():
             'investment_amount': 4200000,
             'evic': 21000000000,
             'ownership': '0.02%',
-            'pcaf_score': '2.2',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.2'
         },
         {
             'name': 'UK Infrastructure Bond',
@@ -192,10 +319,7 @@ def generate_table_data():
             'investment_amount': 3800000,
             'evic': 19000000000,
             'ownership': '0.02%',
-            'pcaf_score': '2.0',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.0'
         },
         {
             'name': 'UK Climate Transition Bond',
@@ -204,10 +328,7 @@ def generate_table_data():
             'investment_amount': 4100000,
             'evic': 20500000000,
             'ownership': '0.02%',
-            'pcaf_score': '2.0',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.0'
         }
     ]
     
@@ -220,10 +341,7 @@ def generate_table_data():
             'investment_amount': 8900000,
             'evic': '-',  # Real estate doesn't have EVIC
             'ownership': '75%',
-            'pcaf_score': '2.8',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.8'
         },
         {
             'name': 'Birmingham Green Energy Hub',
@@ -232,10 +350,7 @@ def generate_table_data():
             'investment_amount': 6700000,
             'evic': '-',  # Real estate doesn't have EVIC
             'ownership': '60%',
-            'pcaf_score': '2.9',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.9'
         },
         {
             'name': 'Manchester Sustainable Housing',
@@ -244,10 +359,7 @@ def generate_table_data():
             'investment_amount': 5400000,
             'evic': '-',  # Real estate doesn't have EVIC
             'ownership': '50%',
-            'pcaf_score': '2.6',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.6'
         }
     ]
     
@@ -260,10 +372,7 @@ def generate_table_data():
             'investment_amount': 18500000,
             'evic': '-',  # Infrastructure doesn't have EVIC
             'ownership': '25%',
-            'pcaf_score': '2.5',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.5'
         },
         {
             'name': 'Cornwall Solar Energy Trust',
@@ -272,111 +381,314 @@ def generate_table_data():
             'investment_amount': 12300000,
             'evic': '-',  # Infrastructure doesn't have EVIC
             'ownership': '40%',
-            'pcaf_score': '2.8',
-            'primary': '60%',
-            'secondary': '25%',
-            'estimated': '15%'
+            'pcaf_score': '2.8'
         }
     ]
     
+    for records in (bond_data, real_estate_data, infrastructure_data):
+        apply_data_mix(records, data_mix)
+    
     return bond_data, real_estate_data, infrastructure_data
 
-def generate_tsx_table_rows():
-    """Generate the complete TSX table rows."""
+def portfolio_totals(holdings):
+    """Portfolio totals of a typed holdings frame."""
     
-    bond_data, real_estate_data, infrastructure_data = generate_table_data()
-    
-    tsx_rows = []
-    
-    # Generate bond rows
-    for investment in bond_data:
-        investment_display = format_currency(investment['investment_amount'])
-        evic_display = format_large_currency(investment['evic'])
-        
-        row = f'''                    <tr className="hover:bg-gray-50">
-                      <td className="border border-gray-300 p-2">{investment['name']}</td>
-                      <td className="border border-gray-300 p-2">{investment['sector']}</td>
-                      <td className="border border-gray-300 p-2">{investment['asset_class']}</td>
-                      <td className="border border-gray-300 p-2 text-center">{investment_display}</td>
-                      <td className="border border-gray-300 p-2 text-center">{evic_display}</td>
-                      <td className="border border-gray-300 p-2 text-center">{investment['ownership']}</td>
-                      <td className="border border-gray-300 p-2 text-center font-bold">{investment['pcaf_score']}</td>
-                      <td className="border border-gray-300 p-2 text-center">{investment['primary']}</td>
-                      <td className="border border-gray-300 p-2 text-center">{investment['secondary']}</td>
-                      <td className="border border-gray-300 p-2 text-center">{investment['estimated']}</td>
-                    </tr>'''
-        tsx_rows.append(row)
-    
-    # Generate real estate rows (with special styling)
-    for investment in real_estate_data:
-        investment_display = format_currency(investment['investment_amount'])
-        evic_display = investment['evic']  # Will be '-'
-        
-        color_class = "text-red-600" if float(investment['pcaf_score']) >= 2.5 else ""
-        
-        row = f'''                    <tr className="hover:bg-gray-50 bg-blue-50">
-                      <td className="border border-gray-300 p-2 font-semibold">{investment['name']}</td>
-                      <td className="border border-gray-300 p-2">{investment['sector']}</td>
-                      <td className="border border-gray-300 p-2 font-semibold">{investment['asset_class']}</td>
-                      <td className="border border-gray-300 p-2 text-center">{investment_display}</td>
-                      <td className="border border-gray-300 p-2 text-center">{evic_display}</td>
-                      <td className="border border-gray-300 p-2 text-center">{investment['ownership']}</td>
-                      <td className="border border-gray-300 p-2 text-center font-bold {color_class}">{investment['pcaf_score']}</td>
-                      <td className="border border-gray-300 p-2 text-center">{investment['primary']}</td>
-                      <td className="border border-gray-300 p-2 text-center">{investment['secondary']}</td>
-                      <td className="border border-gray-300 p-2 text-center">{investment['estimated']}</td>
-                    </tr>'''
-        tsx_rows.append(row)
-    
-    # Generate infrastructure rows (with special styling)
-    for investment in infrastructure_data:
-        investment_display = format_currency(investment['investment_amount'])
-        evic_display = investment['evic']  # Will be '-'
-        
-        color_class = "text-red-600" if float(investment['pcaf_score']) >= 2.5 else ""
-        
-        row = f'''                    <tr className="hover:bg-gray-50 bg-orange-50">
-                      <td className="border border-gray-300 p-2 font-semibold">{investment['name']}</td>
-                      <td className="border border-gray-300 p-2">{investment['sector']}</td>
-                      <td className="border border-gray-300 p-2 font-semibold">{investment['asset_class']}</td>
-                      <td className="border border-gray-300 p-2 text-center">{investment_display}</td>
-                      <td className="border border-gray-300 p-2 text-center">{evic_display}</td>
-                      <td className="border border-gray-300 p-2 text-center">{investment['ownership']}</td>
-                      <td className="border border-gray-300 p-2 text-center font-bold {color_class}">{investment['pcaf_score']}</td>
-                      <td className="border border-gray-300 p-2 text-center">{investment['primary']}</td>
-                      <td className="border border-gray-300 p-2 text-center">{investment['secondary']}</td>
-                      <td className="border border-gray-300 p-2 text-center">{investment['estimated']}</td>
-                    </tr>'''
-        tsx_rows.append(row)
-    
-    return tsx_rows
-
-def calculate_totals():
-    """Calculate portfolio totals."""
-    bond_data, real_estate_data, infrastructure_data = generate_table_data()
-    
-    all_investments = bond_data + real_estate_data + infrastructure_data
-    
-    total_investment = sum(inv['investment_amount'] for inv in all_investments)
+    total_investment = holdings['investment_amount'].sum()
     
     # Calculate total EVIC (only bonds have EVIC)
-    total_evic = sum(inv['evic'] for inv in bond_data if isinstance(inv['evic'], (int, float)))
+    total_evic = holdings.loc[holdings['asset_class'] == ASSET_CLASS_BOND, 'evic'].sum()
     
     # Calculate weighted average ownership
     total_ownership = total_investment / total_evic if total_evic > 0 else 0
     
+    # PCAF score and data mix weighted by investment, over holdings that have them
+    investment = holdings['investment_amount'].to_numpy(dtype=np.float64)
+    def weighted_average(column):
+        values = holdings[column].to_numpy(dtype=np.float64)
+        known = ~np.isnan(values) & ~np.isnan(investment)
+        weight = investment[known].sum()
+        return (values[known] * investment[known]).sum() / weight if weight > 0 else np.nan
+    
     return {
         'total_investment': total_investment,
         'total_evic': total_evic,
         'total_ownership_percentage': total_ownership * 100,
-        'investment_count': len(all_investments)
+        'investment_count': len(holdings),
+        'pcaf_score': weighted_average('pcaf_score'),
+        **{provenance: weighted_average(provenance) for provenance in DEMO_DATA_MIX}
+    }
+
+class PortfolioContext:
+    """Portfolio data loaded once and shared by all generators.
+    
+    The loader (generate_table_data by default, or any callable returning
+    the bond, real estate and infrastructure record lists) runs on first
+    use only. Derived aggregates and formatted columns are cached, so the
+    TSX rows, totals row, summary report and CSV export all read the
+    same single load.
+    """
+    
+    def __init__(self, loader=generate_table_data):
+        self._loader = loader
+    
+    @classmethod
+    def from_holdings(cls, holdings):
+        """Build a context around an already-loaded typed holdings frame."""
+        
+        def loader():
+            records = to_display_records(holdings)
+            return tuple(
+                [record for record in records if record['asset_class'] == asset_class]
+                for asset_class in (ASSET_CLASS_BOND, ASSET_CLASS_REAL_ESTATE, ASSET_CLASS_INFRASTRUCTURE)
+            )
+        
+        context = cls(loader)
+        context.__dict__['holdings'] = holdings
+        return context
+    
+    @cached_property
+    def records(self):
+        """(bond_data, real_estate_data, infrastructure_data) record lists."""
+        bond_data, real_estate_data, infrastructure_data = self._loader()
+        return bond_data, real_estate_data, infrastructure_data
+    
+    @property
+    def bond_data(self):
+        return self.records[0]
+    
+    @property
+    def real_estate_data(self):
+        return self.records[1]
+    
+    @property
+    def infrastructure_data(self):
+        return self.records[2]
+    
+    @cached_property
+    def all_records(self):
+        """All holdings in table order (bonds, real estate, infrastructure)."""
+        return self.bond_data + self.real_estate_data + self.infrastructure_data
+    
+    @cached_property
+    def holdings(self):
+        """Typed holdings frame (see holdings_model)."""
+        return holdings_from_records(self.all_records)
+    
+    @cached_property
+    def totals(self):
+        """Portfolio totals used by the totals row and summary report."""
+        return portfolio_totals(self.holdings)
+    
+    @cached_property
+    def asset_class_splits(self):
+        """Holding count, investment and EVIC per asset class."""
+        splits = self.cube.rollup(['asset_class']).set_index('asset_class')
+        return {
+            asset_class: {
+                'investment_count': int(splits.at[asset_class, 'holding_count']),
+                'total_investment': float(splits.at[asset_class, 'investment']),
+                'total_evic': float(splits.at[asset_class, 'evic'])
+            }
+            for asset_class in self.holdings['asset_class'].dropna().unique()
+        }
+    
+    @cached_property
+    def cube(self):
+        """Sector × asset class × geography rollups of the holdings (see emissions_cube.py)."""
+        return EmissionsCube(self.holdings)
+    
+    @cached_property
+    def formatted_columns(self):
+        """Display strings for the investment amount and EVIC columns, in table order."""
+        return pd.DataFrame({
+            'investment_amount_formatted': format_currency_column(self.holdings['investment_amount'].to_numpy()),
+            'evic_formatted': format_large_currency_column(self.holdings['evic'].to_numpy())
+        })
+    
+    def export_dataframe(self):
+        """Investment data with formatted columns, as written to the CSV export."""
+        return pd.concat([pd.DataFrame(self.all_records), self.formatted_columns], axis=1)
+
+# Row styles for the DETAILED ASSET LEVEL ANALYSIS table, one per asset class.
+# Real estate and infrastructure rows get a tinted background, bold name and
+# asset class, the raw EVIC value ('-') and red PCAF scores >= 2.5.
+TSX_ROW_STYLES = {
+    ASSET_CLASS_BOND: {
+        'row_class': 'hover:bg-gray-50',
+        'emphasis': '',
+        'format_evic': True,
+        'highlight_pcaf': False
+    },
+    ASSET_CLASS_REAL_ESTATE: {
+        'row_class': 'hover:bg-gray-50 bg-blue-50',
+        'emphasis': ' font-semibold',
+        'format_evic': False,
+        'highlight_pcaf': True
+    },
+    ASSET_CLASS_INFRASTRUCTURE: {
+        'row_class': 'hover:bg-gray-50 bg-orange-50',
+        'emphasis': ' font-semibold',
+        'format_evic': False,
+        'highlight_pcaf': True
+    }
+}
+
+# PCAF scores from here up are shown in red (highlighted rows and the totals row)
+PCAF_HIGHLIGHT_SCORE = 2.5
+
+TSX_ROW_INDENT = '                    '
+TSX_CELL_INDENT = '                      '
+
+def compile_row_template(style):
+    """Compile a row style into a str.format template for one table row."""
+    
+    def cell(css, field):
+        return f'{TSX_CELL_INDENT}<td className="border border-gray-300 p-2{css}">{{{field}}}</td>'
+    
+    pcaf_css = ' text-center font-bold {pcaf_class}' if style['highlight_pcaf'] else ' text-center font-bold'
+    cells = [
+        cell(style['emphasis'], 'name'),
+        cell('', 'sector'),
+        cell(style['emphasis'], 'asset_class'),
+        cell(' text-center', 'investment'),
+        cell(' text-center', 'evic'),
+        cell(' text-center', 'ownership'),
+        cell(pcaf_css, 'pcaf_score'),
+        cell(' text-center', 'primary'),
+        cell(' text-center', 'secondary'),
+        cell(' text-center', 'estimated')
+    ]
+    return '\n'.join(
+        [f'{TSX_ROW_INDENT}<tr className="{style["row_class"]}">'] + cells + [f'{TSX_ROW_INDENT}</tr>']
+    )
+
+TSX_ROW_TEMPLATES = {
+    asset_class: compile_row_template(style) for asset_class, style in TSX_ROW_STYLES.items()
+}
+
+def table_display_columns(context):
+    """Build the display strings for every table column from the typed holdings."""
+    
+    holdings = context.holdings
+    asset_class = holdings['asset_class'].astype(object).to_numpy()
+    format_evic = np.array([TSX_ROW_STYLES.get(a, TSX_ROW_STYLES[ASSET_CLASS_BOND])['format_evic']
+                            for a in asset_class], dtype=bool)
+    highlight = np.array([TSX_ROW_STYLES.get(a, TSX_ROW_STYLES[ASSET_CLASS_BOND])['highlight_pcaf']
+                          for a in asset_class], dtype=bool)
+    formatted = context.formatted_columns
+    
+    return {
+        'name': holdings['name'].astype(object).to_numpy(),
+        'sector': holdings['sector'].astype(object).to_numpy(),
+        'asset_class': asset_class,
+        'investment': formatted['investment_amount_formatted'].to_numpy(),
+        'evic': np.where(format_evic, formatted['evic_formatted'].to_numpy(), '-'),
+        'ownership': format_percentages(holdings['ownership'], holdings['ownership_decimals']),
+        'pcaf_score': format_scores(holdings['pcaf_score']),
+        'pcaf_class': np.where(highlight & (holdings['pcaf_score'].to_numpy() >= PCAF_HIGHLIGHT_SCORE), 'text-red-600', ''),
+        'primary': format_percentages(holdings['primary']),
+        'secondary': format_percentages(holdings['secondary']),
+        'estimated': format_percentages(holdings['estimated'])
+    }
+
+def render_tsx_rows(context=None):
+    """Yield the TSX table rows one at a time, in table order."""
+    
+    context = context or PortfolioContext()
+    columns = table_display_columns(context)
+    names = list(columns)
+    default_template = TSX_ROW_TEMPLATES[ASSET_CLASS_BOND]
+    
+    for values in zip(*columns.values()):
+        fields = dict(zip(names, values))
+        template = TSX_ROW_TEMPLATES.get(fields['asset_class'], default_template)
+        yield template.format_map(fields)
+
+def generate_tsx_table_rows(context=None):
+    """Generate the complete TSX table rows."""
+    return list(render_tsx_rows(context))
+
+def render_holding_rows(holdings):
+    """Render the TSX row of each holding in a typed holdings frame, in frame order."""
+    return generate_tsx_table_rows(PortfolioContext.from_holdings(holdings))
+
+def totals_row_cells(totals):
+    """Display strings for the totals row cells that are calculated."""
+    
+    return {
+        'investment': format_currency(totals['total_investment']),
+        'evic': format_large_currency(totals['total_evic']),
+        'ownership': f"{totals['total_ownership_percentage']:.3f}%",
+        'pcaf_score': format_scores([totals['pcaf_score']])[0],
+        **{provenance: format_percentages([totals[provenance]])[0] for provenance in DEMO_DATA_MIX}
     }
 
-def generate_summary_report():
+def render_totals_row(totals):
+    """Render the closing totals row and </tbody> tag."""
+    
+    cells = totals_row_cells(totals)
+    pcaf_class = ' text-red-600' if totals['pcaf_score'] >= PCAF_HIGHLIGHT_SCORE else ''
+    return f'''                    <tr className="bg-gray-200 font-bold">
+                      <td className="border border-gray-300 p-2">Total</td>
+                      <td className="border border-gray-300 p-2">-</td>
+                      <td className="border border-gray-300 p-2">-</td>
+                      <td className="border border-gray-300 p-2 text-center">{cells['investment']}</td>
+                      <td className="border border-gray-300 p-2 text-center">{cells['evic']}</td>
+                      <td className="border border-gray-300 p-2 text-center">{cells['ownership']}</td>
+                      <td className="border border-gray-300 p-2 text-center{pcaf_class} text-lg">{cells['pcaf_score']}</td>
+                      <td className="border border-gray-300 p-2 text-center">{cells['primary']}</td>
+                      <td className="border border-gray-300 p-2 text-center">{cells['secondary']}</td>
+                      <td className="border border-gray-300 p-2 text-center">{cells['estimated']}</td>
+                    </tr>
+                  </tbody>'''
+
+def write_tsx_table(output_file, context=None, buffer_size=1 << 16):
+    """Stream the complete tbody (rows + totals) to a file through a buffered writer.
+    
+    Rows are rendered from the context's formatted columns and written one
+    at a time, so the rendered text is never joined in memory; the
+    formatted columns themselves are built up front for all holdings.
+    Returns the number of rows written.
+    """
+    
+    context = context or PortfolioContext()
+    return write_tsx_rows(output_file, render_tsx_rows(context), calculate_totals(context), buffer_size)
+
+def write_tsx_rows(output_file, rows, totals, buffer_size=1 << 16):
+    """Write already-rendered rows and the totals row in the complete_table_rows.tsx layout.
+    
+    Returns the number of rows written.
+    """
+    
+    row_count = 0
+    
+    with open(output_file, 'w', buffering=buffer_size) as f:
+        f.write("// Complete DETAILED ASSET LEVEL ANALYSIS Table Rows\n")
+        f.write("// Generated: " + datetime.now().strftime('%Y-%m-%d %H:%M:%S') + "\n\n")
+        f.write("// Replace the entire <tbody> section with these rows:\n\n")
+        f.write("                  <tbody>\n")
+        for row in rows:
+            f.write(row)
+            f.write("\n")
+            row_count += 1
+        f.write(render_totals_row(totals))
+    
+    return row_count
+
+def calculate_totals(context=None):
+    """Calculate portfolio totals."""
+    context = context or PortfolioContext()
+    return context.totals
+
+def generate_summary_report(context=None):
     """Generate a summary report of all updates."""
     
-    bond_data, real_estate_data, infrastructure_data = generate_table_data()
-    totals = calculate_totals()
+    context = context or PortfolioContext()
+    bond_data, real_estate_data, infrastructure_data = context.records
+    totals = calculate_totals(context)
+    cells = totals_row_cells(totals)
+    pcaf_scores = format_scores([context.holdings['pcaf_score'].min(), context.holdings['pcaf_score'].max()])
+    counts = {asset_class: split['investment_count'] for asset_class, split in context.asset_class_splits.items()}
     
     report = f"""
 DETAILED ASSET LEVEL ANALYSIS - COMPLETE UPDATE SUMMARY
@@ -387,9 +699,9 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 PORTFOLIO OVERVIEW:
 ------------------
 Total Investments: {totals['investment_count']}
-- Bonds: {len(bond_data)} investments
-- Real Estate: {len(real_estate_data)} investments  
-- Infrastructure: {len(infrastructure_data)} investments
+- Bonds: {counts.get(ASSET_CLASS_BOND, 0)} investments
+- Real Estate: {counts.get(ASSET_CLASS_REAL_ESTATE, 0)} investments  
+- Infrastructure: {counts.get(ASSET_CLASS_INFRASTRUCTURE, 0)} investments
 
 Total Investment Amount: {format_currency(totals['total_investment'])}
 Total EVIC (Bonds only): {format_large_currency(totals['total_evic'])}
@@ -398,17 +710,17 @@ Portfolio Weighted Ownership: {totals['total_ownership_percentage']:.3f}%
 INVESTMENT BREAKDOWN:
 --------------------
 
-BONDS ({len(bond_data)} investments):
+BONDS ({counts.get(ASSET_CLASS_BOND, 0)} investments):
 """
     
     for i, inv in enumerate(bond_data, 1):
         report += f"  {i:2d}. {inv['name']:<35} | {format_currency(inv['investment_amount']):>8} | {format_large_currency(inv['evic']):>8} | {inv['ownership']:>6} | PCAF: {inv['pcaf_score']}\n"
     
-    report += f"\nREAL ESTATE ({len(real_estate_data)} investments):\n"
+    report += f"\nREAL ESTATE ({counts.get(ASSET_CLASS_REAL_ESTATE, 0)} investments):\n"
     for i, inv in enumerate(real_estate_data, 1):
         report += f"  {i:2d}. {inv['name']:<35} | {format_currency(inv['investment_amount']):>8} | {'N/A':>8} | {inv['ownership']:>6} | PCAF: {inv['pcaf_score']}\n"
     
-    report += f"\nINFRASTRUCTURE ({len(infrastructure_data)} investments):\n"
+    report += f"\nINFRASTRUCTURE ({counts.get(ASSET_CLASS_INFRASTRUCTURE, 0)} investments):\n"
     for i, inv in enumerate(infrastructure_data, 1):
         report += f"  {i:2d}. {inv['name']:<35} | {format_currency(inv['investment_amount']):>8} | {'N/A':>8} | {inv['ownership']:>6} | PCAF: {inv['pcaf_score']}\n"
     
@@ -416,8 +728,8 @@ BONDS ({len(bond_data)} investments):
 
 DATA QUALITY ANALYSIS:
 ---------------------
-- All investments have consistent PCAF scores (range: 2.0 - 2.9)
-- All investments use standard data distribution (60% Primary, 25% Secondary, 15% Estimated)
+- All investments have consistent PCAF scores (range: {pcaf_scores[0]} - {pcaf_scores[1]})
+- Portfolio data distribution, investment weighted ({cells['primary']} Primary, {cells['secondary']} Secondary, {cells['estimated']} Estimated)
 - Government bonds have lower ownership stakes (0.02%) due to large outstanding amounts
 - Real Estate and Infrastructure investments don't have EVIC values (marked as '-')
 
@@ -435,61 +747,39 @@ The totals row should show:
 - Investment Amount: (sum of all above) = {format_currency(totals['total_investment'])}
 - EVIC: (sum of bonds only) = {format_large_currency(totals['total_evic'])}
 - Ownership: Total Investment Amount / Total EVIC = {totals['total_ownership_percentage']:.3f}%
-- PCAF Score: 2.6 (portfolio weighted average)
+- PCAF Score: {cells['pcaf_score']} (portfolio weighted average)
 """
     
     return report
 
-def main():
+def main(argv=None):
     """Main function to generate all outputs."""
     
+    parser = argparse.ArgumentParser(description="Generate the DETAILED ASSET LEVEL ANALYSIS table")
+    parser.add_argument("--data-mix", help="S5 output CSV (impute_proxy_emissions.py) with the per-holding data mix and PCAF score")
+    args = parser.parse_args(argv)
+    
     print("=" * 80)
     print("COMPLETE TABLE STRUCTURE GENERATOR")
     print("=" * 80)
     
-    # Generate the complete TSX table rows
-    tsx_rows = generate_tsx_table_rows()
+    # Load the portfolio once; every output below shares it
+    data_mix = load_data_mix(args.data_mix) if args.data_mix else None
+    context = PortfolioContext(lambda: generate_table_data(data_mix))
     
     # Generate summary report
-    summary = generate_summary_report()
+    summary = generate_summary_report(context)
     
-    # Save TSX component
-    with open('complete_table_rows.tsx', 'w') as f:
-        f.write("// Complete DETAILED ASSET LEVEL ANALYSIS Table Rows\n")
-        f.write("// Generated: " + datetime.now().strftime('%Y-%m-%d %H:%M:%S') + "\n\n")
-        f.write("// Replace the entire <tbody> section with these rows:\n\n")
-        f.write("                  <tbody>\n")
-        for row in tsx_rows:
-            f.write(row + "\n")
-        
-        # Add totals row
-        totals = calculate_totals()
-        f.write(f'''                    <tr className="bg-gray-200 font-bold">
-                      <td className="border border-gray-300 p-2">Total</td>
-                      <td className="border border-gray-300 p-2">-</td>
-                      <td className="border border-gray-300 p-2">-</td>
-                      <td className="border border-gray-300 p-2 text-center">{format_currency(totals['total_investment'])}</td>
-                      <td className="border border-gray-300 p-2 text-center">{format_large_currency(totals['total_evic'])}</td>
-                      <td className="border border-gray-300 p-2 text-center">{totals['total_ownership_percentage']:.3f}%</td>
-                      <td className="border border-gray-300 p-2 text-center text-red-600 text-lg">2.6</td>
-                      <td className="border border-gray-300 p-2 text-center">60%</td>
-                      <td className="border border-gray-300 p-2 text-center">25%</td>
-                      <td className="border border-gray-300 p-2 text-center">15%</td>
-                    </tr>
-                  </tbody>''')
+    # Stream the TSX component straight to disk
+    row_count = write_tsx_table('complete_table_rows.tsx', context)
+    totals = calculate_totals(context)
     
     # Save summary report
     with open('table_update_summary.txt', 'w') as f:
         f.write(summary)
     
     # Save investment data as CSV for reference
-    bond_data, real_estate_data, infrastructure_data = generate_table_data()
-    all_data = bond_data + real_estate_data + infrastructure_data
-    
-    df = pd.DataFrame(all_data)
-    df['investment_amount_formatted'] = df['investment_amount'].apply(format_currency)
-    df['evic_formatted'] = df['evic'].apply(lambda x: format_large_currency(x) if isinstance(x, (int, float)) else x)
-    df.to_csv('complete_investment_data.csv', index=False)
+    context.export_dataframe().to_csv('complete_investment_data.csv', index=False)
     
     print("✅ Generated complete table structure files:")
     print("   📄 complete_table_rows.tsx - Ready-to-use TSX table rows")
@@ -506,12 +796,9 @@ def main():
     print("\n" + "="*50)
     print("PREVIEW OF GENERATED ROWS:")
     print("="*50)
-    for i, row in enumerate(tsx_rows[:3]):
-        lines = row.strip().split('\n')
-        investment_line = [line for line in lines if 'border border-gray-300 p-2">' in line and 'td' in line][0]
-        name = investment_line.split('>')[-2].split('<')[0]
+    for i, name in enumerate(context.holdings['name'][:3]):
         print(f"  {i+1}. {name}")
-    print(f"  ... and {len(tsx_rows)-3} more rows")
+    print(f"  ... and {row_count-3} more rows")
 
 if __name__ == "__main__":
     main()
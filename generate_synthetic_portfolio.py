@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Synthetic Portfolio Generator
+=============================
+
+Generates a seeded synthetic holdings book of any size (up to tens of
+millions of holdings) for load-testing the pipeline stages, and streams it
+in blocks to any of:
+
+- CSV:     complete_investment_data.csv layout plus geography, emissions and
+           total_project_cost (readable by holdings_model.load_holdings)
+- Parquet: the same columns typed (fractions instead of '2.0%' strings,
+           plus the ownership_decimals shown), one row group per block
+- xlsx:    the investment_data.xlsx sheets (Bond Holdings, Real Estate
+           Equity, Infrastructure Equity) read by load_amil_workbook()
+
+The book is generated asset class by asset class (bonds, then real estate,
+then infrastructure, as in the demo data) in fixed blocks of BLOCK_ROWS,
+each from its own seeded generator, so the output depends only on the seed
+and the holding count - never on the output format - and memory stays at
+one block.
+
+Distributions (all illustrative):
+- asset class split as in the demo book (14 : 3 : 2)
+- bonds belong to a pool of issuers (a few holdings per issuer on
+  average, concentrated on the low issuer ids); sector, geography,
+  outstanding amount (EVIC) and emissions are properties of the issuer,
+  derived by hashing the issuer id, so every holding of an issuer agrees
+  across blocks and issuer size does not depend on the id
+- investment amounts are log-normal, rounded to £100k; bond ownership is
+  investment / EVIC, real estate and infrastructure stakes are 10-100%
+- emissions are sector intensity (tCO2e per £m of EVIC or asset value) ×
+  log-normal noise
+- PCAF scores (1-5) centre on a per-asset-class mean; the data-source mix
+  shifts from primary towards estimated data as the score worsens
+
+Usage:
+    python generate_synthetic_portfolio.py N [--seed S] [--csv FILE] [--parquet FILE] [--xlsx FILE]
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from generate_amil_dummy_excel import write_workbook
+from holdings_model import (
+    AMIL_SHEET_ASSET_CLASSES,
+    ASSET_CLASS_BOND,
+    ASSET_CLASS_INFRASTRUCTURE,
+    ASSET_CLASS_REAL_ESTATE,
+    format_percentages,
+)
+
+BLOCK_ROWS = 65_536
+XLSX_MAX_ROWS = 1_048_575  # per sheet, below the header
+DEFAULT_OUTPUT = "synthetic_holdings.csv"
+
+# Share of holdings per asset class (the demo book: 14 bonds, 3 real estate, 2 infrastructure)
+ASSET_CLASS_MIX = {ASSET_CLASS_BOND: 14, ASSET_CLASS_REAL_ESTATE: 3, ASSET_CLASS_INFRASTRUCTURE: 2}
+HOLDINGS_PER_ISSUER = 4
+
+# Sector weights per asset class and emission intensity (tCO2e per £m of EVIC / asset value)
+SECTOR_WEIGHTS = {
+    ASSET_CLASS_BOND: {'Energy': 0.22, 'Utilities': 0.14, 'Materials': 0.16, 'Government': 0.12,
+                       'Industrials': 0.12, 'Financials': 0.10, 'Consumer': 0.08, 'Technology': 0.06},
+    ASSET_CLASS_REAL_ESTATE: {'Real Estate': 0.6, 'Materials': 0.2, 'Government': 0.2},
+    ASSET_CLASS_INFRASTRUCTURE: {'Energy': 0.6, 'Utilities': 0.3, 'Industrials': 0.1},
+}
+SECTOR_INTENSITY = {
+    'Energy': 380.0, 'Utilities': 520.0, 'Materials': 310.0, 'Government': 180.0, 'Industrials': 140.0,
+    'Financials': 8.0, 'Consumer': 55.0, 'Technology': 12.0, 'Real Estate': 25.0,
+}
+GEOGRAPHY_WEIGHTS = {'United Kingdom': 0.62, 'Scotland': 0.08, 'Wales': 0.04, 'Ireland': 0.05,
+                     'France': 0.08, 'Germany': 0.07, 'United States': 0.06}
+
+# Per asset class: name prefix, internal ID prefix, PCAF score mean, stake range
+ASSET_CLASS_PROFILES = {
+    ASSET_CLASS_BOND: ('Issuer', 'B', 2.3, None),
+    ASSET_CLASS_REAL_ESTATE: ('Property Trust', 'RE', 2.8, (0.2, 1.0)),
+    ASSET_CLASS_INFRASTRUCTURE: ('Infrastructure Project', 'IF', 2.7, (0.1, 0.6)),
+}
+
+CSV_COLUMNS = ['name', 'sector', 'asset_class', 'geography', 'investment_amount', 'evic', 'ownership',
+               'pcaf_score', 'primary', 'secondary', 'estimated', 'emissions', 'total_project_cost']
+
+def asset_class_counts(holding_count, mix=ASSET_CLASS_MIX):
+    """Split holding_count across asset classes (largest remainder)."""
+
+    weights = np.array(list(mix.values()), dtype=np.float64)
+    exact = holding_count * weights / weights.sum()
+    counts = np.floor(exact).astype(np.int64)
+    counts[np.argsort(counts - exact, kind='stable')[:holding_count - counts.sum()]] += 1
+    return dict(zip(mix, counts.tolist()))
+
+def _hash_uniform(seed, ids, stream):
+    """Uniform [0, 1) per id, a pure function of (seed, id, stream) (splitmix64)."""
+
+    x = (np.asarray(ids, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+         + np.uint64((seed * 1_000_003 + stream) & 0xFFFFFFFFFFFFFFFF))
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+def _hash_normal(seed, ids, stream):
+    """Standard normal per id (Box-Muller over two hashed uniforms)."""
+    u1 = _hash_uniform(seed, ids, stream)
+    u2 = _hash_uniform(seed, ids, stream + 1)
+    return np.sqrt(-2.0 * np.log1p(-u1)) * np.cos(2.0 * np.pi * u2)
+
+def _choose(uniform, weights):
+    """Map uniforms to categories by cumulative weight; returns (codes, labels)."""
+    labels = np.array(list(weights), dtype=object)
+    cumulative = np.cumsum(list(weights.values()))
+    codes = np.searchsorted(cumulative / cumulative[-1], uniform, side='right')
+    return np.minimum(codes, len(labels) - 1), labels
+
+def _labels(prefix, numbers, width):
+    """'<prefix> 0000042' style labels."""
+    return prefix + pd.Series(numbers, dtype=np.int64).astype(str).str.zfill(width)
+
+def _issuers(seed, issuer_ids):
+    """Sector, geography, EVIC and emissions of bond issuers (pure functions of the issuer id)."""
+
+    sector_codes, sectors = _choose(_hash_uniform(seed, issuer_ids, 10), SECTOR_WEIGHTS[ASSET_CLASS_BOND])
+    geography_codes, geographies = _choose(_hash_uniform(seed, issuer_ids, 20), GEOGRAPHY_WEIGHTS)
+    sector = sectors[sector_codes]
+    government = sector == 'Government'
+    # Outstanding amount: corporates around £150m, sovereigns around £20bn
+    evic = np.round(np.where(government, 2.0e10, 1.5e8) * np.exp(0.8 * _hash_normal(seed, issuer_ids, 30)), -5)
+    intensity = pd.Series(sector).map(SECTOR_INTENSITY).to_numpy(dtype=np.float64)
+    emissions = np.round(evic / 1_000_000 * intensity * np.exp(0.6 * _hash_normal(seed, issuer_ids, 40)), 1)
+    return sector, geographies[geography_codes], evic, emissions
+
+def _data_mix(rng, pcaf_score):
+    """Primary / secondary / estimated shares (whole percents) given the PCAF score."""
+
+    primary_share = 0.05 + 0.8 * (5.0 - pcaf_score) / 4.0
+    concentration = 20.0
+    draws = np.column_stack([
+        rng.gamma(primary_share * concentration),
+        rng.gamma((1.0 - primary_share) * 0.6 * concentration),
+        rng.gamma((1.0 - primary_share) * 0.4 * concentration),
+    ])
+    percents = np.floor(draws / draws.sum(axis=1, keepdims=True) * 100)
+    percents[:, 2] = 100 - percents[:, 0] - percents[:, 1]
+    return percents / 100
+
+def _block(seed, asset_class, start, stop, class_count):
+    """Holdings start..stop of one asset class, as a typed DataFrame."""
+
+    class_index = list(ASSET_CLASS_MIX).index(asset_class)
+    rng = np.random.default_rng([seed, class_index, start // BLOCK_ROWS])
+    size = stop - start
+    positions = np.arange(start, stop)
+    name_prefix, id_prefix, score_mean, stake_range = ASSET_CLASS_PROFILES[asset_class]
+
+    investment = np.maximum(np.round(3.0e6 * np.exp(0.6 * rng.standard_normal(size)), -5), 1.0e5)
+    total_project_cost = np.full(size, np.nan)
+
+    if asset_class == ASSET_CLASS_BOND:
+        # Holdings concentrate on the low issuer ids; issuer size is hashed
+        # from the id, so those are not the larger issuers
+        issuer_count = max(1, class_count // HOLDINGS_PER_ISSUER)
+        issuer_ids = np.floor(issuer_count * rng.random(size) ** 2).astype(np.int64)
+        sector, geography, evic, emissions = _issuers(seed, issuer_ids)
+        investment = np.minimum(investment, np.round(evic * 0.1, -5))
+        # Stakes are shown as '2.0%', or with more decimals when small ('0.02%')
+        ownership_decimals = np.select([investment / evic >= 1e-3, investment / evic >= 1e-4], [1, 2], 4)
+        scale = 10.0 ** ownership_decimals
+        ownership = np.round(investment / evic * 100 * scale) / scale / 100
+        names = _labels(f"{name_prefix} ", issuer_ids, 7)
+    else:
+        sector_codes, sectors = _choose(rng.random(size), SECTOR_WEIGHTS[asset_class])
+        sector = sectors[sector_codes]
+        geography_codes, geographies = _choose(rng.random(size), GEOGRAPHY_WEIGHTS)
+        geography = geographies[geography_codes]
+        low, high = stake_range
+        ownership = np.round(rng.uniform(low, high, size), 2)
+        ownership_decimals = np.zeros(size, dtype=np.int64)
+        asset_value = investment / ownership
+        intensity = pd.Series(sector).map(SECTOR_INTENSITY).to_numpy(dtype=np.float64)
+        if asset_class == ASSET_CLASS_INFRASTRUCTURE:
+            intensity = intensity * 0.15  # project assets are mostly renewables
+            total_project_cost = np.round(asset_value, -5)
+        emissions = np.round(asset_value / 1_000_000 * intensity * np.exp(0.6 * rng.standard_normal(size)), 1)
+        evic = np.full(size, np.nan)
+        names = _labels(f"{name_prefix} ", positions, 7)
+
+    pcaf_score = np.clip(np.round(score_mean + 0.5 * rng.standard_normal(size), 1), 1.0, 5.0)
+    mix = _data_mix(rng, pcaf_score)
+
+    return pd.DataFrame({
+        'name': names.to_numpy(dtype=object),
+        'internal_id': _labels(id_prefix, positions + 1, 8).to_numpy(dtype=object),
+        'sector': sector,
+        'asset_class': asset_class,
+        'geography': geography,
+        'investment_amount': investment,
+        'evic': evic,
+        'ownership': ownership,
+        'ownership_decimals': ownership_decimals,
+        'pcaf_score': pcaf_score.astype(np.float32),
+        'primary': mix[:, 0].astype(np.float32),
+        'secondary': mix[:, 1].astype(np.float32),
+        'estimated': mix[:, 2].astype(np.float32),
+        'emissions': emissions,
+        'total_project_cost': total_project_cost,
+    })
+
+def synthetic_blocks(holding_count, seed=0, asset_classes=None):
+    """Yield the synthetic book in blocks of at most BLOCK_ROWS holdings.
+
+    asset_classes restricts the output to some asset classes; the blocks of
+    a class are identical whichever classes are requested.
+    """
+
+    for asset_class, class_count in asset_class_counts(holding_count).items():
+        if asset_classes is not None and asset_class not in asset_classes:
+            continue
+        for start in range(0, class_count, BLOCK_ROWS):
+            yield _block(seed, asset_class, start, min(start + BLOCK_ROWS, class_count), class_count)
+
+def to_csv_frame(block):
+    """A block in the complete_investment_data.csv layout ('2.0%' style percentages)."""
+
+    frame = block[CSV_COLUMNS].copy()
+    frame['ownership'] = format_percentages(block['ownership'], block['ownership_decimals'])
+    for column in ['primary', 'secondary', 'estimated']:
+        frame[column] = format_percentages(block[column].to_numpy(dtype=np.float64))
+    frame['pcaf_score'] = block['pcaf_score'].astype(np.float64).round(1)
+    for column in ['investment_amount', 'evic', 'total_project_cost']:
+        frame[column] = frame[column].astype('Int64')  # whole pounds
+    return frame
+
+def to_amil_sheet(block):
+    """A block as rows of its investment_data.xlsx sheet."""
+
+    name_column = 'Issuer Name' if block['asset_class'].iat[0] == ASSET_CLASS_BOND else 'Asset Name'
+    sheet = pd.DataFrame({
+        name_column: block['name'],
+        'Internal ID': block['internal_id'],
+        'Investment Value': block['investment_amount'],
+    })
+    if block['asset_class'].iat[0] == ASSET_CLASS_BOND:
+        sheet['Outstanding Amount'] = block['evic']
+    sheet['Ownership Stake'] = format_percentages(block['ownership'], block['ownership_decimals'])
+    sheet['Sector Classification'] = block['sector']
+    sheet['Geography'] = block['geography']
+    return sheet
+
+def write_csv(output_file, holding_count, seed=0):
+    """Stream the book to a CSV file; returns the number of holdings written."""
+
+    written = 0
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        for block in synthetic_blocks(holding_count, seed):
+            to_csv_frame(block).to_csv(f, index=False, header=not written, na_rep='-')
+            written += len(block)
+    return written
+
+def write_parquet(output_file, holding_count, seed=0):
+    """Stream the book to a Parquet file, one row group per block."""
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('name', pa.string()), ('sector', pa.string()), ('asset_class', pa.string()),
+        ('geography', pa.string()), ('investment_amount', pa.float64()), ('evic', pa.float64()),
+        ('ownership', pa.float64()), ('ownership_decimals', pa.int8()), ('pcaf_score', pa.float32()), ('primary', pa.float32()),
+        ('secondary', pa.float32()), ('estimated', pa.float32()), ('emissions', pa.float64()),
+        ('total_project_cost', pa.float64()),
+    ])
+    written = 0
+    with pq.ParquetWriter(output_file, schema) as writer:
+        for block in synthetic_blocks(holding_count, seed):
+            writer.write_table(pa.Table.from_pandas(block[schema.names], schema=schema, preserve_index=False))
+            written += len(block)
+    return written
+
+def write_xlsx(output_file, holding_count, seed=0):
+    """Stream the book to the investment_data.xlsx sheets."""
+
+    counts = asset_class_counts(holding_count)
+    too_large = [asset_class for asset_class, count in counts.items() if count > XLSX_MAX_ROWS]
+    if too_large:
+        raise ValueError(f"xlsx sheets hold at most {XLSX_MAX_ROWS:,} rows ({', '.join(too_large)})")
+
+    write_workbook(output_file, {
+        sheet_name: (to_amil_sheet(block) for block in synthetic_blocks(holding_count, seed, [asset_class]))
+        for sheet_name, asset_class in AMIL_SHEET_ASSET_CLASSES.items() if counts[asset_class]
+    })
+    return holding_count
+
+def main(argv=None):
+    """Main function."""
+
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic holdings book for load testing")
+    parser.add_argument("holdings", type=int, help="Number of holdings")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--csv", help=f"CSV output file (default {DEFAULT_OUTPUT} when no output is given)")
+    parser.add_argument("--parquet", help="Parquet output file")
+    parser.add_argument("--xlsx", help="investment_data.xlsx-style workbook output file")
+    args = parser.parse_args(argv)
+    if args.holdings < 1:
+        parser.error("holdings must be at least 1")
+
+    outputs = [(path, writer) for path, writer in
+               [(args.csv, write_csv), (args.parquet, write_parquet), (args.xlsx, write_xlsx)] if path]
+    if not outputs:
+        outputs = [(DEFAULT_OUTPUT, write_csv)]
+
+    print("=" * 80)
+    print("SYNTHETIC PORTFOLIO GENERATOR")
+    print("=" * 80)
+    counts = asset_class_counts(args.holdings)
+    print(f"🎲 Seed {args.seed}: {args.holdings:,} holdings "
+          f"({', '.join(f'{count:,} {asset_class}' for asset_class, count in counts.items())})")
+
+    for path, writer in outputs:
+        start = time.perf_counter()
+        try:
+            written = writer(path, args.holdings, args.seed)
+        except (OSError, ValueError, ImportError) as e:
+            print(f"❌ Could not write {path}: {e}")
+            return 1
+        print(f"✅ {written:,} holdings written to: {path} ({time.perf_counter() - start:,.1f}s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Typed Holdings Model
+====================
+
+Shared columnar representation of portfolio holdings. The generators model
+each holding as a dict of display strings ('2.0%', '2.2', '60%'); this module
+parses those once into typed columns so aggregation and formatting code can
+run vectorized:
+
+- name:                  string
+- sector, asset_class,
+  geography:             categorical (1-byte codes)
+- investment_amount,
+  evic:                  float64 (EVIC is NaN where the source shows '-')
+- ownership:             float64 fraction (2.0% -> 0.02)
+- ownership_decimals:    int8, decimals shown in the source ('2.0%' -> 1),
+                         so display strings round-trip exactly
+- pcaf_score:            float32
+- primary, secondary,
+  estimated:             float32 fractions
+
+A 1M-row portfolio takes roughly 40 bytes per row plus the names.
+
+The hand-written demo books - generate_table_data() and the
+generate_amil_dummy_excel.py sheets, which also carry workbook-only columns
+such as ISIN, Location and website - stay in their source dict form; the
+table generator, calculators, cube and validator read them through this
+model.
+
+Usage:
+    python holdings_model.py [holdings.csv]
+"""
+
+import sys
+import numpy as np
+import pandas as pd
+
+ASSET_CLASS_BOND = 'Bond'
+ASSET_CLASS_REAL_ESTATE = 'Real Estate Equity'
+ASSET_CLASS_INFRASTRUCTURE = 'Infrastructure (Project Finance)'
+ASSET_CLASSES = [ASSET_CLASS_BOND, ASSET_CLASS_REAL_ESTATE, ASSET_CLASS_INFRASTRUCTURE]
+
+# Sheet names written by generate_amil_dummy_excel.py
+AMIL_SHEET_ASSET_CLASSES = {
+    'Bond Holdings': ASSET_CLASS_BOND,
+    'Real Estate Equity': ASSET_CLASS_REAL_ESTATE,
+    'Infrastructure Equity': ASSET_CLASS_INFRASTRUCTURE,
+}
+
+# Display-string columns read as text from CSV exports ('2.0%', '-')
+CSV_TEXT_COLUMNS = {'ownership': str, 'evic': str, 'primary': str, 'secondary': str, 'estimated': str}
+
+HOLDING_COLUMNS = [
+    'name', 'sector', 'asset_class', 'geography', 'investment_amount', 'evic',
+    'ownership', 'ownership_decimals', 'pcaf_score', 'primary', 'secondary', 'estimated'
+]
+
+def _parse_distinct(series, parse):
+    """Apply a parser to the distinct values of a text column only.
+
+    Holdings columns such as ownership and EVIC repeat a small set of
+    values, so parsing the uniques and broadcasting back by code avoids
+    string work per row.
+    """
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    parsed = np.append(parse(pd.Series(uniques, dtype=object)), np.nan)
+    return parsed[codes]  # code -1 (missing) picks the trailing NaN
+
+def to_numeric_array(values):
+    """Convert a column to float64, mapping '-', blanks and text to NaN."""
+
+    series = pd.Series(values)
+    if series.dtype.kind in 'fiub':
+        return series.to_numpy(dtype=np.float64)
+    return _parse_distinct(series, lambda uniques: pd.to_numeric(uniques, errors='coerce')
+                           .to_numpy(dtype=np.float64))
+
+def _parse_percentages(values):
+    """Parse '2.0%' to 0.02; values without a percent sign are taken as-is."""
+    text = values.astype(str).str.strip()
+    numbers = pd.to_numeric(text.str.rstrip('%'), errors='coerce').to_numpy(dtype=np.float64)
+    return np.where(text.str.endswith('%').to_numpy(dtype=bool), numbers / 100.0, numbers)
+
+def parse_percentage_array(values):
+    """Convert a column of '2.0%' style strings (or fractions) to fractions."""
+
+    series = pd.Series(values)
+    if series.dtype.kind in 'fiu':
+        return series.to_numpy(dtype=np.float64)
+    return _parse_distinct(series, _parse_percentages)
+
+def _percentage_decimals(values):
+    """Number of decimals shown in each '2.0%' style string (0 for numbers)."""
+
+    series = pd.Series(values)
+    if series.dtype.kind in 'fiu':
+        return np.zeros(len(series), dtype=np.int8)
+    decimals = _parse_distinct(
+        series,
+        lambda uniques: uniques.astype(str).str.extract(r'\.(\d+)')[0].str.len()
+        .fillna(0).to_numpy(dtype=np.float64)
+    )
+    return np.nan_to_num(decimals).astype(np.int8)
+
+def _categorical(values, categories=None):
+    """Build a categorical column, keeping known categories first."""
+
+    values = pd.Series(values, dtype=object)
+    if categories is None:
+        return pd.Categorical(values)
+    extra = [v for v in pd.unique(values.dropna()) if v not in categories]
+    return pd.Categorical(values, categories=list(categories) + extra)
+
+def holdings_from_columns(columns):
+    """Build the typed holdings frame from a mapping of raw column values.
+
+    Expects the complete_investment_data.csv column names; missing optional
+    columns (geography, data mix) are filled with NaN. An ownership_decimals
+    column (e.g. from Parquet, where ownership is numeric) is kept as given.
+    """
+
+    row_count = len(columns['name'])
+
+    def column(key):
+        return columns[key] if key in columns else [np.nan] * row_count
+
+    frame = pd.DataFrame({
+        'name': pd.array(columns['name'], dtype='string'),
+        'sector': _categorical(column('sector')),
+        'asset_class': _categorical(columns['asset_class'], ASSET_CLASSES),
+        'geography': _categorical(column('geography')),
+        'investment_amount': to_numeric_array(columns['investment_amount']),
+        'evic': to_numeric_array(column('evic')),
+        'ownership': parse_percentage_array(column('ownership')),
+        'ownership_decimals': (np.asarray(columns['ownership_decimals'], dtype=np.int8)
+                               if 'ownership_decimals' in columns else _percentage_decimals(column('ownership'))),
+        'pcaf_score': to_numeric_array(column('pcaf_score')).astype(np.float32),
+        'primary': parse_percentage_array(column('primary')).astype(np.float32),
+        'secondary': parse_percentage_array(column('secondary')).astype(np.float32),
+        'estimated': parse_percentage_array(column('estimated')).astype(np.float32),
+    })
+    return frame[HOLDING_COLUMNS]
+
+def holdings_from_records(records):
+    """Build the typed holdings frame from generate_table_data()-style dicts."""
+
+    records = list(records)
+    return holdings_from_columns({
+        key: [record.get(key, np.nan) for record in records]
+        for key in HOLDING_COLUMNS
+        if any(key in record for record in records)
+    })
+
+def load_holdings_csv(csv_file):
+    """Load a complete_investment_data.csv-style file into the typed model."""
+
+    raw = pd.read_csv(csv_file, dtype=CSV_TEXT_COLUMNS)
+    return holdings_from_columns({col: raw[col] for col in raw.columns})
+
+def load_amil_workbook(xlsx_file):
+    """Load the holdings sheets of investment_data.xlsx into the typed model."""
+
+    excel_file = pd.ExcelFile(xlsx_file)
+    frames = []
+    for sheet_name, asset_class in AMIL_SHEET_ASSET_CLASSES.items():
+        if sheet_name not in excel_file.sheet_names:
+            continue
+        sheet = excel_file.parse(sheet_name, dtype={'Ownership Stake': str})
+        name_column = 'Issuer Name' if 'Issuer Name' in sheet.columns else 'Asset Name'
+        frames.append(pd.DataFrame({
+            'name': sheet[name_column],
+            'sector': sheet.get('Sector Classification'),
+            'asset_class': asset_class,
+            'geography': sheet.get('Geography'),
+            'investment_amount': sheet['Investment Value'],
+            'evic': sheet['Outstanding Amount'] if 'Outstanding Amount' in sheet.columns else np.nan,
+            'ownership': sheet['Ownership Stake'],
+        }))
+    combined = pd.concat(frames, ignore_index=True)
+    return holdings_from_columns({col: combined[col] for col in combined.columns})
+
+def load_holdings(source_file, extra_columns=()):
+    """Load holdings from a CSV export, a Parquet file or the AMIL workbook.
+
+    Numeric extra_columns (e.g. emissions) present in a CSV or Parquet file
+    are added to the typed frame as float64.
+    """
+
+    if source_file.lower().endswith(('.xlsx', '.xls')):
+        return load_amil_workbook(source_file)
+
+    if source_file.lower().endswith('.parquet'):
+        raw = pd.read_parquet(source_file)
+    else:
+        raw = pd.read_csv(source_file, dtype=CSV_TEXT_COLUMNS)
+    holdings = holdings_from_columns({col: raw[col] for col in raw.columns})
+    for column in extra_columns:
+        if column in raw.columns:
+            holdings[column] = to_numeric_array(raw[column])
+    return holdings
+
+def format_percentages(fractions, decimals=0):
+    """Format fractions as '2.0%' style strings.
+
+    decimals may be a single int or a per-row array (e.g. ownership_decimals).
+    Distinct (value, decimals) pairs are formatted once and broadcast back.
+    """
+
+    fractions = np.asarray(fractions, dtype=np.float64)
+    decimals = np.broadcast_to(np.asarray(decimals, dtype=np.int64), fractions.shape)
+    value_codes, values = pd.factorize(np.round(fractions * 100, 6), use_na_sentinel=False)
+    codes, pairs = pd.factorize(value_codes * 32 + decimals)
+    labels = np.array(
+        ['-' if np.isnan(values[pair // 32]) else f"{values[pair // 32]:.{pair % 32}f}%"
+         for pair in pairs],
+        dtype=object
+    )
+    return labels[codes]
+
+def format_scores(scores):
+    """Format PCAF scores with one decimal place ('2.0')."""
+
+    scores = np.round(np.asarray(scores, dtype=np.float64), 1)
+    codes, uniques = pd.factorize(scores, use_na_sentinel=False)
+    labels = np.array(['-' if np.isnan(v) else f"{v:.1f}" for v in uniques], dtype=object)
+    return labels[codes]
+
+def to_display_records(holdings):
+    """Convert the typed frame back to the legacy dict-per-holding format."""
+
+    def whole_numbers(values):
+        # Amounts are held as float64; show whole amounts as ints like the source
+        whole = values.notna() & (values % 1 == 0)
+        return values.astype(object).where(~whole, values.fillna(0).astype(np.int64).astype(object))
+
+    display = pd.DataFrame({
+        'name': holdings['name'].astype(object),
+        'sector': holdings['sector'].astype(object),
+        'asset_class': holdings['asset_class'].astype(object),
+        'investment_amount': whole_numbers(holdings['investment_amount']),
+        'evic': whole_numbers(holdings['evic']).where(holdings['evic'].notna(), '-'),
+        'ownership': format_percentages(holdings['ownership'], holdings['ownership_decimals']),
+        'pcaf_score': format_scores(holdings['pcaf_score']),
+        'primary': format_percentages(holdings['primary']),
+        'secondary': format_percentages(holdings['secondary']),
+        'estimated': format_percentages(holdings['estimated']),
+    })
+    return display.to_dict('records')
+
+def main():
+    """Main function."""
+
+    holdings_file = sys.argv[1] if len(sys.argv) > 1 else 'complete_investment_data.csv'
+
+    holdings = load_holdings_csv(holdings_file)
+    memory_bytes = holdings.memory_usage(deep=True).sum()
+
+    print("=" * 80)
+    print("TYPED HOLDINGS MODEL")
+    print("=" * 80)
+    print(f"📄 Holdings file: {holdings_file}")
+    print(f"📊 Holdings: {len(holdings)}")
+    print(f"💾 Memory: {memory_bytes:,} bytes ({memory_bytes / max(len(holdings), 1):.0f} bytes/holding)")
+    print("\nCOLUMN TYPES:")
+    for column, dtype in holdings.dtypes.items():
+        print(f"   {column:<20} {dtype}")
+
+if __name__ == "__main__":
+    main()
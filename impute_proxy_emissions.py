@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Proxy Imputation Engine (S5)
+============================
+
+Implements S5 "Estimate, Impute and Correct" (Sub-process 2.2 in
+data_validation_agents_description.md). Every holding's emissions are built
+from three components - scope1, scope2 and scope3_upstream - and each
+component takes the best available value:
+
+1. Reported by the company / asset owner (D2B, D2C)      PCAF 2 (1 if verified)
+2. Physical-activity proxy                                PCAF 3
+   - real estate:    floor area × building energy intensity (kWh/m²)
+                     × occupancy, split into on-site fuel (scope1) and
+                     grid electricity (scope2 × regional grid factor)
+   - infrastructure: capacity (MW) × utilization × per-MW intensity
+3. Economic-activity proxy: sector emission factor (tCO2e/£m revenue)
+   × revenue (PCAF 4), or × EVIC × asset turnover when revenue is
+   unknown (PCAF 5)
+
+Proxy factors come from lookup tables keyed by sector/region, region,
+building rating and technology, indexed as emission factor libraries
+(emission_factor_library.py): the most specific row wins, falling back to
+'*' rows, and every gap row is resolved in one batch lookup, so imputation
+is vectorized regardless of portfolio size.
+
+Each component is tagged with its method, factor, PCAF score and
+provenance (PCAF 1-2 primary, 3 secondary, 4-5 estimated). Per holding,
+the data mix and PCAF score are the emissions-weighted averages over its
+components.
+
+The built-in factor tables are illustrative placeholders for the Climate
+Solutions proxy methodology and IEA / DESNZ factors.
+
+Usage:
+    python impute_proxy_emissions.py [investment_data.xlsx] [--d2g d2g_carbon_financial_data.csv]
+"""
+
+import argparse
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from emission_factor_library import ALL, FactorLibrary
+from holdings_model import (
+    AMIL_SHEET_ASSET_CLASSES,
+    ASSET_CLASS_INFRASTRUCTURE,
+    ASSET_CLASS_REAL_ESTATE,
+    format_percentages,
+    parse_percentage_array,
+    to_numeric_array,
+)
+
+COMPONENTS = ['scope1', 'scope2', 'scope3_upstream']
+REPORTED_COLUMNS = {
+    'scope1': 'scope1_tco2e',
+    'scope2': 'scope2_tco2e',
+    'scope3_upstream': 'scope3_upstream_tco2e',
+}
+
+PROVENANCE_PRIMARY = 'primary'
+PROVENANCE_SECONDARY = 'secondary'
+PROVENANCE_ESTIMATED = 'estimated'
+PROVENANCES = [PROVENANCE_PRIMARY, PROVENANCE_SECONDARY, PROVENANCE_ESTIMATED]
+
+# PCAF data quality score -> provenance
+PCAF_PROVENANCE = {1: PROVENANCE_PRIMARY, 2: PROVENANCE_PRIMARY, 3: PROVENANCE_SECONDARY,
+                   4: PROVENANCE_ESTIMATED, 5: PROVENANCE_ESTIMATED}
+
+# method -> PCAF data quality score
+METHOD_SCORES = {
+    'reported_verified': 1,
+    'reported': 2,
+    'building_energy': 3,
+    'capacity_intensity': 3,
+    'revenue_sector_factor': 4,
+    'asset_sector_factor': 5,
+}
+
+SQFT_TO_M2 = 0.092903
+GAS_FACTOR_KG_PER_KWH = 0.183   # natural gas, kgCO2e/kWh
+BUILDING_FUEL_SHARE = 0.3       # share of building energy from on-site fuel
+ASSET_TURNOVER = 0.5            # revenue / EVIC when revenue is unknown
+
+@dataclass
+class ProxyTables:
+    """Factor libraries for the proxies, each keyed by its key columns.
+
+    '*' in a key column matches anything and is used when no more specific
+    row exists.
+    """
+    sector_factors: FactorLibrary      # (sector, geography) -> scope1/scope2/scope3_upstream tCO2e per £m revenue
+    grid_intensity: FactorLibrary      # (geography) -> kgco2e_per_kwh
+    building_energy: FactorLibrary     # (rating) -> kwh_per_m2
+    capacity_intensity: FactorLibrary  # (technology) -> scope1/scope2 tCO2e per MW-year
+
+def _table(rows, keys, columns):
+    return FactorLibrary.build(pd.DataFrame(rows, columns=keys + columns), key_columns=keys)
+
+def default_proxy_tables():
+    """Built-in illustrative proxy factors."""
+
+    return ProxyTables(
+        sector_factors=_table([
+            ('Energy', ALL, 420.0, 35.0, 310.0),
+            ('Utilities', ALL, 560.0, 45.0, 210.0),
+            ('Materials', ALL, 340.0, 80.0, 390.0),
+            ('Industrials', ALL, 90.0, 30.0, 260.0),
+            ('Government', ALL, 55.0, 20.0, 110.0),
+            ('Financials', ALL, 4.0, 3.0, 45.0),
+            ('Energy', 'United Kingdom', 380.0, 25.0, 300.0),
+            ('Utilities', 'United Kingdom', 480.0, 30.0, 200.0),
+            (ALL, ALL, 150.0, 40.0, 250.0),
+        ], ['sector', 'geography'], COMPONENTS),
+        grid_intensity=_table([
+            ('United Kingdom', 0.207),
+            ('Europe', 0.251),
+            ('United States', 0.367),
+            (ALL, 0.436),
+        ], ['geography'], ['kgco2e_per_kwh']),
+        building_energy=_table([
+            ('BREEAM Outstanding', 90.0),
+            ('BREEAM Excellent', 110.0),
+            ('LEED Platinum', 95.0),
+            ('LEED Gold', 125.0),
+            ('Energy A+', 80.0),
+            (ALL, 200.0),
+        ], ['rating'], ['kwh_per_m2']),
+        capacity_intensity=_table([
+            ('Offshore Wind', 2.0, 8.0),
+            ('Onshore Wind', 1.5, 6.0),
+            ('Solar Farm', 0.5, 4.0),
+            (ALL, 50.0, 20.0),
+        ], ['technology'], ['scope1', 'scope2']),
+    )
+
+def resolve_factors(library, keys):
+    """Look up factors for every row of keys (a frame with the library's key columns).
+
+    Returns (factors, specificity), where specificity counts the key
+    columns matched exactly (-1 = no row).
+    """
+
+    resolved = library.lookup(keys.reset_index(drop=True))
+    return resolved[library.value_columns], resolved['specificity'].to_numpy()
+
+def _leading_number(values):
+    """'200,000 sq ft' -> 200000.0, '400MW' -> 400.0 (NaN when absent)."""
+    text = pd.Series(values, dtype=object).astype(str).str.replace(',', '', regex=False)
+    return pd.to_numeric(text.str.extract(r'([\d.]+)')[0], errors='coerce').to_numpy(dtype=np.float64)
+
+def _column(holdings, name, default=np.nan):
+    if name in holdings.columns:
+        return holdings[name]
+    return pd.Series(default, index=holdings.index)
+
+def impute_emissions(holdings, tables=None):
+    """Fill every holding's emission components with reported data or proxies.
+
+    holdings needs name, sector, asset_class and geography, plus whatever
+    inputs are available: scope1_tco2e / scope2_tco2e / scope3_upstream_tco2e
+    (reported), emissions_verified, revenue, evic, floor_area_m2, rating,
+    utilization, capacity_mw, technology.
+
+    Returns the long components table: one row per (holding, component)
+    with row, name, component, tco2e, method, factor,
+    specificity, pcaf_score and provenance. Components no method can fill
+    are kept with method 'unresolved' and NaN values.
+    """
+
+    tables = tables or default_proxy_tables()
+    count = len(holdings)
+    holdings = holdings.reset_index(drop=True)
+    asset_class = holdings['asset_class'].astype(object).to_numpy()
+
+    revenue = to_numeric_array(_column(holdings, 'revenue'))
+    evic = to_numeric_array(_column(holdings, 'evic'))
+    utilization = parse_percentage_array(_column(holdings, 'utilization'))
+    utilization = np.where(np.isnan(utilization), 1.0, utilization)
+    floor_area = to_numeric_array(_column(holdings, 'floor_area_m2'))
+    capacity = to_numeric_array(_column(holdings, 'capacity_mw'))
+    verified = _column(holdings, 'emissions_verified', False).fillna(False).astype(bool).to_numpy()
+
+    sector_factors, sector_level = resolve_factors(tables.sector_factors, pd.DataFrame({
+        'sector': _column(holdings, 'sector'), 'geography': _column(holdings, 'geography')}))
+    grid, _ = resolve_factors(tables.grid_intensity, pd.DataFrame({'geography': _column(holdings, 'geography')}))
+    building, building_level = resolve_factors(tables.building_energy, pd.DataFrame({'rating': _column(holdings, 'rating')}))
+    plant, plant_level = resolve_factors(tables.capacity_intensity, pd.DataFrame({'technology': _column(holdings, 'technology')}))
+
+    # Physical activity: building energy (kWh) and plant output (MW-years)
+    is_real_estate = asset_class == ASSET_CLASS_REAL_ESTATE
+    is_infrastructure = asset_class == ASSET_CLASS_INFRASTRUCTURE
+    energy_kwh = np.where(is_real_estate, floor_area * building['kwh_per_m2'].to_numpy() * utilization, np.nan)
+    mw_years = np.where(is_infrastructure, capacity * utilization, np.nan)
+    physical = {
+        'scope1': np.where(is_real_estate,
+                           energy_kwh * BUILDING_FUEL_SHARE * GAS_FACTOR_KG_PER_KWH / 1000,
+                           mw_years * plant['scope1'].to_numpy()),
+        'scope2': np.where(is_real_estate,
+                           energy_kwh * (1 - BUILDING_FUEL_SHARE) * grid['kgco2e_per_kwh'].to_numpy() / 1000,
+                           mw_years * plant['scope2'].to_numpy()),
+        'scope3_upstream': np.full(count, np.nan),
+    }
+    physical_factor = {
+        'scope1': np.where(is_real_estate, building['kwh_per_m2'].to_numpy(), plant['scope1'].to_numpy()),
+        'scope2': np.where(is_real_estate, building['kwh_per_m2'].to_numpy(), plant['scope2'].to_numpy()),
+        'scope3_upstream': np.full(count, np.nan),
+    }
+    physical_level = np.where(is_real_estate, building_level, plant_level)
+
+    # Economic activity: revenue, else EVIC × asset turnover
+    has_revenue = ~np.isnan(revenue)
+    revenue_m = np.where(has_revenue, revenue, evic * ASSET_TURNOVER) / 1_000_000
+
+    # Long table columns are built as codes and wrapped in categoricals, so
+    # a 1M-holding portfolio does not materialize 3M method/name strings
+    methods = list(METHOD_SCORES) + ['unresolved']
+    method_scores = np.array([METHOD_SCORES.get(method, np.nan) for method in methods])
+    name_codes, names = pd.factorize(_column(holdings, 'name').astype(object), use_na_sentinel=False)
+
+    columns = {'tco2e': [], 'method': [], 'factor': [], 'specificity': []}
+    for component in COMPONENTS:
+        reported = to_numeric_array(_column(holdings, REPORTED_COLUMNS[component]))
+        economic = revenue_m * sector_factors[component].to_numpy()
+
+        use_reported = ~np.isnan(reported)
+        use_physical = ~use_reported & ~np.isnan(physical[component])
+        use_economic = ~use_reported & ~use_physical & ~np.isnan(economic)
+
+        columns['method'].append(np.select(
+            [use_reported & verified, use_reported, use_physical & is_real_estate, use_physical,
+             use_economic & has_revenue, use_economic],
+            [methods.index(method) for method in (
+                'reported_verified', 'reported', 'building_energy', 'capacity_intensity',
+                'revenue_sector_factor', 'asset_sector_factor')],
+            default=methods.index('unresolved')
+        ))
+        columns['tco2e'].append(np.select([use_reported, use_physical, use_economic],
+                                          [reported, physical[component], economic], default=np.nan))
+        columns['factor'].append(np.select([use_physical, use_economic],
+                                           [physical_factor[component], sector_factors[component].to_numpy()],
+                                           default=np.nan))
+        columns['specificity'].append(np.select([use_physical, use_economic], [physical_level, sector_level],
+                                                default=-1))
+
+    method_codes = np.concatenate(columns['method'])
+    scores = method_scores[method_codes]
+    provenance_codes = np.array([-1] + [PROVENANCES.index(PCAF_PROVENANCE[score]) for score in range(1, 6)])
+    return pd.DataFrame({
+        'row': np.tile(np.arange(count), len(COMPONENTS)),
+        'name': pd.Categorical.from_codes(np.tile(name_codes, len(COMPONENTS)), categories=pd.Index(names, dtype=object)),
+        'component': pd.Categorical.from_codes(np.repeat(np.arange(len(COMPONENTS)), count), categories=COMPONENTS),
+        'tco2e': np.concatenate(columns['tco2e']),
+        'method': pd.Categorical.from_codes(method_codes, categories=methods),
+        'factor': np.concatenate(columns['factor']),
+        'specificity': np.concatenate(columns['specificity']),
+        'pcaf_score': scores,
+        'provenance': pd.Categorical.from_codes(provenance_codes[np.nan_to_num(scores).astype(np.int64)],
+                                                categories=PROVENANCES),
+    })
+
+def data_quality_mix(components):
+    """Emissions-weighted provenance mix and PCAF score per holding row.
+
+    Returns a frame indexed by row with primary, secondary and estimated
+    fractions, pcaf_score and the emissions total (scope1 + scope2).
+    """
+
+    filled = components[components['tco2e'].notna()]
+    rows = int(components['row'].max()) + 1 if len(components) else 0
+    row = filled['row'].to_numpy()
+    weight = np.abs(filled['tco2e'].to_numpy())
+    totals = np.bincount(row, weights=weight, minlength=rows)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mix = pd.DataFrame({
+            provenance: np.bincount(row, weights=weight * (filled['provenance'] == provenance).to_numpy(),
+                                    minlength=rows) / totals
+            for provenance in PROVENANCES
+        })
+        mix['pcaf_score'] = np.bincount(row, weights=weight * filled['pcaf_score'].to_numpy(), minlength=rows) / totals
+
+    operational = filled['component'].isin(['scope1', 'scope2']).to_numpy()
+    mix['emissions'] = np.bincount(row[operational], weights=filled['tco2e'].to_numpy()[operational], minlength=rows)
+    mix.loc[np.bincount(row[operational], minlength=rows) == 0, 'emissions'] = np.nan
+    mix.index.name = 'row'
+    return mix
+
+def assumptions_register(components):
+    """One line per distinct proxy applied: method, component, factor, holdings and tCO2e."""
+
+    proxied = components[~components['method'].isin(['reported', 'reported_verified'])]
+    register = (proxied.groupby(['method', 'component', 'factor', 'specificity'], dropna=False, observed=True)
+                .agg(holdings=('row', 'nunique'), tco2e=('tco2e', 'sum'), pcaf_score=('pcaf_score', 'first'))
+                .reset_index())
+    register.loc[register['method'] == 'unresolved', 'tco2e'] = np.nan
+    return register
+
+def load_imputation_inputs(xlsx_file, d2g_file=None):
+    """Build the S5 input table from investment_data.xlsx (and optionally the D2G dataset)."""
+
+    excel_file = pd.ExcelFile(xlsx_file)
+    frames = []
+    for sheet_name, asset_class in AMIL_SHEET_ASSET_CLASSES.items():
+        if sheet_name not in excel_file.sheet_names:
+            continue
+        sheet = excel_file.parse(sheet_name, dtype=str)
+        name_column = 'Issuer Name' if 'Issuer Name' in sheet.columns else 'Asset Name'
+        frames.append(pd.DataFrame({
+            'internal_id': sheet['Internal ID'],
+            'name': sheet[name_column],
+            'sector': sheet.get('Sector Classification'),
+            'asset_class': asset_class,
+            'geography': sheet.get('Geography'),
+            'evic': sheet.get('Outstanding Amount'),
+            'floor_area_m2': _leading_number(sheet['Property Size']) * SQFT_TO_M2 if 'Property Size' in sheet.columns else np.nan,
+            'rating': sheet.get('Green Design Rating'),
+            'utilization': sheet.get('Utilization'),
+            'capacity_mw': _leading_number(sheet['Capacity']) if 'Capacity' in sheet.columns else np.nan,
+            'technology': sheet.get('Technology Type'),
+        }))
+    inputs = pd.concat(frames, ignore_index=True)
+
+    if d2g_file:
+        d2g = pd.read_csv(d2g_file, dtype={'internal_id': str})
+        reported = ['internal_id'] + [column for column in REPORTED_COLUMNS.values() if column in d2g.columns]
+        inputs = inputs.merge(d2g[reported], on='internal_id', how='left')
+    return inputs
+
+def main(argv=None):
+    """Main function."""
+
+    parser = argparse.ArgumentParser(description="S5: impute missing emissions with proxies")
+    parser.add_argument("xlsx_file", nargs="?", default="investment_data.xlsx", help="Holdings workbook")
+    parser.add_argument("--d2g", help="D2G dataset with reported scope1/scope2/scope3 emissions")
+    parser.add_argument("--output", default="imputed_emissions.csv", help="Per-holding output CSV")
+    parser.add_argument("--register", default="assumptions_register.csv", help="Assumptions register CSV")
+    args = parser.parse_args(argv)
+
+    print("=" * 80)
+    print("PROXY IMPUTATION ENGINE (S5)")
+    print("=" * 80)
+
+    inputs = load_imputation_inputs(args.xlsx_file, args.d2g)
+    components = impute_emissions(inputs)
+    mix = data_quality_mix(components)
+
+    output = inputs[['internal_id', 'name', 'sector', 'asset_class']].copy()
+    output['emissions'] = mix['emissions'].round(1)
+    output['pcaf_score'] = mix['pcaf_score'].round(1)
+    for provenance in PROVENANCES:
+        output[provenance] = format_percentages(mix[provenance])
+    output.to_csv(args.output, index=False)
+    register = assumptions_register(components)
+    register.to_csv(args.register, index=False)
+
+    print(f"📄 Holdings: {len(inputs)} from {args.xlsx_file}" + (f" + {args.d2g}" if args.d2g else ""))
+    print("\nCOMPONENTS BY METHOD:")
+    for method, count in components['method'].value_counts()[lambda counts: counts > 0].items():
+        print(f"   {method:<25} {count:>8}")
+
+    weights = np.nan_to_num(components['tco2e'].to_numpy())
+    total = weights.sum()
+    if total:
+        print("\nPORTFOLIO DATA MIX (emissions-weighted):")
+        for provenance in PROVENANCES:
+            share = weights[(components['provenance'] == provenance).to_numpy()].sum() / total
+            print(f"   {provenance.title():<10} {share:6.1%}")
+
+    print(f"\n✅ Imputed emissions saved to: {args.output}")
+    print(f"✅ Assumptions register ({len(register)} entries) saved to: {args.register}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Incremental Portfolio Recalculation
+===================================
+
+Keeps the DETAILED ASSET LEVEL ANALYSIS rows, the totals row and the
+financed emissions aggregates of a holdings book up to date when only some
+holdings change, instead of regenerating everything from scratch.
+
+Each update walks one dependency graph, layer by layer:
+
+    holding ─┬─► financed emissions ──► asset class / sector aggregates
+             └─► rendered TSX row ─────────────────────────────────────► tbody
+    holdings ──► portfolio totals ──► totals row
+
+- every holding gets a fingerprint (64-bit hash of its input columns);
+  holdings are identified by name and occurrence of that name, so a
+  renamed holding shows up as one removal plus one addition
+- financed emissions and TSX rows are re-derived for dirty (changed or
+  added) holdings only; clean holdings reuse their cached results
+- only the aggregate groups a dirty or removed holding belonged to, before
+  or after the edit, are re-summed
+- the totals row is re-rendered only when something changed
+
+Cached rows and sums are the ones a full run of
+generate_complete_table_structure.py / calculate_financed_emissions.py
+produces for the same holdings. Rendered dirty rows are checked against the
+row layout from validate_and_replace.py.
+
+With --state, the cache is kept in a pickle between runs.
+
+Usage:
+    python incremental_portfolio.py [holdings.csv|investment_data.xlsx] [--state portfolio_state.pkl]
+                                    [--output complete_table_rows.tsx]
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from calculate_financed_emissions import holding_financed_emissions
+from emissions_cube import UNSPECIFIED
+from generate_complete_table_structure import portfolio_totals, render_holding_rows, write_tsx_rows
+from holdings_model import HOLDING_COLUMNS, load_holdings
+from validate_and_replace import ROW_PATTERN
+
+STATE_VERSION = 2
+GROUP_KEYS = ['asset_class', 'sector']
+# Inputs of the financed emissions calculation that are not in the typed model
+EMISSION_COLUMNS = ['emissions', 'total_project_cost']
+
+@dataclass
+class UpdateStats:
+    """What one update recomputed."""
+    holdings: int = 0
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    rows_rendered: int = 0
+    invalid_rows: int = 0
+    groups_recomputed: int = 0
+    totals_recomputed: bool = False
+    seconds: float = 0.0
+
+    @property
+    def dirty(self):
+        return self.added + self.changed + self.removed
+
+def holding_keys(holdings):
+    """Identity of each holding: hash of (name, occurrence number of that name)."""
+
+    names = holdings['name'].astype(object)
+    occurrence = names.groupby(names, sort=False, dropna=False).cumcount()
+    return pd.util.hash_pandas_object(pd.DataFrame({'name': names, 'occurrence': occurrence}),
+                                      index=False).to_numpy()
+
+def holding_fingerprints(holdings):
+    """64-bit hash of every input column of each holding."""
+
+    columns = [column for column in HOLDING_COLUMNS + EMISSION_COLUMNS if column in holdings.columns]
+    return pd.util.hash_pandas_object(holdings[columns], index=False).to_numpy()
+
+class IncrementalPortfolio:
+    """Cached per-holding results and aggregates, refreshed by update()."""
+
+    def __init__(self):
+        self.holdings = None
+        self.keys = np.zeros(0, dtype=np.uint64)
+        self.fingerprints = np.zeros(0, dtype=np.uint64)
+        self.rows = np.zeros(0, dtype=object)
+        self.financed = np.zeros(0)
+        self.groups = {}
+        self.totals = None
+
+    def update(self, holdings):
+        """Bring every cached result in line with holdings; returns UpdateStats."""
+
+        start = time.perf_counter()
+        holdings = holdings.reset_index(drop=True)
+        keys = holding_keys(holdings)
+        fingerprints = holding_fingerprints(holdings)
+
+        # Holding layer: match holdings to the cache by key, then compare fingerprints
+        old_positions = pd.Index(self.keys).get_indexer(keys)
+        known = old_positions >= 0
+        clean = known.copy()
+        clean[known] = self.fingerprints[old_positions[known]] == fingerprints[known]
+        dirty = np.flatnonzero(~clean)
+        kept = np.zeros(len(self.keys), dtype=bool)
+        kept[old_positions[known]] = True
+        stale = np.flatnonzero(~kept)                        # removed from the book
+        stale = np.concatenate([stale, old_positions[known & ~clean]])  # changed: old side
+
+        stats = UpdateStats(holdings=len(holdings), added=int((~known).sum()),
+                            changed=int((known & ~clean).sum()), removed=int((~kept).sum()))
+
+        rows = np.empty(len(holdings), dtype=object)
+        rows[clean] = self.rows[old_positions[clean]]
+        financed = np.full(len(holdings), np.nan)
+        financed[clean] = self.financed[old_positions[clean]]
+        if len(dirty):
+            dirty_holdings = holdings.iloc[dirty]
+            rendered = render_holding_rows(dirty_holdings)
+            rows[dirty] = rendered
+            financed[dirty] = holding_financed_emissions(dirty_holdings)
+            stats.rows_rendered = len(rendered)
+            stats.invalid_rows = sum(ROW_PATTERN.fullmatch(row.strip()) is None for row in rendered)
+
+        # Aggregate layer: re-sum only the groups touched before or after the edit
+        for key in GROUP_KEYS:
+            if key not in holdings.columns:
+                self.groups.pop(key, None)
+                continue
+            old_labels = (self.holdings[key].iloc[stale].astype(object).fillna(UNSPECIFIED)
+                          if self.holdings is not None and key in self.holdings.columns else pd.Series([], dtype=object))
+            stats.groups_recomputed += self._update_groups(key, holdings, financed, dirty, old_labels)
+
+        # Output layer
+        if self.totals is None or stats.dirty:
+            self.totals = portfolio_totals(holdings)
+            stats.totals_recomputed = True
+
+        self.holdings = holdings
+        self.keys = keys
+        self.fingerprints = fingerprints
+        self.rows = rows
+        self.financed = financed
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+    def _update_groups(self, key, holdings, financed, dirty, old_labels):
+        """Refresh one breakdown; returns the number of groups re-summed."""
+
+        # Missing keys are grouped under 'Unspecified', as in calculate_financed_emissions
+        values = holdings[key].astype(object).fillna(UNSPECIFIED)
+        codes, labels = pd.factorize(values, sort=True)
+        labels = pd.Index(labels, dtype=object)
+        previous = self.groups.get(key)
+
+        if previous is None:
+            touched = np.arange(len(labels))
+        else:
+            touched_labels = pd.unique(pd.concat([values.iloc[dirty], old_labels]))
+            touched = labels.get_indexer(pd.Index(touched_labels, dtype=object))
+            touched = touched[touched >= 0]
+
+        # Same bincount as calculate_financed_emissions, over the touched groups' members only
+        members = np.isin(codes, touched)
+        member_codes = codes[members]
+        investment = np.nan_to_num(holdings['investment_amount'].to_numpy(dtype=np.float64)[members])
+        sums = pd.DataFrame({
+            'financed_emissions': np.bincount(member_codes, weights=np.nan_to_num(financed[members]),
+                                              minlength=len(labels)),
+            'investment': np.bincount(member_codes, weights=investment, minlength=len(labels)),
+            'holding_count': np.bincount(member_codes, minlength=len(labels)),
+        }, index=labels)
+
+        if previous is None:
+            groups = sums
+        else:
+            groups = previous.reindex(labels)
+            groups.iloc[touched] = sums.iloc[touched].to_numpy()
+            groups['holding_count'] = groups['holding_count'].astype(np.int64)
+        self.groups[key] = groups
+        return len(touched)
+
+    def aggregates(self):
+        """Financed emissions aggregates in the calculate_financed_emissions() layout."""
+
+        total_emissions = float(np.nansum(self.financed))
+        total_investment = float(np.nansum(self.holdings['investment_amount'].to_numpy(dtype=np.float64)))
+        calculated = ~np.isnan(self.financed)
+
+        def intensity(emissions, investment):
+            return float(emissions / (investment / 1_000_000)) if investment else None
+
+        aggregates = {
+            'total_financed_emissions': total_emissions,
+            'total_investment': total_investment,
+            'intensity_tco2e_per_gbp_m': intensity(total_emissions, total_investment),
+            'holding_count': int(len(self.financed)),
+            'calculated_count': int(calculated.sum()),
+            'missing_count': int((~calculated).sum()),
+        }
+        for key, groups in self.groups.items():
+            aggregates[f'by_{key}'] = {
+                label: {
+                    'financed_emissions': float(row.financed_emissions),
+                    'investment': float(row.investment),
+                    'intensity_tco2e_per_gbp_m': intensity(row.financed_emissions, row.investment),
+                    'holding_count': int(row.holding_count),
+                }
+                for label, row in zip(groups.index, groups.itertuples(index=False))
+            }
+        return aggregates
+
+    def write_tsx(self, output_file):
+        """Write the tbody rows and totals row; returns the number of rows written."""
+        return write_tsx_rows(output_file, self.rows, self.totals)
+
+    def save(self, path):
+        """Pickle the cache to path (written to a temp file, then renamed)."""
+
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump({'version': STATE_VERSION, 'state': self.__dict__}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load a cache written by save(); a missing or outdated file gives an empty cache."""
+
+        portfolio = cls()
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                saved = pickle.load(f)
+            if saved.get('version') == STATE_VERSION:
+                portfolio.__dict__.update(saved['state'])
+        return portfolio
+
+def main(argv=None):
+    """Main function."""
+
+    parser = argparse.ArgumentParser(description="Incrementally refresh the dashboard table and aggregates")
+    parser.add_argument("holdings_file", nargs="?", default="complete_investment_data.csv",
+                        help="Holdings CSV export or investment_data.xlsx")
+    parser.add_argument("--state", default="portfolio_state.pkl", help="Cache file kept between runs")
+    parser.add_argument("--output", default="complete_table_rows.tsx", help="TSX rows output file")
+    args = parser.parse_args(argv)
+
+    print("=" * 80)
+    print("INCREMENTAL PORTFOLIO RECALCULATION")
+    print("=" * 80)
+
+    try:
+        holdings = load_holdings(args.holdings_file, EMISSION_COLUMNS)
+    except (OSError, KeyError, ValueError) as e:
+        print(f"❌ Could not load {args.holdings_file}: {e}")
+        return 1
+
+    portfolio = IncrementalPortfolio.load(args.state)
+    cold = portfolio.totals is None
+    stats = portfolio.update(holdings)
+
+    print(f"📄 Holdings: {stats.holdings:,} from {args.holdings_file} ({'cold start' if cold else 'cached state'})")
+    print(f"🔁 Added {stats.added:,}, changed {stats.changed:,}, removed {stats.removed:,}")
+    print(f"🧮 Rows rendered: {stats.rows_rendered:,}, groups re-summed: {stats.groups_recomputed:,}, "
+          f"totals {'recomputed' if stats.totals_recomputed else 'unchanged'}")
+    print(f"⏱️  Update: {stats.seconds * 1000:,.1f} ms")
+    if stats.invalid_rows:
+        print(f"❌ {stats.invalid_rows} rendered rows do not match the table row layout")
+        return 1
+
+    if stats.dirty or cold or not os.path.exists(args.output):
+        row_count = portfolio.write_tsx(args.output)
+        print(f"✅ {row_count:,} rows written to: {args.output}")
+    else:
+        print(f"✅ No changes; {args.output} is up to date")
+
+    portfolio.save(args.state)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
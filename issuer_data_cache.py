@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Issuer Data Cache
+=================
+
+On-disk cache for acquired issuer data (reported emissions, EVIC, emission
+factors, ...) so a reporting run does not re-fetch what an earlier run
+already acquired.
+
+- Entries are content-addressed: the key is the SHA-256 of
+  (source, identifier, reporting year), e.g. ('D2B', 'isin=GB00B789012', 2023)
+- "Source has no data" is cached too, so unchanged portfolios hit for
+  every lookup
+- Entries older than the TTL count as misses and are re-fetched
+- The cache is bounded to max_entries; least recently used entries are
+  evicted first
+- In offline mode nothing is fetched: misses stay misses and expired
+  entries are served as stale hits
+- Hit, miss, expiry and eviction counters are kept per cache instance
+
+Storage is a single SQLite file. Access-time updates and new entries are
+buffered and written in one transaction per flush().
+
+Usage:
+    python issuer_data_cache.py [cache.sqlite] [--clear] [--prune]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+
+CACHE_FILE = 'issuer_data_cache.sqlite'
+DEFAULT_TTL_DAYS = 30
+DEFAULT_MAX_ENTRIES = 500_000
+
+# Returned by get() when there is no usable entry; None is a cached "no data"
+MISSING = object()
+
+@dataclass
+class CacheStats:
+    """Counters for one cache instance."""
+    hits: int = 0
+    misses: int = 0
+    expired: int = 0
+    stale_hits: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+def cache_key(source, identifier, year):
+    """Content address of one (source, identifier, reporting year) entry."""
+    return hashlib.sha256(json.dumps([source, str(identifier), year]).encode('utf-8')).hexdigest()
+
+def _json_default(value):
+    """Serialize numpy/pandas scalars that json does not know about."""
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+class IssuerDataCache:
+    """SQLite-backed TTL + LRU cache for acquired issuer data."""
+
+    def __init__(self, path=CACHE_FILE, ttl_days=DEFAULT_TTL_DAYS, max_entries=DEFAULT_MAX_ENTRIES,
+                 offline=False, flush_every=10_000):
+        self.path = path
+        self.ttl = ttl_days * 86400 if ttl_days is not None else None
+        self.max_entries = max_entries
+        self.offline = offline
+        self.flush_every = flush_every
+        self.stats = CacheStats()
+
+        self._pending_puts = {}
+        self._pending_touches = {}
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                identifier TEXT NOT NULL,
+                year INTEGER,
+                value TEXT,
+                fetched_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self.connection.commit()
+
+    def get(self, source, identifier, year):
+        """Return the cached value, or MISSING if there is no usable entry."""
+
+        key = cache_key(source, identifier, year)
+        now = time.time()
+
+        if key in self._pending_puts:
+            self.stats.hits += 1
+            return self._pending_puts[key][3]
+
+        row = self.connection.execute(
+            "SELECT value, fetched_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.stats.misses += 1
+            return MISSING
+
+        value, fetched_at = row
+        if self.ttl is not None and now - fetched_at > self.ttl:
+            if not self.offline:
+                self.stats.expired += 1
+                self.stats.misses += 1
+                return MISSING
+            self.stats.stale_hits += 1
+
+        self.stats.hits += 1
+        self._pending_touches[key] = now
+        self._maybe_flush()
+        return None if value is None else json.loads(value)
+
+    def put(self, source, identifier, year, value):
+        """Store a fetched value (None records that the source had no data)."""
+
+        key = cache_key(source, identifier, year)
+        self._pending_puts[key] = (source, str(identifier), year, value)
+        self.stats.stores += 1
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if len(self._pending_puts) + len(self._pending_touches) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Write buffered entries and access times, then evict beyond max_entries."""
+
+        if not self._pending_puts and not self._pending_touches:
+            return
+
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._pending_touches.items()]
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO entries (key, source, identifier, year, value, fetched_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (key, source, identifier, year,
+                     None if value is None else json.dumps(value, default=_json_default), now, now)
+                    for key, (source, identifier, year, value) in self._pending_puts.items()
+                ]
+            )
+            self._evict()
+
+        self._pending_puts.clear()
+        self._pending_touches.clear()
+
+    def _evict(self):
+        """Drop the least recently used entries beyond max_entries."""
+
+        if self.max_entries is None:
+            return
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM entries").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self.connection.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+            self.stats.evictions += excess
+
+    def prune_expired(self):
+        """Delete entries older than the TTL; returns the number removed."""
+
+        self.flush()
+        if self.ttl is None:
+            return 0
+        with self.connection:
+            cursor = self.connection.execute("DELETE FROM entries WHERE fetched_at < ?", (time.time() - self.ttl,))
+        return cursor.rowcount
+
+    def clear(self):
+        """Remove every entry."""
+
+        self._pending_puts.clear()
+        self._pending_touches.clear()
+        with self.connection:
+            self.connection.execute("DELETE FROM entries")
+
+    def summary(self):
+        """Entry counts per source, oldest fetch time and file size."""
+
+        self.flush()
+        by_source = dict(self.connection.execute(
+            "SELECT source, COUNT(*) FROM entries GROUP BY source ORDER BY source"
+        ).fetchall())
+        (oldest,) = self.connection.execute("SELECT MIN(fetched_at) FROM entries").fetchone()
+        return {
+            'entries': sum(by_source.values()),
+            'by_source': by_source,
+            'oldest_fetch': oldest,
+            'file_bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def main(argv=None):
+    """Main function."""
+
+    parser = argparse.ArgumentParser(description="Inspect or maintain the issuer data cache")
+    parser.add_argument("cache_file", nargs="?", default=CACHE_FILE, help="Cache file to open")
+    parser.add_argument("--ttl-days", type=float, default=DEFAULT_TTL_DAYS, help="Entry time-to-live in days")
+    parser.add_argument("--clear", action="store_true", help="Remove every entry")
+    parser.add_argument("--prune", action="store_true", help="Remove entries older than the TTL")
+    args = parser.parse_args(argv)
+
+    print("=" * 80)
+    print("ISSUER DATA CACHE")
+    print("=" * 80)
+
+    with IssuerDataCache(args.cache_file, ttl_days=args.ttl_days) as cache:
+        if args.clear:
+            cache.clear()
+            print("🗑️  Cache cleared")
+        if args.prune:
+            print(f"🧹 Pruned {cache.prune_expired()} expired entries")
+
+        summary = cache.summary()
+
+    print(f"📄 Cache file: {args.cache_file} ({summary['file_bytes']:,} bytes)")
+    print(f"📊 Entries: {summary['entries']:,}")
+    for source, count in summary['by_source'].items():
+        print(f"   {source:<8} {count:>10,}")
+    if summary['oldest_fetch'] is not None:
+        age_days = (time.time() - summary['oldest_fetch']) / 86400
+        print(f"⏳ Oldest entry: {age_days:.1f} days")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,546 @@
+#!/usr/bin/env python3
+"""
+ESG Scope 3 Workflow Executor
+=============================
+
+Runs the 30-node ESG Scope 3 DAG (esg_dag_nodes_only.md) as a dependency
+graph instead of a list of manual steps. Node dependencies mirror
+omnis-ui/components/dag/utils/esg-dag-data.ts; stage and step metadata come
+from omnis-ui/emissions_workflow.json.
+
+Each node starts as soon as all of its dependencies have finished, so the
+declared parallel points run concurrently:
+
+- D2A-D2F:  6-way carbon & financial data acquisition
+- S6A-S6D:  multi-stakeholder review
+- S7/S8/S9: emission calculations
+
+End-to-end wall-clock time is then set by the critical path rather than the
+sum of all steps. A failed node skips everything downstream of it; unrelated
+branches keep running.
+
+Tasks are plain callables registered in NODE_TASKS (or passed to
+run_workflow) taking a dict of {dependency_id: result}. The implemented
+stages are registered against one shared WorkflowContext:
+
+- D1A:      holdings and issuers from investment_data.xlsx
+- D2A-D2F:  one acquisition source each (acquire_carbon_data.py), D2G merge
+- D3:       holdings joined with the reported D2G emissions
+- V3 / V2:  compare_against_benchmarks.py / detect_data_anomalies.py
+- S5:       impute_proxy_emissions.py
+- S7 / S9:  sharded_calculations.py; S8: emissions_cube.py
+
+Nodes without a task are placeholders: they are listed in a warning, shown
+as such in the report, and sleep for --simulate seconds to preview the
+schedule.
+
+Usage:
+    python run_emissions_workflow.py [investment_data.xlsx] [--sources-dir DIR] [--init-standins]
+                                     [--simulate SECONDS] [--workers N] [--workflow FILE]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from acquire_carbon_data import (
+    OUTPUT_FILE as D2G_FILE,
+    SOURCES,
+    STANDIN_DIR,
+    FileSourceAdapter,
+    acquire_source,
+    load_amil_issuers,
+    merge_carbon_financial_data,
+    write_standin_sources,
+)
+from compare_against_benchmarks import (
+    ESC_DATA_QUALITY_FILE,
+    combine_benchmarks,
+    compare_against_benchmarks,
+    intensity_ranges_from_benchmarks,
+    load_esc_benchmarks,
+)
+from detect_data_anomalies import detect_anomalies
+from emissions_cube import EmissionsCube
+from holdings_model import load_holdings
+from impute_proxy_emissions import PROVENANCES, data_quality_mix, impute_emissions, load_imputation_inputs
+from sharded_calculations import run_sharded
+
+WORKFLOW_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'omnis-ui', 'emissions_workflow.json')
+
+# node id -> (name, dependencies, emissions_workflow.json step)
+DAG_NODES = {
+    'Q0': ('Parse ESG Query', (), None),
+
+    # Stage 1A: Sub Process 1.1 - Portfolio Data Collection
+    'D1A': ('Collect Portfolio Data - Investments Under Consideration', ('Q0',), 1),
+    'D1B': ('Collect Portfolio Data - Internal Guidance', ('Q0',), 1),
+    'D1C': ('Merge Investments with Guidance', ('D1A', 'D1B'), 1),
+
+    # Stage 1B: Sub Process 1.2 - Carbon & Financial Data (6-way parallel)
+    'D2A': ('Internal - Climate Solution', ('D1C',), 2),
+    'D2B': ('External Primary - Reported Emissions', ('D1C',), 2),
+    'D2C': ('External Primary - Supply Chain', ('D1C',), 2),
+    'D2D': ('External Secondary - Emission Factors', ('D1C',), 2),
+    'D2E': ('External Secondary - Grid Energy', ('D1C',), 2),
+    'D2F': ('External Secondary - Benchmarks', ('D1C',), 2),
+    'D2G': ('Merge Carbon & Financial Data', ('D2A', 'D2B', 'D2C', 'D2D', 'D2E', 'D2F'), 2),
+
+    # Stage 1C: Sub Process 1.3 - Final Data Merging
+    'D3': ('Merge Portfolio Data', ('D1C', 'D2G'), 3),
+
+    # Sub-process 2.1: Data Completeness and Accuracy Audit
+    'S1A': ('Get Internal Data for Validation', ('D3',), 4),
+    'S1B': ('Get External Data for Validation', ('D3',), 4),
+    'V3': ('Compare Against Expectations', ('S1A', 'S1B'), 4),
+    'V2': ('Identify Anomalies and Inconsistencies', ('V3',), 4),
+    'S4': ('Produce Data Quality Report', ('V2',), 4),
+
+    # Sub-process 2.2: Apply Proxy Data & Assumptions
+    'S5': ('Estimate, Impute and Correct', ('S4',), 5),
+
+    # Sub-process 2.3: Data Verification and Sign-off (parallel reviews)
+    'S6A': ('Climate Solutions Team Review', ('S5',), 6),
+    'S6B': ('Middle Office Team Review', ('S5',), 6),
+    'S6C': ('Institutional Reporting Team Review', ('S5',), 6),
+    'S6D': ('Group Climate Team Review', ('S5',), 6),
+    'S6E': ('Consolidate Validation Results', ('S6A', 'S6B', 'S6C', 'S6D'), 6),
+
+    # Stage 4: Emission Calculations (parallel)
+    'S7': ('Financed Emissions Calculation', ('S6E',), 7),
+    'S8': ('Sectoral Analysis & Breakdown', ('S6E',), 8),
+    'S9': ('Climate Risk Assessment', ('S6E',), 9),
+
+    # Stage 5: Reporting (sequential)
+    'S10': ('Compile Evidence Pack', ('S7', 'S8', 'S9'), 10),
+    'S11': ('Disclosure Preparation', ('S10',), 11),
+    'S12': ('Integration into Annual Report', ('S11',), 12),
+
+    'COMPLETE': ('Emissions Workflow Complete', ('S12',), None),
+}
+
+HOLDINGS_FILE = 'investment_data.xlsx'
+
+class WorkflowContext:
+    """Data shared by the stage tasks of one workflow run.
+
+    Each task stores its output here as well as returning it, so later
+    stages can read the outputs of any upstream node, not only of their
+    direct dependencies. The DAG guarantees a value is set before any
+    node that needs it starts.
+    """
+
+    def __init__(self, holdings_file=HOLDINGS_FILE, sources_dir=STANDIN_DIR, esc_file=ESC_DATA_QUALITY_FILE):
+        self.holdings_file = holdings_file
+        self.sources_dir = sources_dir
+        self.esc_file = esc_file
+        self.holdings = None
+        self.issuers = None
+        self.d2g = None
+        self.portfolio = None
+        self.calculated = None
+        self._sharded = None
+        self._sharded_lock = threading.Lock()
+
+    def collect_portfolio(self, inputs):
+        """D1A: typed holdings and the issuer identifiers, row-aligned."""
+        self.holdings = load_holdings(self.holdings_file)
+        self.issuers = load_amil_issuers(self.holdings_file)
+        return self.holdings
+
+    def acquire(self, source):
+        """D2A-D2F: task fetching every issuer from one source's stand-in."""
+
+        name, filename, keys = SOURCES[source]
+
+        def task(inputs):
+            adapter = FileSourceAdapter(source, name, os.path.join(self.sources_dir, filename), keys)
+            return asyncio.run(acquire_source(adapter, self.issuers.to_dict('records')))
+        return task
+
+    def merge_carbon_financial(self, inputs):
+        """D2G: merge the six sources and write the D2G dataset for S5."""
+        self.d2g = merge_carbon_financial_data(self.issuers, {source: inputs[source] for source in SOURCES})
+        self.d2g.to_csv(D2G_FILE, index=False)
+        return self.d2g
+
+    def merge_portfolio(self, inputs):
+        """D3: holdings with the reported scope 1 + 2 emissions from D2G."""
+
+        reported = [column for column in ('scope1_tco2e', 'scope2_tco2e') if column in self.d2g.columns]
+        self.portfolio = self.holdings.copy()
+        self.portfolio['emissions'] = (self.d2g[reported].astype(float).sum(axis=1, min_count=1).to_numpy()
+                                       if reported else np.nan)
+        return self.portfolio
+
+    def compare_benchmarks(self, inputs):
+        """V3: portfolio slices against the ESC and D2F benchmarks."""
+        benchmarks = combine_benchmarks(load_esc_benchmarks(self.esc_file),
+                                        intensity_ranges_from_benchmarks(self.d2g))
+        return compare_against_benchmarks(self.portfolio, benchmarks)
+
+    def detect_anomalies(self, inputs):
+        """V2: the issues table for the merged portfolio."""
+        return detect_anomalies(self.portfolio)
+
+    def impute(self, inputs):
+        """S5: fill the emission gaps with proxies; the data mix and PCAF follow."""
+
+        mix = data_quality_mix(impute_emissions(load_imputation_inputs(self.holdings_file, D2G_FILE)))
+        self.calculated = self.holdings.copy()
+        for column in ['emissions', 'pcaf_score'] + PROVENANCES:
+            self.calculated[column] = mix[column].to_numpy()
+        return mix
+
+    def sharded(self):
+        """S7/S9 share one sharded run, made by whichever node starts first."""
+        with self._sharded_lock:
+            if self._sharded is None:
+                self._sharded = run_sharded(self.calculated)
+            return self._sharded
+
+    def financed_emissions(self, inputs):
+        """S7: portfolio financed emissions totals."""
+        return self.sharded().totals
+
+    def sectoral_breakdown(self, inputs):
+        """S8: sector × asset class rollup from the emissions cube."""
+        return EmissionsCube(self.calculated).rollup(['sector', 'asset_class'])
+
+    def climate_risk(self, inputs):
+        """S9: carbon cost per price scenario."""
+        return self.sharded().climate_risk
+
+def workflow_tasks(context):
+    """Map the implemented nodes to the context's stage tasks."""
+
+    tasks = {
+        'D1A': context.collect_portfolio,
+        'D2G': context.merge_carbon_financial,
+        'D3': context.merge_portfolio,
+        'V3': context.compare_benchmarks,
+        'V2': context.detect_anomalies,
+        'S5': context.impute,
+        'S7': context.financed_emissions,
+        'S8': context.sectoral_breakdown,
+        'S9': context.climate_risk,
+    }
+    tasks.update({source: context.acquire(source) for source in SOURCES})
+    return tasks
+
+# node id -> callable(inputs); nodes without an entry are placeholders
+NODE_TASKS = workflow_tasks(WorkflowContext())
+
+@dataclass
+class WorkflowNode:
+    """One DAG node with its emissions_workflow.json stage metadata."""
+    node_id: str
+    name: str
+    dependencies: tuple
+    step: int = None
+    stage: str = None
+    parallel_stage: bool = False
+
+@dataclass
+class NodeRun:
+    """Outcome of one node: 'done', 'placeholder' (no task), 'failed' or 'skipped'."""
+    node_id: str
+    status: str = 'pending'
+    started: float = None
+    finished: float = None
+    result: object = None
+    error: str = None
+
+    @property
+    def duration(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+@dataclass
+class WorkflowRun:
+    """Per-node outcomes plus the overall wall-clock time."""
+    nodes: dict
+    runs: dict = field(default_factory=dict)
+    wall_time: float = 0.0
+
+    @property
+    def ok(self):
+        return all(run.status in ('done', 'placeholder') for run in self.runs.values())
+
+    @property
+    def placeholders(self):
+        """Nodes that had no task and did no work."""
+        return [node_id for node_id, run in self.runs.items() if run.status == 'placeholder']
+
+    @property
+    def total_work(self):
+        """Sum of all node durations (the sequential wall-clock time)."""
+        return sum(run.duration for run in self.runs.values())
+
+    def critical_path(self):
+        """Return (path, seconds) for the longest dependency chain by duration."""
+
+        finish = {}
+        previous = {}
+        for node_id in topological_order(self.nodes):
+            dependencies = self.nodes[node_id].dependencies
+            best = max(dependencies, key=lambda dep: finish[dep], default=None)
+            finish[node_id] = (finish[best] if best else 0.0) + self.runs[node_id].duration
+            previous[node_id] = best
+
+        node_id = max(finish, key=finish.get)
+        length = finish[node_id]
+        path = []
+        while node_id is not None:
+            path.append(node_id)
+            node_id = previous[node_id]
+        return path[::-1], length
+
+def topological_order(nodes):
+    """Order node ids so every node follows its dependencies (Kahn's algorithm).
+
+    Raises ValueError for unknown dependencies or cycles.
+    """
+
+    remaining = {}
+    dependents = {node_id: [] for node_id in nodes}
+    for node_id, node in nodes.items():
+        for dep in node.dependencies:
+            if dep not in nodes:
+                raise ValueError(f"Node {node_id} depends on unknown node {dep}")
+            dependents[dep].append(node_id)
+        remaining[node_id] = len(node.dependencies)
+
+    ready = [node_id for node_id, count in remaining.items() if count == 0]
+    order = []
+    while ready:
+        node_id = ready.pop(0)
+        order.append(node_id)
+        for dependent in dependents[node_id]:
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                ready.append(dependent)
+
+    if len(order) != len(nodes):
+        cycle = sorted(node_id for node_id, count in remaining.items() if count > 0)
+        raise ValueError(f"Workflow has a dependency cycle through: {', '.join(cycle)}")
+    return order
+
+def _depends_on(nodes, node_id, target):
+    """True if node_id transitively depends on target."""
+
+    stack = list(nodes[node_id].dependencies)
+    seen = set()
+    while stack:
+        dep = stack.pop()
+        if dep == target:
+            return True
+        if dep not in seen:
+            seen.add(dep)
+            stack.extend(nodes[dep].dependencies)
+    return False
+
+def load_workflow(workflow_file=WORKFLOW_FILE, dag_nodes=DAG_NODES):
+    """Build the DAG nodes annotated with their emissions_workflow.json stage.
+
+    Checks that every workflow step is covered by a node and that the steps
+    of a stage marked "parallel" do not depend on each other.
+    """
+
+    with open(workflow_file, 'r', encoding='utf-8') as f:
+        workflow = json.load(f)['workflow']
+
+    steps = {}
+    for stage in workflow:
+        for step in stage['steps']:
+            steps[step['step']] = (stage['stage'], bool(stage.get('parallel', False)))
+
+    nodes = {}
+    for node_id, (name, dependencies, step) in dag_nodes.items():
+        if step is not None and step not in steps:
+            raise ValueError(f"Node {node_id} refers to step {step}, which is not in {workflow_file}")
+        stage, parallel = steps.get(step, (None, False))
+        nodes[node_id] = WorkflowNode(node_id, name, tuple(dependencies), step, stage, parallel)
+
+    covered = {node.step for node in nodes.values()}
+    missing = sorted(set(steps) - covered)
+    if missing:
+        raise ValueError(f"Workflow steps without DAG nodes: {missing}")
+
+    topological_order(nodes)
+
+    for stage in workflow:
+        if not stage.get('parallel'):
+            continue
+        stage_steps = {step['step'] for step in stage['steps']}
+        stage_nodes = [node_id for node_id, node in nodes.items() if node.step in stage_steps]
+        for node_id in stage_nodes:
+            for other in stage_nodes:
+                if nodes[other].step != nodes[node_id].step and _depends_on(nodes, node_id, other):
+                    raise ValueError(f"Parallel stage '{stage['stage']}': {node_id} depends on {other}")
+
+    return nodes
+
+def run_workflow(nodes, tasks=None, max_workers=None, default_task=None):
+    """Run every node once its dependencies are done, in a thread pool.
+
+    tasks maps node id -> callable(inputs) where inputs is {dependency: result};
+    it defaults to NODE_TASKS. default_task runs for nodes without a task;
+    those nodes finish with status 'placeholder'.
+    """
+
+    tasks = NODE_TASKS if tasks is None else tasks
+    order = topological_order(nodes)
+
+    dependents = {node_id: [] for node_id in nodes}
+    for node_id, node in nodes.items():
+        for dep in node.dependencies:
+            dependents[dep].append(node_id)
+
+    run = WorkflowRun(nodes, {node_id: NodeRun(node_id) for node_id in order})
+    waiting = {node_id: len(nodes[node_id].dependencies) for node_id in order}
+    ready = [node_id for node_id in order if waiting[node_id] == 0]
+
+    def execute(node_id):
+        task = tasks.get(node_id, default_task)
+        inputs = {dep: run.runs[dep].result for dep in nodes[node_id].dependencies}
+        node_run = run.runs[node_id]
+        node_run.started = time.perf_counter()
+        try:
+            if task is not None:
+                node_run.result = task(inputs)
+        finally:
+            node_run.finished = time.perf_counter()
+
+    def skip_downstream(node_id, reason):
+        stack = list(dependents[node_id])
+        while stack:
+            dependent = stack.pop()
+            if run.runs[dependent].status == 'pending':
+                run.runs[dependent].status = 'skipped'
+                run.runs[dependent].error = reason
+                stack.extend(dependents[dependent])
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers or len(nodes)) as pool:
+        running = {}
+        while ready or running:
+            for node_id in ready:
+                run.runs[node_id].status = 'running'
+                running[pool.submit(execute, node_id)] = node_id
+            ready = []
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                node_id = running.pop(future)
+                error = future.exception()
+                if error is not None:
+                    run.runs[node_id].status = 'failed'
+                    run.runs[node_id].error = f"{type(error).__name__}: {error}"
+                    skip_downstream(node_id, f"upstream {node_id} failed")
+                    continue
+
+                run.runs[node_id].status = 'done' if node_id in tasks else 'placeholder'
+                for dependent in dependents[node_id]:
+                    waiting[dependent] -= 1
+                    if waiting[dependent] == 0 and run.runs[dependent].status == 'pending':
+                        ready.append(dependent)
+
+    run.wall_time = time.perf_counter() - started
+    return run
+
+def print_run_report(run):
+    """Print per-node timings and the critical path summary."""
+
+    status_icons = {'done': '✅', 'placeholder': '⚠️ ', 'failed': '❌', 'skipped': '⏭️ '}
+
+    print("\nNODE TIMINGS:")
+    print(f"   {'Node':<9} {'Start':>8} {'Duration':>9}  Name")
+    origin = min((r.started for r in run.runs.values() if r.started is not None), default=0.0)
+    for node_id, node_run in run.runs.items():
+        icon = status_icons.get(node_run.status, '  ')
+        start = f"{node_run.started - origin:7.2f}s" if node_run.started is not None else '       -'
+        print(f"{icon} {node_id:<9} {start:>8} {node_run.duration:8.2f}s  {run.nodes[node_id].name}")
+        if node_run.error:
+            print(f"      {node_run.error}")
+
+    path, length = run.critical_path()
+    print("\n📊 SUMMARY:")
+    print(f"   Nodes: {len(run.runs)} "
+          f"({sum(r.status == 'done' for r in run.runs.values())} done, "
+          f"{sum(r.status == 'placeholder' for r in run.runs.values())} placeholders, "
+          f"{sum(r.status == 'failed' for r in run.runs.values())} failed, "
+          f"{sum(r.status == 'skipped' for r in run.runs.values())} skipped)")
+    print(f"   Wall-clock time: {run.wall_time:.2f}s")
+    print(f"   Sum of all steps: {run.total_work:.2f}s")
+    print(f"   Critical path ({length:.2f}s): {' → '.join(path)}")
+
+def main(argv=None):
+    """Main function."""
+
+    parser = argparse.ArgumentParser(description="Run the ESG Scope 3 workflow DAG")
+    parser.add_argument("holdings_file", nargs="?", default=HOLDINGS_FILE, help="Holdings workbook")
+    parser.add_argument("--sources-dir", default=STANDIN_DIR, help="Directory of local acquisition stand-ins")
+    parser.add_argument("--init-standins", action="store_true", help="(Re)write the local stand-in files first")
+    parser.add_argument("--workflow", default=WORKFLOW_FILE, help="emissions_workflow.json to load")
+    parser.add_argument("--workers", type=int, default=None, help="Maximum concurrent nodes")
+    parser.add_argument("--simulate", type=float, default=0.0, metavar="SECONDS",
+                        help="Sleep this long in nodes without a registered task")
+    args = parser.parse_args(argv)
+
+    print("=" * 80)
+    print("ESG SCOPE 3 WORKFLOW EXECUTOR")
+    print("=" * 80)
+
+    try:
+        nodes = load_workflow(args.workflow)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ Error loading workflow: {e}")
+        return 1
+
+    context = WorkflowContext(args.holdings_file, args.sources_dir)
+    tasks = workflow_tasks(context)
+    placeholders = [node_id for node_id in nodes if node_id not in tasks]
+
+    print(f"📄 Workflow: {args.workflow}")
+    print(f"📄 Holdings: {args.holdings_file}")
+    print(f"🔗 Nodes: {len(nodes)}, registered tasks: {len(nodes) - len(placeholders)}")
+    if placeholders:
+        print(f"⚠️  {len(placeholders)} nodes have no task and do no work: {', '.join(placeholders)}")
+
+    if args.init_standins:
+        try:
+            counts = write_standin_sources(load_amil_issuers(args.holdings_file), args.sources_dir)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"❌ Error writing stand-ins: {e}")
+            return 1
+        print(f"📝 Stand-ins written to {args.sources_dir}/: {counts}")
+    elif not os.path.isdir(args.sources_dir):
+        print(f"💡 {args.sources_dir}/ not found: run with --init-standins to create the local stand-ins")
+
+    default_task = (lambda inputs: time.sleep(args.simulate)) if args.simulate > 0 else None
+    run = run_workflow(nodes, tasks, max_workers=args.workers, default_task=default_task)
+    print_run_report(run)
+
+    if run.ok and run.placeholders:
+        print(f"\n⚠️  Workflow finished, but {len(run.placeholders)} placeholder nodes did no work: "
+              f"{', '.join(run.placeholders)}")
+        return 0
+    if run.ok:
+        print("\n✅ Workflow complete")
+        return 0
+
+    print("\n❌ Workflow finished with failures")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
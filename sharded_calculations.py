@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Sharded Emission Calculations (S7 / S8 / S9)
+============================================
+
+Runs the three parallel Emission Calculations nodes of the ESG Scope 3 DAG
+over a large holdings book in one pass, sharded across a process pool:
+
+- S7  Financed Emissions Calculation: PCAF attribution per holding
+      (see calculate_financed_emissions.py), portfolio total and intensity
+- S8  Sectoral Analysis & Breakdown: financed emissions, investment and
+      holding count per sector × asset class
+- S9  Climate Risk Assessment: carbon cost of the financed emissions under
+      each carbon price scenario, and the investment in holdings whose
+      carbon cost exceeds HIGH_RISK_COST_SHARE of the amount invested
+
+Input columns are copied once into shared memory; workers attach to them
+by name and receive only (start, stop) shard bounds, so no DataFrame is
+pickled. Per-holding results are written straight into shared output
+arrays; every shard returns small partial sums.
+
+Shards have a fixed size independent of the worker count and partials are
+merged in shard order, so totals are bit-identical whether the book runs
+on one process or many.
+
+The carbon price scenarios are illustrative placeholders.
+
+Usage:
+    python sharded_calculations.py [holdings.csv] [--workers N] [--shard-rows N] [--check]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from calculate_financed_emissions import attribution_factors
+from holdings_model import parse_percentage_array, to_numeric_array
+
+SHARD_ROWS = 250_000
+
+# Scenario -> carbon price in 2030 (£/tCO2e)
+CARBON_PRICE_SCENARIOS = {
+    'RCP 2.6': 140.0,
+    'RCP 4.5': 75.0,
+    'RCP 8.5': 25.0,
+}
+HIGH_RISK_COST_SHARE = 0.10
+
+CODE_COLUMNS = ['asset_class', 'sector']
+
+@dataclass
+class ShardedResult:
+    """Per-holding S7 results plus the merged S7/S8/S9 aggregates."""
+    attribution_factor: np.ndarray
+    financed_emissions: np.ndarray
+    totals: dict
+    sectors: pd.DataFrame
+    climate_risk: pd.DataFrame
+    shards: int
+    workers: int
+    seconds: float
+
+def prepare_columns(holdings):
+    """Numeric input arrays and group codes (with their labels) for a holdings table."""
+
+    columns = {
+        'investment_amount': to_numeric_array(holdings['investment_amount']),
+        'evic': to_numeric_array(holdings['evic']),
+        'ownership': parse_percentage_array(holdings['ownership']),
+        'emissions': to_numeric_array(holdings['emissions']),
+        'total_project_cost': (to_numeric_array(holdings['total_project_cost'])
+                               if 'total_project_cost' in holdings.columns else np.full(len(holdings), np.nan)),
+    }
+    labels = {}
+    for name in CODE_COLUMNS:
+        codes, uniques = pd.factorize(holdings[name].astype(object), sort=True)
+        columns[name] = codes.astype(np.int32)
+        labels[name] = list(uniques)
+    return columns, labels
+
+def compute_shard(columns, outputs, labels, start, stop):
+    """S7/S8/S9 for holdings [start, stop); writes per-holding outputs, returns partial sums.
+
+    Partials: s7 = [financed, investment, calculated, missing];
+    s8 = sector × asset class × [financed, investment, holdings];
+    s9 = scenario × [carbon cost, high-risk investment, high-risk holdings].
+    """
+
+    window = slice(start, stop)
+    asset_class = np.asarray(labels['asset_class'] + [None], dtype=object)[columns['asset_class'][window]]
+    investment = columns['investment_amount'][window]
+    # Missing project costs fall back to the ownership share, as with no cost column at all
+    factors = attribution_factors(asset_class, investment, columns['evic'][window], columns['ownership'][window],
+                                  columns['total_project_cost'][window])
+    financed = factors * columns['emissions'][window]
+    outputs['attribution_factor'][window] = factors
+    outputs['financed_emissions'][window] = financed
+
+    calculated = ~np.isnan(financed)
+    financed_filled = np.where(calculated, financed, 0.0)
+    investment_filled = np.nan_to_num(investment)
+    s7 = np.array([financed_filled.sum(), investment_filled.sum(), calculated.sum(), (~calculated).sum()],
+                  dtype=np.float64)
+
+    # Unlabelled sector / asset class (code -1) goes to the extra trailing slot
+    sectors = len(labels['sector']) + 1
+    asset_classes = len(labels['asset_class']) + 1
+    sector_codes = columns['sector'][window]
+    asset_class_codes = columns['asset_class'][window]
+    cells = (np.where(sector_codes < 0, sectors - 1, sector_codes) * asset_classes
+             + np.where(asset_class_codes < 0, asset_classes - 1, asset_class_codes))
+    s8 = np.stack([
+        np.bincount(cells, weights=financed_filled, minlength=sectors * asset_classes),
+        np.bincount(cells, weights=investment_filled, minlength=sectors * asset_classes),
+        np.bincount(cells, minlength=sectors * asset_classes).astype(np.float64),
+    ], axis=1)
+
+    prices = np.array(list(CARBON_PRICE_SCENARIOS.values()))
+    cost = financed_filled[None, :] * prices[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        high_risk = (investment_filled > 0) & (cost / investment_filled > HIGH_RISK_COST_SHARE)
+    s9 = np.stack([cost.sum(axis=1), (high_risk * investment_filled).sum(axis=1), high_risk.sum(axis=1)],
+                  axis=1).astype(np.float64)
+
+    return {'s7': s7, 's8': s8, 's9': s9}
+
+def merge_partials(partials):
+    """Sum shard partials in shard order (the fixed order keeps totals reproducible)."""
+
+    merged = {key: value.copy() for key, value in partials[0].items()}
+    for partial in partials[1:]:
+        for key, value in partial.items():
+            merged[key] += value
+    return merged
+
+def shard_bounds(count, shard_rows=SHARD_ROWS):
+    return [(start, min(start + shard_rows, count)) for start in range(0, count, shard_rows)]
+
+class SharedArrays:
+    """Named shared memory blocks holding one array each; unlinked on close."""
+
+    def __init__(self, arrays):
+        self.blocks = {}
+        self.arrays = {}
+        self.specs = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            view[...] = array
+            self.blocks[name] = block
+            self.arrays[name] = view
+            self.specs[name] = (block.name, array.dtype.str, array.shape)
+
+    def close(self):
+        self.arrays.clear()
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def attach_arrays(specs):
+    """Attach to blocks created by SharedArrays; returns ({name: array}, blocks)."""
+
+    arrays, blocks = {}, []
+    for name, (block_name, dtype, shape) in specs.items():
+        # Pool workers share the parent's resource tracker, so attaching
+        # does not hand ownership of the block to the worker
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    return arrays, blocks
+
+_worker = {}
+
+def _init_worker(input_specs, output_specs, labels):
+    _worker['columns'], input_blocks = attach_arrays(input_specs)
+    _worker['outputs'], output_blocks = attach_arrays(output_specs)
+    _worker['blocks'] = input_blocks + output_blocks
+    _worker['labels'] = labels
+
+def _run_shard(bounds):
+    return compute_shard(_worker['columns'], _worker['outputs'], _worker['labels'], *bounds)
+
+def run_sharded(holdings, workers=None, shard_rows=SHARD_ROWS):
+    """Run S7/S8/S9 over holdings, sharded across workers processes (1 = in-process)."""
+
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    columns, labels = prepare_columns(holdings)
+    count = len(holdings)
+    bounds = shard_bounds(count, shard_rows)
+    outputs = {'attribution_factor': np.full(count, np.nan), 'financed_emissions': np.full(count, np.nan)}
+
+    if workers == 1 or len(bounds) <= 1:
+        partials = [compute_shard(columns, outputs, labels, start, stop) for start, stop in bounds]
+        attribution, financed = outputs['attribution_factor'], outputs['financed_emissions']
+    else:
+        with SharedArrays(columns) as shared_inputs, SharedArrays(outputs) as shared_outputs:
+            with ProcessPoolExecutor(max_workers=min(workers, len(bounds)), initializer=_init_worker,
+                                     initargs=(shared_inputs.specs, shared_outputs.specs, labels)) as pool:
+                partials = list(pool.map(_run_shard, bounds))
+            attribution = shared_outputs.arrays['attribution_factor'].copy()
+            financed = shared_outputs.arrays['financed_emissions'].copy()
+
+    merged = merge_partials(partials) if partials else compute_shard(columns, outputs, labels, 0, 0)
+    return ShardedResult(
+        attribution_factor=attribution,
+        financed_emissions=financed,
+        totals=_s7_totals(merged['s7']),
+        sectors=_s8_breakdown(merged['s8'], labels),
+        climate_risk=_s9_assessment(merged['s9'], merged['s7']),
+        shards=len(bounds),
+        workers=1 if workers == 1 or len(bounds) <= 1 else min(workers, len(bounds)),
+        seconds=time.perf_counter() - started,
+    )
+
+def _intensity(emissions, investment):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(investment > 0, emissions / (investment / 1_000_000), np.nan)
+
+def _s7_totals(s7):
+    financed, investment, calculated, missing = s7
+    return {
+        'total_financed_emissions': float(financed),
+        'total_investment': float(investment),
+        'intensity_tco2e_per_gbp_m': float(_intensity(financed, investment)) if investment else None,
+        'calculated_count': int(calculated),
+        'missing_count': int(missing),
+    }
+
+def _s8_breakdown(s8, labels):
+    sectors = labels['sector'] + [None]
+    asset_classes = labels['asset_class'] + [None]
+    breakdown = pd.DataFrame({
+        'sector': np.repeat(np.asarray(sectors, dtype=object), len(asset_classes)),
+        'asset_class': np.tile(np.asarray(asset_classes, dtype=object), len(sectors)),
+        'financed_emissions': s8[:, 0],
+        'investment': s8[:, 1],
+        'holding_count': s8[:, 2].astype(np.int64),
+    })
+    breakdown = breakdown[breakdown['holding_count'] > 0].reset_index(drop=True)
+    breakdown['intensity_tco2e_per_gbp_m'] = _intensity(breakdown['financed_emissions'].to_numpy(),
+                                                        breakdown['investment'].to_numpy())
+    return breakdown
+
+def _s9_assessment(s9, s7):
+    investment = s7[1]
+    return pd.DataFrame({
+        'scenario': list(CARBON_PRICE_SCENARIOS),
+        'carbon_price': list(CARBON_PRICE_SCENARIOS.values()),
+        'carbon_cost': s9[:, 0],
+        'carbon_cost_share': s9[:, 0] / investment if investment else np.nan,
+        'high_risk_investment': s9[:, 1],
+        'high_risk_holdings': s9[:, 2].astype(np.int64),
+    })
+
+def main(argv=None):
+    """Main function."""
+
+    parser = argparse.ArgumentParser(description="S7/S8/S9 emission calculations sharded across processes")
+    parser.add_argument("holdings_file", nargs="?", default="complete_investment_data.csv",
+                        help="Holdings CSV with an 'emissions' column (tCO2e per issuer/asset)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--shard-rows", type=int, default=SHARD_ROWS, help="Holdings per shard")
+    parser.add_argument("--check", action="store_true", help="Re-run in one process and compare totals bit for bit")
+    args = parser.parse_args(argv)
+
+    print("=" * 80)
+    print("SHARDED EMISSION CALCULATIONS (S7 / S8 / S9)")
+    print("=" * 80)
+
+    holdings = pd.read_csv(args.holdings_file)
+    if 'emissions' not in holdings.columns:
+        print("❌ Error: Holdings table needs an 'emissions' column (tCO2e per issuer/asset)")
+        return 1
+
+    result = run_sharded(holdings, args.workers, args.shard_rows)
+    totals = result.totals
+
+    print(f"📄 Holdings: {len(holdings):,} from {args.holdings_file}")
+    print(f"⚙️  {result.shards} shards on {result.workers} process(es) in {result.seconds:.2f}s "
+          f"({len(holdings) / max(result.seconds, 1e-9):,.0f} holdings/s)")
+    print(f"\n🌍 S7 total financed emissions: {totals['total_financed_emissions']:,.1f} tCO2e "
+          f"({totals['calculated_count']:,} calculated, {totals['missing_count']:,} missing inputs)")
+    if totals['intensity_tco2e_per_gbp_m'] is not None:
+        print(f"📈 Intensity: {totals['intensity_tco2e_per_gbp_m']:,.2f} tCO2e/£m")
+
+    print("\n🏭 S8 BY SECTOR:")
+    by_sector = result.sectors.groupby('sector', dropna=False, sort=True)[['financed_emissions', 'investment']].sum()
+    for sector, row in by_sector.iterrows():
+        print(f"   {str(sector):<30} {row['financed_emissions']:>16,.1f} tCO2e")
+
+    print("\n🌡️  S9 CLIMATE RISK (carbon cost of financed emissions):")
+    for row in result.climate_risk.itertuples(index=False):
+        print(f"   {row.scenario:<8} £{row.carbon_price:>6.0f}/t  cost £{row.carbon_cost / 1e6:>12,.1f}m  "
+              f"high-risk investment £{row.high_risk_investment / 1e6:>12,.1f}m ({row.high_risk_holdings:,} holdings)")
+
+    output = holdings.copy()
+    output['attribution_factor'] = result.attribution_factor
+    output['financed_emissions'] = result.financed_emissions
+    output.to_csv('financed_emissions_by_holding.csv', index=False)
+    result.sectors.to_csv('sector_breakdown.csv', index=False)
+    result.climate_risk.to_csv('climate_risk_assessment.csv', index=False)
+    print("\n✅ Saved financed_emissions_by_holding.csv, sector_breakdown.csv, climate_risk_assessment.csv")
+
+    if args.check:
+        single = run_sharded(holdings, workers=1, shard_rows=args.shard_rows)
+        identical = (single.totals == result.totals
+                     and single.sectors.equals(result.sectors)
+                     and single.climate_risk.equals(result.climate_risk)
+                     and np.array_equal(single.financed_emissions, result.financed_emissions, equal_nan=True))
+        print(f"{'✅' if identical else '❌'} Single-process run {'matches bit for bit' if identical else 'differs'}")
+        return 0 if identical else 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Tests for the streaming JSON reader in extract_xlsx_data.py"""
+
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extract_xlsx_data import _JsonStream, iter_sheet_column
+
+# Number literals as they may appear in an extract (json.dumps alone never
+# writes exponents like '1e5')
+NUMBER_LITERALS = ['0', '12', '-7', '12.5', '-0.25', '1e5', '1E5', '1.5e-7', '-3.25E+12',
+                   '123456789012345678', '0.1', '2.0']
+
+def _extract(rows):
+    return {
+        "metadata": {"sheet_names": ["Other", "Chat"]},
+        "sheets": {
+            "Other": {"name": "Other", "data": [{"value": [1, {"nested": "]}"}]}]},
+            "Chat": {"name": "Chat", "data": rows},
+        },
+    }
+
+def _sheet_rows(stream, sheet_name):
+    assert stream.find("sheets") and stream.find(sheet_name) and stream.find("data")
+    return list(stream.items())
+
+@pytest.mark.parametrize("chunk_size", range(1, 24))
+def test_numbers_split_across_chunks(chunk_size):
+    # Scalars are decoded on their own (a truncated object simply fails to
+    # decode), so a chunk boundary right after '12.' or '1e' must not cut
+    # the number short
+    text = json.dumps(_extract([])).replace('"data": []', f'"data": [{", ".join(NUMBER_LITERALS)}]')
+    expected = [json.loads(literal) for literal in NUMBER_LITERALS]
+
+    for offset in range(chunk_size):
+        # Shift the text so the reads end at every position within a chunk
+        stream = _JsonStream(io.StringIO(" " * offset + text), chunk_size=chunk_size)
+        assert _sheet_rows(stream, "Chat") == expected
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 8])
+def test_compact_separators(chunk_size):
+    rows = [{"a": 12.5, "b": [1e5, -2, "x,y"]}, {"a": -0.5}]
+    text = json.dumps(_extract(rows), separators=(',', ':'))
+
+    stream = _JsonStream(io.StringIO(text), chunk_size=chunk_size)
+    assert _sheet_rows(stream, "Chat") == rows
+
+def test_skipped_sheet_with_brackets_in_strings():
+    stream = _JsonStream(io.StringIO(json.dumps(_extract([{"number": 1}]))), chunk_size=4)
+    assert _sheet_rows(stream, "Chat") == [{"number": 1}]
+
+def test_iter_sheet_column(tmp_path):
+    rows = [{"message": "first", "number": 12.5}, {"number": 3}, {"message": "third"}]
+    json_file = tmp_path / "extracted_data.json"
+    json_file.write_text(json.dumps(_extract(rows)), encoding="utf-8")
+
+    assert list(iter_sheet_column(str(json_file), "Chat", "message")) == ["first", None, "third"]
+    assert list(iter_sheet_column(str(json_file), "Chat", "number")) == [12.5, 3, None]
+    with pytest.raises(KeyError):
+        list(iter_sheet_column(str(json_file), "Missing", "message"))
@@ -0,0 +1,62 @@
+"""Tests for the cached aggregates in incremental_portfolio.py"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculate_financed_emissions import calculate_financed_emissions
+from holdings_model import CSV_TEXT_COLUMNS, load_holdings
+from incremental_portfolio import EMISSION_COLUMNS, IncrementalPortfolio
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _book():
+    book = pd.read_csv(os.path.join(REPO_DIR, 'complete_investment_data.csv'), dtype=CSV_TEXT_COLUMNS)
+    book['emissions'] = [1000.0 * (i + 1) for i in range(len(book))]
+    book.loc[3, 'sector'] = None
+    return book
+
+def _assert_matches_full_run(portfolio, book):
+    _, expected = calculate_financed_emissions(book)
+    actual = portfolio.aggregates()
+    for breakdown in ('by_asset_class', 'by_sector'):
+        assert actual[breakdown].keys() == expected[breakdown].keys()
+        for label, group in expected[breakdown].items():
+            assert actual[breakdown][label]['holding_count'] == group['holding_count']
+            assert actual[breakdown][label]['financed_emissions'] == pytest.approx(group['financed_emissions'])
+            assert actual[breakdown][label]['investment'] == pytest.approx(group['investment'])
+
+def _load(book, tmp_path):
+    csv_file = tmp_path / 'holdings.csv'
+    book.to_csv(csv_file, index=False)
+    return load_holdings(str(csv_file), EMISSION_COLUMNS)
+
+def test_blank_sector_grouped_as_unspecified(tmp_path):
+    book = _book()
+    portfolio = IncrementalPortfolio()
+    portfolio.update(_load(book, tmp_path))
+
+    assert portfolio.aggregates()['by_sector']['Unspecified']['holding_count'] == 1
+    _assert_matches_full_run(portfolio, book)
+
+def test_edits_to_blank_sectors_stay_in_sync(tmp_path):
+    book = _book()
+    portfolio = IncrementalPortfolio()
+    portfolio.update(_load(book, tmp_path))
+
+    # Blank a second sector, fill in the first one and change an unrelated holding
+    book.loc[5, 'sector'] = None
+    book.loc[3, 'sector'] = 'Energy'
+    book.loc[0, 'emissions'] = 50.0
+    stats = portfolio.update(_load(book, tmp_path))
+    assert stats.changed == 3
+    _assert_matches_full_run(portfolio, book)
+
+    book.loc[5, 'sector'] = 'Utilities'
+    portfolio.update(_load(book, tmp_path))
+    assert 'Unspecified' not in portfolio.aggregates()['by_sector']
+    _assert_matches_full_run(portfolio, book)
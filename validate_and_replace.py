@@ -10,6 +10,327 @@ Usage:
     python validate_and_replace.py
 """
 
+import re
+from collections import deque
+from dataclasses import dataclass, field
+
+# Asset class labels as rendered in the third table column
+ASSET_CLASS_LABELS = {
+    'Bond': 'Bonds',
+    'Real Estate Equity': 'Real Estate',
+    'Infrastructure (Project Finance)': 'Infrastructure'
+}
+
+# Styling classes reported by the preview
+STYLE_CLASSES = ('bg-blue-50', 'bg-orange-50', 'text-red-600')
+
+CELLS_PER_ROW = 10
+
+# The <tbody> tag on its own line (the generated file also mentions
+# "<tbody>" in its header comment)
+TBODY_OPEN_PATTERN = re.compile(r'^[ \t]*(<tbody>)', re.MULTILINE)
+
+# A complete, well-formed table row: row class, then class and text of each cell
+ROW_PATTERN = re.compile(
+    r'<tr className="([^"]*)">\s*'
+    + r'<td className="([^"]*)">([^<]*)</td>\s*' * CELLS_PER_ROW
+    + r'</tr>'
+)
+
+# One token per <tbody>/<tr>/<td> open or close tag
+TOKEN_PATTERN = re.compile(r'<(?P<close>/?)(?P<tag>tbody|tr|td)\b(?:\s+className="(?P<cls>[^"]*)")?\s*>')
+
+@dataclass
+class TbodyReport:
+    """Counts, samples and structural findings from one scan of a tbody."""
+    
+    total_lines: int = 0
+    total_characters: int = 0
+    investment_rows: int = 0
+    totals_rows: int = 0
+    asset_class_counts: dict = field(default_factory=dict)
+    style_counts: dict = field(default_factory=lambda: {cls: 0 for cls in STYLE_CLASSES})
+    currency_samples: list = field(default_factory=list)
+    rows: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+    mismatches: list = field(default_factory=list)
+    checked_rows: int = 0
+    
+    @property
+    def ok(self):
+        return not self.errors and not self.mismatches
+
+def scan_tbody(tbody, max_samples=5, keep_rows=False):
+    """Scan a generated tbody once and collect every count and check.
+    
+    Asset classes are counted from the third cell of each row rather than
+    by substring, so investment names ending in 'Bond' are not counted as
+    bond rows. With keep_rows=True the cell values of every row are kept
+    on the report (used by the structural validator).
+    
+    Well-formed tables are read a whole row per regex match; if any tag
+    falls outside a complete row, the tag-by-tag scan is used instead so
+    each structural problem can be reported precisely.
+    """
+    
+    report = _scan_rows(tbody, max_samples, keep_rows)
+    if report is None:
+        report = _scan_tokens(tbody, max_samples, keep_rows)
+    
+    if report.totals_rows != 1:
+        report.errors.append(f"Expected one totals row, found {report.totals_rows}")
+    
+    return report
+
+def _new_report(tbody):
+    return TbodyReport(total_characters=len(tbody), total_lines=tbody.count('\n') + 1)
+
+def _scan_rows(tbody, max_samples, keep_rows):
+    """Row-at-a-time scan for well-formed tables; returns None if any tag is left over."""
+    
+    row_matches = ROW_PATTERN.finditer(tbody)
+    report = _new_report(tbody)
+    # (row class, cell classes) -> style classes used by that row layout
+    styles_by_layout = {}
+    row_number = 0
+    
+    for match in row_matches:
+        row_number += 1
+        groups = match.groups()
+        row_classes = groups[0]
+        cell_classes = groups[1::2]
+        cells = list(groups[2::2])
+        
+        layout = (row_classes, cell_classes)
+        styles = styles_by_layout.get(layout)
+        if styles is None:
+            styles = [cls for attr in (row_classes,) + cell_classes
+                      for cls in attr.split() if cls in report.style_counts]
+            styles_by_layout[layout] = styles
+        for cls in styles:
+            report.style_counts[cls] += 1
+        
+        if len(report.currency_samples) < max_samples:
+            for value in cells:
+                if '£' in value and value not in report.currency_samples and len(report.currency_samples) < max_samples:
+                    report.currency_samples.append(value)
+        
+        _finish_row(report, row_number, cells, row_classes,
+                    list(cell_classes) if keep_rows else None)
+    
+    # Every tag must belong to a matched row, and the tbody must be whole
+    well_formed = (
+        tbody.count('<tr') == row_number
+        and tbody.count('</tr>') == row_number
+        and tbody.count('<td') == row_number * CELLS_PER_ROW
+        and tbody.count('<tbody') == 1
+        and tbody.count('</tbody>') == 1
+    )
+    return report if well_formed else None
+
+def _scan_tokens(tbody, max_samples, keep_rows):
+    """Tag-by-tag scan that reports exactly where the structure breaks."""
+    
+    report = _new_report(tbody)
+    tbody_opened = tbody_closed = 0
+    row_cells = None
+    row_number = 0
+    cell_start = None
+    cell_class = None
+    # className strings repeat across rows, so resolve each one only once
+    styles_by_class_attr = {}
+    
+    for match in TOKEN_PATTERN.finditer(tbody):
+        tag, closing, class_attr = match.group('tag', 'close', 'cls')
+        
+        if class_attr:
+            styles = styles_by_class_attr.get(class_attr)
+            if styles is None:
+                styles = [cls for cls in class_attr.split() if cls in report.style_counts]
+                styles_by_class_attr[class_attr] = styles
+            for cls in styles:
+                report.style_counts[cls] += 1
+        
+        if tag == 'tbody':
+            if closing:
+                tbody_closed += 1
+            else:
+                tbody_opened += 1
+        elif tag == 'tr' and not closing:
+            if row_cells is not None:
+                report.errors.append(f"Row {row_number}: missing </tr>")
+            row_number += 1
+            row_cells = []
+            row_cell_classes = []
+            row_classes = class_attr or ''
+        elif tag == 'tr':
+            if row_cells is None:
+                report.errors.append(f"Unexpected </tr> after row {row_number}")
+                continue
+            _finish_row(report, row_number, row_cells, row_classes,
+                        row_cell_classes if keep_rows else None)
+            row_cells = None
+        elif not closing:
+            cell_start = match.end()
+            cell_class = class_attr or ''
+        else:
+            if row_cells is None or cell_start is None:
+                report.errors.append(f"Cell outside a row near character {match.start()}")
+                continue
+            value = tbody[cell_start:match.start()]
+            row_cells.append(value)
+            row_cell_classes.append(cell_class)
+            cell_start = None
+            if '£' in value and value not in report.currency_samples and len(report.currency_samples) < max_samples:
+                report.currency_samples.append(value)
+    
+    if row_cells is not None:
+        report.errors.append(f"Row {row_number}: missing </tr>")
+    if tbody_opened != 1 or tbody_closed != 1:
+        report.errors.append(f"Expected one <tbody>...</tbody>, found {tbody_opened} open / {tbody_closed} close tags")
+    
+    return report
+
+def _finish_row(report, row_number, cells, row_classes, cell_classes):
+    """Record a completed row on the report (kept in full if cell_classes is given)."""
+    
+    if len(cells) != CELLS_PER_ROW:
+        report.errors.append(f"Row {row_number}: expected {CELLS_PER_ROW} cells, found {len(cells)}")
+    
+    if cells and cells[0] == 'Total':
+        report.totals_rows += 1
+    else:
+        report.investment_rows += 1
+        if len(cells) > 2:
+            asset_class = cells[2]
+            report.asset_class_counts[asset_class] = report.asset_class_counts.get(asset_class, 0) + 1
+    
+    if cell_classes is not None:
+        report.rows.append({
+            'row_number': row_number,
+            'classes': row_classes,
+            'cells': cells,
+            'cell_classes': cell_classes
+        })
+
+def find_tbody(content):
+    """Return the (start, end) span of the <tbody>...</tbody> block, or None."""
+    
+    tbody_match = TBODY_OPEN_PATTERN.search(content)
+    if tbody_match is None:
+        return None
+    tbody_end = content.find('</tbody>', tbody_match.end())
+    if tbody_end == -1:
+        return None
+    return tbody_match.start(1), tbody_end + len('</tbody>')
+
+# Table columns in rendered order, keyed like table_display_columns()
+TABLE_FIELDS = ('name', 'sector', 'asset_class', 'investment', 'evic', 'ownership',
+                'pcaf_score', 'primary', 'secondary', 'estimated')
+
+# Source columns behind each rendered field, used to skip fields the
+# source does not provide (e.g. PCAF scores are not in investment_data.xlsx)
+SOURCE_COLUMNS = {'investment': 'investment_amount'}
+
+def load_source_context(source_file):
+    """Load the holdings source (CSV export or AMIL workbook) into a PortfolioContext."""
+    
+    from generate_complete_table_structure import PortfolioContext
+    from holdings_model import load_amil_workbook, load_holdings_csv
+    
+    if source_file.lower().endswith(('.xlsx', '.xls')):
+        holdings = load_amil_workbook(source_file)
+    else:
+        holdings = load_holdings_csv(source_file)
+    return PortfolioContext.from_holdings(holdings)
+
+def validate_tbody_against_source(tbody, source_file='complete_investment_data.csv', max_mismatches=None):
+    """Parse the generated rows back into records and check them against the source.
+    
+    Rows are matched to source holdings by (name, asset class) through a
+    hash lookup, so the check is a single pass over the table. Every cell
+    value, the row and PCAF styling classes, and the calculated totals row
+    cells are compared; differences are collected on report.mismatches.
+    """
+    
+    from generate_complete_table_structure import (
+        PCAF_HIGHLIGHT_SCORE,
+        TSX_ROW_STYLES,
+        table_display_columns,
+        totals_row_cells,
+    )
+    
+    report = scan_tbody(tbody, keep_rows=True)
+    context = load_source_context(source_file)
+    holdings = context.holdings
+    expected = table_display_columns(context)
+    
+    provided = {
+        name: holdings[SOURCE_COLUMNS.get(name, name)].notna().any()
+        if SOURCE_COLUMNS.get(name, name) in holdings.columns else True
+        for name in TABLE_FIELDS
+    }
+    
+    # (name, asset class) -> source row positions, in source order
+    index = {}
+    for position, key in enumerate(zip(expected['name'], expected['asset_class'])):
+        index.setdefault(key, deque()).append(position)
+    
+    def mismatch(row, name, field_name, expected_value, actual_value):
+        if max_mismatches is None or len(report.mismatches) < max_mismatches:
+            report.mismatches.append({
+                'row': row, 'name': name, 'field': field_name,
+                'expected': expected_value, 'actual': actual_value
+            })
+    
+    for row in report.rows:
+        cells = row['cells']
+        if len(cells) != len(TABLE_FIELDS):
+            continue  # already reported as a structural error
+        row_number = row['row_number']
+        
+        if cells[0] == 'Total':
+            for field_name, value in totals_row_cells(context.totals).items():
+                actual = cells[TABLE_FIELDS.index(field_name)]
+                if actual != value:
+                    mismatch(row_number, 'Total', field_name, value, actual)
+            expected_red = context.totals['pcaf_score'] >= PCAF_HIGHLIGHT_SCORE
+            actual_red = 'text-red-600' in row['cell_classes'][TABLE_FIELDS.index('pcaf_score')].split()
+            if expected_red != actual_red:
+                mismatch(row_number, 'Total', 'pcaf_class',
+                         'text-red-600' if expected_red else '', 'text-red-600' if actual_red else '')
+            continue
+        
+        positions = index.get((cells[0], cells[2]))
+        if not positions:
+            mismatch(row_number, cells[0], 'row', 'holding in source', 'not in source')
+            continue
+        position = positions.popleft()
+        report.checked_rows += 1
+        
+        for column, field_name in enumerate(TABLE_FIELDS):
+            if not provided[field_name]:
+                continue
+            value = expected[field_name][position]
+            if cells[column] != value:
+                mismatch(row_number, cells[0], field_name, value, cells[column])
+        
+        style = TSX_ROW_STYLES.get(cells[2], TSX_ROW_STYLES['Bond'])
+        if row['classes'] != style['row_class']:
+            mismatch(row_number, cells[0], 'row_class', style['row_class'], row['classes'])
+        if provided['pcaf_score']:
+            expected_red = expected['pcaf_class'][position] == 'text-red-600'
+            actual_red = 'text-red-600' in row['cell_classes'][TABLE_FIELDS.index('pcaf_score')].split()
+            if expected_red != actual_red:
+                mismatch(row_number, cells[0], 'pcaf_class',
+                         'text-red-600' if expected_red else '', 'text-red-600' if actual_red else '')
+    
+    for (name, asset_class), positions in index.items():
+        for _ in positions:
+            mismatch(None, name, 'row', 'row in table', 'missing from table')
+    
+    return report
+
 def extract_replacement_content():
     """Extract the exact content for replacement."""
     
@@ -19,12 +340,13 @@ def extract_replacement_content():
             content = f.read()
         
         # Extract just the tbody content
-        tbody_start = content.find('<tbody>')
-        tbody_end = content.find('</tbody>') + len('</tbody>')
+        span = find_tbody(content)
         
-        if tbody_start == -1 or tbody_end == -1:
+        if span is None:
             return None, "Could not find tbody markers"
         
+        tbody_start, tbody_end = span
+        
         # Get the content with proper indentation
         tbody_content = content[tbody_start:tbody_end]
         
@@ -54,64 +376,85 @@ def show_replacement_preview():
         print(f"❌ Error: {error}")
         return False
     
+    report = scan_tbody(new_tbody)
+    
     print("=" * 80)
     print("REPLACEMENT CONTENT PREVIEW")
     print("=" * 80)
     
     # Show first few lines
-    lines = new_tbody.split('\n')
+    first_lines = new_tbody.split('\n', 10)[:10]
     print("📝 First 10 lines of new content:")
     print("-" * 50)
-    for i, line in enumerate(lines[:10]):
+    for i, line in enumerate(first_lines):
         print(f"{i+1:2d}: {line}")
     
-    print(f"\n... and {len(lines)-10} more lines")
+    print(f"\n... and {report.total_lines-10} more lines")
     
     print(f"\n📊 STATISTICS:")
-    print(f"   Total lines: {len(lines)}")
-    print(f"   Total characters: {len(new_tbody)}")
-    print(f"   Investment rows: 18")
-    print(f"   Total row: 1")
-    
-    # Count different asset types
-    bond_count = new_tbody.count('Bond</td>')
-    re_count = new_tbody.count('Real Estate Equity</td>')
-    infra_count = new_tbody.count('Infrastructure (Project Finance)</td>')
+    print(f"   Total lines: {report.total_lines}")
+    print(f"   Total characters: {report.total_characters}")
+    print(f"   Investment rows: {report.investment_rows}")
+    print(f"   Total row: {report.totals_rows}")
     
     print(f"\n🔢 ASSET BREAKDOWN:")
-    print(f"   Bonds: {bond_count}")
-    print(f"   Real Estate: {re_count}")
-    print(f"   Infrastructure: {infra_count}")
-    print(f"   Total: {bond_count + re_count + infra_count}")
-    
-    # Show special styling counts
-    blue_bg_count = new_tbody.count('bg-blue-50')
-    orange_bg_count = new_tbody.count('bg-orange-50')
-    red_text_count = new_tbody.count('text-red-600')
+    for asset_class, label in ASSET_CLASS_LABELS.items():
+        print(f"   {label}: {report.asset_class_counts.get(asset_class, 0)}")
+    for asset_class, count in report.asset_class_counts.items():
+        if asset_class not in ASSET_CLASS_LABELS:
+            print(f"   {asset_class}: {count}")
+    print(f"   Total: {sum(report.asset_class_counts.values())}")
     
     print(f"\n🎨 STYLING:")
-    print(f"   Blue backgrounds (Real Estate): {blue_bg_count}")
-    print(f"   Orange backgrounds (Infrastructure): {orange_bg_count}")
-    print(f"   Red text (PCAF ≥2.5): {red_text_count}")
-    
-    # Show currency formatting samples
-    currency_samples = []
-    for line in lines:
-        if '£' in line and 'text-center">' in line:
-            start = line.find('text-center">') + len('text-center">')
-            end = line.find('</td>', start)
-            if start < end:
-                value = line[start:end]
-                if value not in currency_samples and len(currency_samples) < 5:
-                    currency_samples.append(value)
+    print(f"   Blue backgrounds (Real Estate): {report.style_counts['bg-blue-50']}")
+    print(f"   Orange backgrounds (Infrastructure): {report.style_counts['bg-orange-50']}")
+    print(f"   Red text (PCAF ≥2.5): {report.style_counts['text-red-600']}")
     
     print(f"\n💰 CURRENCY FORMATTING SAMPLES:")
-    for sample in currency_samples:
+    for sample in report.currency_samples:
         print(f"   {sample}")
     
+    if not report.ok:
+        print(f"\n❌ STRUCTURAL ISSUES:")
+        for issue in report.errors:
+            print(f"   {issue}")
+        return False
+    
     print("\n✅ Content validation successful!")
     return True
 
+def show_source_validation(source_file='complete_investment_data.csv'):
+    """Check the generated rows against the holdings source and print mismatches."""
+    
+    new_tbody, error = extract_replacement_content()
+    
+    if error:
+        print(f"❌ Error: {error}")
+        return False
+    
+    try:
+        report = validate_tbody_against_source(new_tbody, source_file, max_mismatches=50)
+    except FileNotFoundError:
+        print(f"❌ Error: {source_file} not found")
+        return False
+    
+    print("\n" + "=" * 80)
+    print("SOURCE DATA VALIDATION")
+    print("=" * 80)
+    print(f"📋 Source: {source_file}")
+    print(f"🔍 Rows checked: {report.checked_rows} of {report.investment_rows}")
+    
+    if report.mismatches:
+        print(f"\n❌ MISMATCHES ({len(report.mismatches)} shown):")
+        for item in report.mismatches:
+            row = f"row {item['row']}" if item['row'] is not None else "source"
+            print(f"   {row:<9} {item['name']:<35} {item['field']:<12} "
+                  f"expected {item['expected']!r}, found {item['actual']!r}")
+        return False
+    
+    print("✅ All rows, styling and totals match the source data")
+    return True
+
 def generate_quick_replace_file():
     """Generate a file with the exact replacement content."""
     
@@ -138,8 +481,8 @@ def main():
     print("VALIDATION AND QUICK REPLACE SCRIPT")
     print("=" * 80)
     
-    # Show preview
-    if show_replacement_preview():
+    # Show preview and check the rows against the source data
+    if show_replacement_preview() and show_source_validation():
         
         # Generate quick replace file
         generate_quick_replace_file()